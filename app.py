@@ -2,128 +2,396 @@
 app.py
 =============
 A Flask web application for a Battleship game with MCTS and ML-MCTS AI bots.
+Each browser (or API client sending an X-Game-Id header) plays its own game. Games live in a pluggable
+state store selected with the GAME_STORE environment variable: 'memory' (default, one process) or
+'sqlite:///<path>' to share games between several worker processes.
 """
 import os
-from flask import Flask, request, jsonify, render_template
+import json
+from flask import Flask, Response, request, jsonify, render_template, session, g, stream_with_context
 import time
-from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
-
-from tfg.game.board import Board, SHIPS
-from tfg.algorithms.mcts import MCTS
-from tfg.ai.mcts_ml import NeuralMCTS
+import uuid
+
+from tfg.game.board import SHIPS
+from tfg.ai.bots import bot_from_config, load_opening_book
+from tfg.ai.model_registry import registry as model_registry
+from tfg.server.jobs import MoveJobQueue, QueueFullError
+from tfg.server.models import db, init_db
+from tfg.server.result_writer import ResultWriter
+from tfg.server import stats as game_stats
+from tfg.server.sessions import GameSession
+from tfg.server.state_store import make_store, StaleWriteError
 
 app = Flask(__name__, instance_relative_config=True)
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
 
 # ─── Database configuration ────────────────────────────────────────────────────
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///game.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///game.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+init_db(app)
 
-class GameResult(db.Model):
-    """GameResult represents a record of a completed game in the database.
+# Finished games are queued and written in batches by a background thread
+with app.app_context():
+    results = ResultWriter(
+        db.engine,
+        batch_size     = int(os.environ.get('RESULTS_BATCH_SIZE', 500)),
+        flush_interval = float(os.environ.get('RESULTS_FLUSH_INTERVAL', 1.0))
+    )
+
+# ─── AI bots ────────────────────────────────────────────────────────────────────
+# Opening book answering the first moves of every game without searching (see tfg.algorithms.opening_book)
+book_path    = os.environ.get('OPENING_BOOK', 'opening_book.npz')
+opening_book = load_opening_book(book_path) if os.path.exists(book_path) else None
+
+# Bot configurations (see tfg.ai.bots); the ML-MCTS weights are loaded once, on the first ML search.
+# The network runs eagerly; other inference backends are opt-in, e.g. ML_BOT='ml_mcts:backend=torchscript'
+MCTS_BOT = os.environ.get('MCTS_BOT', 'mcts:iters=5')
+ML_BOT   = os.environ.get('ML_BOT', 'ml_mcts:iters=100,c_puct=1.0,model_path=model.pth,backend=eager')
+
+# AI turns run on a bounded worker pool; requests only submit them and return a job id
+ai_jobs = MoveJobQueue(
+    max_workers = int(os.environ.get('AI_WORKERS', 2)),
+    max_pending = int(os.environ.get('AI_MAX_PENDING', 16)),
+    timeout     = float(os.environ.get('AI_MOVE_TIMEOUT', 10.0))
+)
+
+# ─── Game sessions ─────────────────────────────────────────────────────────────
+def new_session(game_id):
+    """Create the state of a new game with its own search trees.
 
     Args:
-        db.Model: Inherits from SQLAlchemy's Model class to define a database model.
+        game_id (str): The id of the game.
+
+    Returns:
+        GameSession: The new game session.
     """
-    __tablename__ = 'game_results'
-    id  = db.Column(db.Integer,   primary_key=True)
-    timestamp = db.Column(db.DateTime,  default=datetime.utcnow)
-    game_mode = db.Column(db.String(50), nullable=False)
-    winner = db.Column(db.String(50), nullable=False)
-    duration = db.Column(db.Float,     nullable=False)
+    return GameSession(
+        game_id,
+        vanilla_mcts = bot_from_config(MCTS_BOT, opening_book=opening_book),
+        ml_mcts      = bot_from_config(ML_BOT, opening_book=opening_book)
+    )
 
-with app.app_context():
-    db.create_all()
+store = make_store(
+    os.environ.get('GAME_STORE', 'memory'),
+    new_session,
+    max_sessions = int(os.environ.get('MAX_GAMES', 500)),
+    idle_timeout = float(os.environ.get('GAME_IDLE_TIMEOUT', 1800.0)),
+    max_bytes    = int(os.environ.get('GAMES_MAX_BYTES', 256 * 1024 * 1024))
+)
 
-# ─── AI bots ────────────────────────────────────────────────────────────────────
-vanilla_mcts = MCTS(iterations=5)
-ml_mcts      = NeuralMCTS('model.pth', iters=100, c_puct=1.0)
+def requested_game_id():
+    """Get the game id of the current request, from the X-Game-Id header or the signed session cookie.
+
+    Returns:
+        str: The game id, or None if the client has no game yet.
+    """
+    return request.headers.get('X-Game-Id') or session.get('game_id')
+
+def current_game():
+    """Load the game of the current request, creating it if needed.
+
+    Returns:
+        GameSession: The game session of the requesting client.
+    """
+    game_id = requested_game_id()
+    game = store.load(game_id) or store.create(game_id)
+    g.game_id = game.game_id
+    if 'X-Game-Id' not in request.headers:
+        session['game_id'] = game.game_id
+    if game.user_board is None:
+        game.init_game()
+        store.save(game)
+    return game
+
+@app.after_request
+def game_id_header(response):
+    """Attach the id of the game used by the request to the response.
+
+    Args:
+        response (Response): The outgoing response.
 
-# ─── Global game state ─────────────────────────────────────────────────────────
-user_board = None
-pc_board = None
-user_turn = True
-game_over = False
-message = ''
+    Returns:
+        Response: The response, with the X-Game-Id header set when a game was used.
+    """
+    if 'game_id' in g:
+        response.headers['X-Game-Id'] = g.game_id
+    return response
 
-game_mode = "uservsmcts"
-boat_placement = "random"
-current_turn = "player1"
+@app.errorhandler(StaleWriteError)
+def stale_write(err):
+    """Answer requests whose game was modified concurrently by another request or worker.
 
-manual_phase = False
-placement_index = 0
+    Args:
+        err (StaleWriteError): The rejected write.
+
+    Returns:
+        tuple: JSON body and HTTP 409 status code.
+    """
+    return jsonify({'message': 'The game was updated concurrently. Please retry.'}), 409
 
-# track when a game starts so we can compute its duration
-start_time = None
+# Size of the tree snapshot sent with each PC move
+TREE_DEPTH = 2
+TREE_TOP_K = 8
 
 # ─── Helpers ────────────────────────────────────────────────────────────────────
-def init_game():
-    """Initialize the game state for a new match.
+def game_state(game):
+    """Build the common JSON payload describing a game.
+
+    Args:
+        game (GameSession): The game to describe.
+
+    Returns:
+        dict: Boards (the PC board masked), turn flags, message and boat statuses.
     """
-    global user_board, pc_board, user_turn, game_over, message
-    global current_turn, manual_phase, placement_index, start_time
+    return {
+        'user_board':   game.user_board.board,
+        'pc_board':     game.mask_board(game.pc_board.board),
+        'manual_phase': game.manual_phase,
+        'user_turn':    game.user_turn,
+        'game_over':    game.game_over,
+        'message':      game.message,
+        'user_boats':   game.user_board.get_boats_status(),
+        'pc_boats':     game.pc_board.get_boats_status()
+    }
+
+def record_result(game, winner_label):
+    """Queue the result of a game for the database; it is written by the results writer.
 
-    user_board = Board()
-    pc_board   = Board()
+    Args:
+        game (GameSession): The finished game.
+        winner_label (str): The label of the winning player ('user' or 'MCTS').
+    """
+    duration = time.time() - game.start_time
+    results.record(game.game_mode, winner_label, duration)
 
-    if boat_placement == "random":
-        user_board.place_fleet()
-        pc_board.place_fleet()
-        manual_phase = False
-    else:
-        manual_phase    = True
-        placement_index = 0
-        pc_board.place_fleet()
-
-    if game_mode == "mcts_vs_ml_mcts":
-        user_turn    = False
-        current_turn = "player1"
-        message      = 'MCTS vs ML-MCTS in progress.'
+def pc_turn(game_id, deadline, epoch):
+    """Play the PC's turn in User vs MCTS mode. Runs on an AI worker thread.
+
+    Every shot is saved to the game store; if another worker saved the game in the meantime the
+    game is reloaded and the shot searched again.
+
+    Args:
+        game_id (str): The id of the game being played.
+        deadline (float): time.monotonic() value after which searches return their best move so far.
+        epoch (int): The game epoch the job was submitted for; the turn is dropped if a new game started.
+
+    Returns:
+        dict: The game state after the PC's turn, including a bounded snapshot of the search tree
+            (deeper levels are served by /tree) and its summary.
+    """
+    while True:
+        game = store.load(game_id)
+        if game is None or game.epoch != epoch:
+            return {'message': 'This game has been restarted.'}
+
+        # get AI move
+        mx, my = game.vanilla_mcts.run(game.user_board, deadline=deadline)
+
+        # bounded tree snapshot & summary straight from the root's children (none for book moves)
+        root      = game.vanilla_mcts.root
+        tree      = root.snapshot(max_depth=TREE_DEPTH, top_k=TREE_TOP_K) if root else None
+        summary   = root.summary() if root else None
+
+        with game.lock:
+            if game.epoch != epoch:
+                continue
+
+            # apply AI shot
+            hit2 = game.user_board.shoot(mx, my)
+
+            # advance root (optional)
+            game.vanilla_mcts.update_with_move((mx, my))
+
+            winner = None
+            if hit2 and game.user_board.has_won():
+                # AI win
+                game.game_over = True
+                game.message   = 'PC wins!'
+                winner         = 'MCTS'
+            elif not hit2:
+                # on miss, hand back to user
+                game.user_turn = True
+                game.message   = 'PC missed. Your turn.'
+            else:
+                # on hit, loop and fire again
+                game.message = 'PC hit!'
+
+            turn_over = game.game_over or game.user_turn
+            if turn_over:
+                game.set_pending(None)
+            try:
+                store.save(game)
+            except StaleWriteError:
+                continue
+
+        if winner:
+            record_result(game, winner)
+        if turn_over:
+            # return everything, including tree & summary
+            return {**game_state(game), 'tree': tree, 'summary': summary}
+
+def bot_to_move(game):
+    """Get the bot whose turn it is in MCTS vs ML-MCTS mode.
+
+    Args:
+        game (GameSession): The game being played.
+
+    Returns:
+        tuple: The search object, the board it shoots at and its label.
+    """
+    if game.current_turn == "player1":
+        return game.vanilla_mcts, game.pc_board, "MCTS"
+    return game.ml_mcts, game.user_board, "ML-MCTS"
+
+def apply_bot_move(game, move):
+    """Apply a bot's shot in MCTS vs ML-MCTS mode and update the turn flags. Call with the game lock held.
+
+    Args:
+        game (GameSession): The game being played.
+        move (tuple): The shot (x, y) chosen by the bot to move, or None if it had no legal move.
+
+    Returns:
+        dict: A compact shot event with the shooter ('turn'), 'x', 'y', 'hit', the index of the boat it
+            sank ('sunk', or None) and whether the game is 'over' (plus the 'winner' if so).
+    """
+    mover, target, label = bot_to_move(game)
+    event = {'turn': game.current_turn, 'x': None, 'y': None, 'hit': False, 'sunk': None, 'over': False}
+
+    if move is None:
+        game.game_over = True
+        game.message   = f"No moves for {label}."
     else:
-        user_turn = True
-        if manual_phase:
-            message = f'Place your boat of length {SHIPS[placement_index]}.'
+        mx, my = move
+        hit    = target.shoot(mx, my)
+        event.update(x=mx, y=my, hit=hit, sunk=target.sunk_boat_at(mx, my) if hit else None)
+
+        if mover is game.vanilla_mcts:
+            game.vanilla_mcts.update_with_move((mx, my))
+
+        if hit and target.has_won():
+            game.game_over = True
+            game.message   = f"{label} wins!"
+        elif not hit:
+            game.message = f"{label} missed."
+            game.current_turn = 'player2' if game.current_turn == 'player1' else 'player1'
         else:
-            message = 'Game started. Your move!'
+            game.message = f"{label} hit!"
 
-    game_over  = False
-    start_time = time.time()
+    if game.game_over:
+        event.update(over=True, winner=label)
+    return event
 
-def mask_board(board):
-    """Mask the board for display, hiding unshot cells unless game is over or in MCTS vs ML-MCTS mode.
+def auto_turn(game_id, deadline, epoch):
+    """Play one bot's turn in MCTS vs ML-MCTS mode. Runs on an AI worker thread.
 
     Args:
-        board (list): The game board represented as a 2D list.
+        game_id (str): The id of the game being played.
+        deadline (float): time.monotonic() value after which searches return their best move so far.
+        epoch (int): The game epoch the job was submitted for; the turn is dropped if a new game started.
 
     Returns:
-        list: A masked version of the board where unshot cells are replaced with '?'.
+        dict: The game state after the bot's turn.
     """
-    masked = []
-    for row in board:
-        new = []
-        for c in row:
-            if game_mode == "mcts_vs_ml_mcts" or game_over:
-                new.append(c)
-            else:
-                new.append(c if c in ['X','O'] else '?')
-        masked.append(new)
-    return masked
+    while True:
+        game = store.load(game_id)
+        if game is None or game.epoch != epoch:
+            return {'message': 'This game has been restarted.'}
+
+        mover, target, label = bot_to_move(game)
+        move = None if game.game_over else mover.run(target, deadline=deadline)
+
+        with game.lock:
+            if game.epoch != epoch:
+                continue
+
+            event = {'over': True} if game.game_over else apply_bot_move(game, move)
+            turn_over = event['over'] or not event['hit']
+            if turn_over:
+                game.set_pending(None)
+            try:
+                store.save(game)
+            except StaleWriteError:
+                continue
+
+        if event.get('winner'):
+            record_result(game, event['winner'])
+        if turn_over:
+            return {
+                'user_board':   game.mask_board(game.user_board.board),
+                'pc_board':     game.mask_board(game.pc_board.board),
+                'game_over':    game.game_over,
+                'message':      game.message,
+                'user_boats':   game.user_board.get_boats_status(),
+                'pc_boats':     game.pc_board.get_boats_status(),
+                'current_turn': game.current_turn,
+                'model_version': game.ml_mcts.model_version
+            }
+
+def release_failed_turn(game_id, epoch, job_id):
+    """Clear the pending job of a game whose AI turn raised, so the game does not stay busy until
+    PENDING_TTL expires. Runs on the AI worker thread of the failed job.
 
-def record_result(winner_label):
-    """Record the result of a game in the database.
+    Args:
+        game_id (str): The id of the game.
+        epoch (int): The game epoch the job was submitted for.
+        job_id (str): The id of the failed job.
+    """
+    while True:
+        game = store.load(game_id)
+        if game is None or game.epoch != epoch or game.pending_job_id != job_id:
+            return
+        with game.lock:
+            game.set_pending(None)
+            game.message = 'The AI move failed. Please retry.'
+            try:
+                store.save(game)
+                return
+            except StaleWriteError:
+                continue
+
+def submit_turn(game, turn_fn):
+    """Mark a game as waiting for its AI turn, save it and submit the turn to the job queue.
+    The game is saved first so the job, which loads it from the store, sees every change made by the
+    current request.
 
     Args:
-        winner_label (str): The label of the winning player ('user' or 'MCTS').
+        game (GameSession): The game whose AI turn is played.
+        turn_fn (callable): pc_turn or auto_turn.
+
+    Raises:
+        QueueFullError: If the AI job queue is full (the game is saved without a pending job).
+
+    Returns:
+        MoveJob: The submitted job.
     """
-    duration = time.time() - start_time
-    gr = GameResult(
-        game_mode = game_mode,
-        winner    = winner_label,
-        duration  = duration
-    )
-    db.session.add(gr)
-    db.session.commit()
+    game_id, epoch = game.game_id, game.epoch
+    job_id = uuid.uuid4().hex
+    game.set_pending(job_id)
+    store.save(game)
+
+    def run(deadline):
+        try:
+            return turn_fn(game_id, deadline, epoch)
+        except Exception:
+            release_failed_turn(game_id, epoch, job_id)
+            raise
+
+    try:
+        return ai_jobs.submit(run, job_id=job_id)
+    except QueueFullError:
+        game.set_pending(None)
+        store.save(game)
+        raise
+
+def queue_full_response():
+    """Build the response returned when the AI job queue rejects work.
+
+    Returns:
+        tuple: JSON body and HTTP 503 status code.
+    """
+    resp = jsonify({'message': 'The AI is busy. Please try again in a moment.'})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
 
 # ─── Routes ────────────────────────────────────────────────────────────────────
 @app.route('/')
@@ -142,24 +410,14 @@ def set_options():
     Returns:
         json: JSON response containing the initial game state.
     """
-    global game_mode, boat_placement
-    data           = request.get_json()
-    game_mode      = data.get("game_mode", "uservsmcts")
-    boat_placement = data.get("boat_placement", "random")
-
-    init_game()
-    vanilla_mcts.root = None  # Reset MCTS tree
-    
-    return jsonify({
-        'user_board':   user_board.board,
-        'pc_board':     mask_board(pc_board.board),
-        'manual_phase': manual_phase,
-        'user_turn':    user_turn,
-        'game_over':    game_over,
-        'message':      message,
-        'user_boats':   user_board.get_boats_status(),
-        'pc_boats':     pc_board.get_boats_status()
-    })
+    game = current_game()
+    data = request.get_json()
+    with game.lock:
+        game.game_mode      = data.get("game_mode", "uservsmcts")
+        game.boat_placement = data.get("boat_placement", "random")
+        game.init_game()
+        store.save(game)
+        return jsonify(game_state(game))
 
 @app.route('/start', methods=['POST'])
 def start():
@@ -168,18 +426,11 @@ def start():
     Returns:
         json: JSON response containing the initial game state.
     """
-    init_game()
-    vanilla_mcts.root = None  # Reset MCTS tree
-    return jsonify({
-        'user_board':   user_board.board,
-        'pc_board':     mask_board(pc_board.board),
-        'manual_phase': manual_phase,
-        'user_turn':    user_turn,
-        'game_over':    game_over,
-        'message':      message,
-        'user_boats':   user_board.get_boats_status(),
-        'pc_boats':     pc_board.get_boats_status()
-    })
+    game = current_game()
+    with game.lock:
+        game.init_game()
+        store.save(game)
+        return jsonify(game_state(game))
 
 @app.route('/state', methods=['GET'])
 def state():
@@ -188,16 +439,9 @@ def state():
     Returns:
         json: JSON response containing the current game state.
     """
-    return jsonify({
-        'user_board':   user_board.board,
-        'pc_board':     mask_board(pc_board.board),
-        'manual_phase': manual_phase,
-        'user_turn':    user_turn,
-        'game_over':    game_over,
-        'message':      message,
-        'user_boats':   user_board.get_boats_status(),
-        'pc_boats':     pc_board.get_boats_status()
-    })
+    game = current_game()
+    with game.lock:
+        return jsonify(game_state(game))
 
 @app.route('/manual_place', methods=['POST'])
 def manual_place():
@@ -206,261 +450,339 @@ def manual_place():
     Returns:
         json: JSON response containing the updated game state after placing a ship.
     """
-    global manual_phase, placement_index, user_board, message, user_turn, game_over
-
-    if not manual_phase:
-        return jsonify({'message': 'Manual placement phase is over.'})
-
-    data  = request.get_json()
-    start = data.get("start", {})
-    end   = data.get("end", {})
-
-    sx, sy = int(start.get("x",-1)), int(start.get("y",-1))
-    ex, ey = int(end.get("x",-1)),   int(end.get("y",-1))
-    if sx != ex and sy != ey:
-        return jsonify({'message': 'Cells must be in a straight line.'})
-
-    if sx == ex:
-        if sy > ey: sy,ey = ey,sy
-        cells = [(sx, j) for j in range(sy, ey+1)]
-        orient = 'H'
-    else:
-        if sx > ex: sx,ex = ex,sx
-        cells = [(i, sy) for i in range(sx, ex+1)]
-        orient = 'V'
-
-    req_len = SHIPS[placement_index]
-    if len(cells) != req_len:
-        return jsonify({'message': f'Boat length must be {req_len}.'})
-    if not user_board.can_place_ship(cells[0][0], cells[0][1], orient, req_len):
-        return jsonify({'message': 'Invalid placement. Try again.'})
-
-    user_board.place_ship(cells[0][0], cells[0][1], orient, req_len)
-    user_board.boats.append({"value":str(req_len), "positions": cells})
-
-    placement_index += 1
-    if placement_index >= len(SHIPS):
-        manual_phase = False
-        user_turn    = True
-        message      = 'All boats placed. Your move!'
-    else:
-        message = f'Boat placed. Next: length {SHIPS[placement_index]}.'
+    game = current_game()
+    with game.lock:
+        if not game.manual_phase:
+            return jsonify({'message': 'Manual placement phase is over.'})
+
+        data  = request.get_json()
+        start = data.get("start", {})
+        end   = data.get("end", {})
+
+        sx, sy = int(start.get("x",-1)), int(start.get("y",-1))
+        ex, ey = int(end.get("x",-1)),   int(end.get("y",-1))
+        if sx != ex and sy != ey:
+            return jsonify({'message': 'Cells must be in a straight line.'})
+
+        if sx == ex:
+            if sy > ey: sy,ey = ey,sy
+            cells = [(sx, j) for j in range(sy, ey+1)]
+            orient = 'H'
+        else:
+            if sx > ex: sx,ex = ex,sx
+            cells = [(i, sy) for i in range(sx, ex+1)]
+            orient = 'V'
+
+        user_board = game.user_board
+        req_len = SHIPS[game.placement_index]
+        if len(cells) != req_len:
+            return jsonify({'message': f'Boat length must be {req_len}.'})
+        if not user_board.can_place_ship(cells[0][0], cells[0][1], orient, req_len):
+            return jsonify({'message': 'Invalid placement. Try again.'})
+
+        user_board.place_ship(cells[0][0], cells[0][1], orient, req_len)
+        user_board.boats.append({"value":str(req_len), "positions": cells})
+
+        game.placement_index += 1
+        if game.placement_index >= len(SHIPS):
+            game.manual_phase = False
+            game.user_turn    = True
+            game.message      = 'All boats placed. Your move!'
+        else:
+            game.message = f'Boat placed. Next: length {SHIPS[game.placement_index]}.'
+        store.save(game)
 
-    return jsonify({
-        'user_board':   user_board.board,
-        'message':      message,
-        'manual_phase': manual_phase,
-        'placement_index': placement_index,
-        'current_boat': SHIPS[placement_index] if placement_index < len(SHIPS) else None,
-        'user_boats':   user_board.get_boats_status()
-    })
+        return jsonify({
+            'user_board':   user_board.board,
+            'message':      game.message,
+            'manual_phase': game.manual_phase,
+            'placement_index': game.placement_index,
+            'current_boat': SHIPS[game.placement_index] if game.placement_index < len(SHIPS) else None,
+            'user_boats':   user_board.get_boats_status()
+        })
 
 @app.route('/user_move', methods=['POST'])
 def user_move():
-    """Handle a user's move in the game.
+    """Handle a user's move in the game. If the PC gets the turn, its move is submitted to the AI job
+    queue and the returned `job_id` can be polled on /jobs/<job_id>.
 
     Returns:
         json: JSON response containing the updated game state after the user's move.
     """
-    global user_turn, game_over, message
-
-    data = request.get_json()
-    x, y = int(data['x']), int(data['y'])
-
-    # Player fires
-    hit = pc_board.shoot(x, y)
-    if hit:
-        # If that shot sinks the last PC ship, end immediately
-        if pc_board.has_won():
-            game_over = True
-            message   = 'You win!'
-            record_result('user')
-            return jsonify({
-                'user_board':   user_board.board,
-                'pc_board':     mask_board(pc_board.board),
-                'user_turn':    user_turn,
-                'game_over':    game_over,
-                'message':      message,
-                'manual_phase': manual_phase,
-                'user_boats':   user_board.get_boats_status(),
-                'pc_boats':     pc_board.get_boats_status()
-            })
-
-        # Otherwise user hit but game continues, they shoot again
-        user_turn = True
-        message   = 'You hit! Shoot again.'
-        return jsonify({
-            'user_board':   user_board.board,
-            'pc_board':     mask_board(pc_board.board),
-            'user_turn':    user_turn,
-            'game_over':    game_over,
-            'message':      message,
-            'manual_phase': manual_phase,
-            'user_boats':   user_board.get_boats_status(),
-            'pc_boats':     pc_board.get_boats_status()
-        })
-
-    # User missed so hand turn to AI
-    user_turn = False
-    message   = 'You missed. PC turn.'
-
-    # Check for user win (in case last shot was a miss but still sank the final ship—unlikely)
-    if pc_board.has_won():
-        game_over = True
-        message   = 'You win!'
-        record_result('user')
-        return jsonify({
-            'user_board':   user_board.board,
-            'pc_board':     mask_board(pc_board.board),
-            'user_turn':    user_turn,
-            'game_over':    game_over,
-            'message':      message,
-            'manual_phase': manual_phase,
-            'user_boats':   user_board.get_boats_status(),
-            'pc_boats':     pc_board.get_boats_status()
-        })
-
-    # AI moves (only after a miss) — User vs MCTS
-    if game_mode == 'uservsmcts':
-        while True:
-            # get AI move
-            mx, my = vanilla_mcts.run(user_board)
-
-            # snapshot tree & summary
-            full_tree = vanilla_mcts.root.to_dict()
-            summary = [
-                {
-                    'action':   {'x': c['action'][0], 'y': c['action'][1]},
-                    'visits':   c['visits'],
-                    'wins':     c['wins'],
-                    'win_rate': round(c['win_rate'], 3)
-                }
-                for c in full_tree['children']
-            ]
-
-            # apply AI shot
-            hit2 = user_board.shoot(mx, my)
-
-            # advance root (optional)
-            vanilla_mcts.update_with_move((mx, my))
-
-            # check for AI win
-            if hit2 and user_board.has_won():
-                game_over = True
-                message   = 'PC wins!'
-                record_result('MCTS')
-                break
-
-            # on miss, hand back to user
-            if not hit2:
-                user_turn = True
-                message   = 'PC missed. Your turn.'
-                break
-
-            # on hit, loop and fire again
-            message = 'PC hit!'
-
-        # return everything, including tree & summary
-        return jsonify({
-            'user_board':   user_board.board,
-            'pc_board':     mask_board(pc_board.board),
-            'user_turn':    user_turn,
-            'game_over':    game_over,
-            'message':      message,
-            'manual_phase': manual_phase,
-            'user_boats':   user_board.get_boats_status(),
-            'pc_boats':     pc_board.get_boats_status(),
-            'tree':         full_tree,
-            'summary':      summary
-        })
+    game = current_game()
+    with game.lock:
+        if game.ai_busy():
+            return jsonify({'message': 'PC is thinking.', 'job_id': game.pending_job_id}), 409
+        if game.game_mode == 'uservsmcts' and ai_jobs.full():
+            return queue_full_response()
+
+        data = request.get_json()
+        x, y = int(data['x']), int(data['y'])
+
+        # Player fires
+        hit = game.pc_board.shoot(x, y)
+        if hit:
+            # If that shot sinks the last PC ship, end immediately
+            if game.pc_board.has_won():
+                game.game_over = True
+                game.message   = 'You win!'
+                store.save(game)
+                record_result(game, 'user')
+                return jsonify(game_state(game))
+
+            # Otherwise user hit but game continues, they shoot again
+            game.user_turn = True
+            game.message   = 'You hit! Shoot again.'
+            store.save(game)
+            return jsonify(game_state(game))
+
+        # User missed so hand turn to AI
+        game.user_turn = False
+        game.message   = 'You missed. PC turn.'
+
+        # Check for user win (in case last shot was a miss but still sank the final ship—unlikely)
+        if game.pc_board.has_won():
+            game.game_over = True
+            game.message   = 'You win!'
+            store.save(game)
+            record_result(game, 'user')
+            return jsonify(game_state(game))
+
+        # AI moves (only after a miss) — User vs MCTS, played in the background
+        job_id = None
+        if game.game_mode == 'uservsmcts':
+            try:
+                job_id = submit_turn(game, pc_turn).id
+            except QueueFullError:
+                return queue_full_response()
+        else:
+            store.save(game)
 
-    # Fallback response
-    return jsonify({
-        'user_board':   user_board.board,
-        'pc_board':     mask_board(pc_board.board),
-        'user_turn':    user_turn,
-        'game_over':    game_over,
-        'message':      message,
-        'manual_phase': manual_phase,
-        'user_boats':   user_board.get_boats_status(),
-        'pc_boats':     pc_board.get_boats_status()
-    })
+        return jsonify({**game_state(game), 'job_id': job_id})
 
 
-    
-    
 @app.route('/auto_move', methods=['POST'])
 def auto_move():
-    """Handle an automatic move by the AI bot (MCTS or ML-MCTS).
+    """Submit an automatic move by the AI bot (MCTS or ML-MCTS).
 
     Returns:
-        json: JSON response containing the updated game state after the AI's move.
+        json: JSON response containing the id of the job playing the bot's turn.
     """
-    global current_turn, game_over, message, user_board, pc_board
+    game = current_game()
+    with game.lock:
+        if game.ai_busy():
+            return jsonify({'job_id': game.pending_job_id, 'status': 'running'})
 
-    if user_board is None or pc_board is None:
-        init_game()
-        vanilla_mcts.root = None
+        try:
+            job = submit_turn(game, auto_turn)
+        except QueueFullError:
+            return queue_full_response()
+        return jsonify({'job_id': job.id, 'status': job.status})
 
-    if current_turn == "player1":
-        mover, target, label = vanilla_mcts, pc_board,   "MCTS"
-    else:
-        mover, target, label = ml_mcts,      user_board, "ML-MCTS"
+@app.route('/match/stream')
+def match_stream():
+    """Play the current MCTS vs ML-MCTS match server-side and stream it as server-sent events.
 
-    while True:
-        move = mover.run(target)
-        if move is None:
-            game_over = True
-            message   = f"No moves for {label}."
-            record_result(label)
-            break
+    Each shot is pushed as soon as it is computed as one compact JSON event (see apply_bot_move); a
+    final `end` event, carrying the version of the ML-MCTS weights, closes the stream. The match is
+    saved after every shot, so a reconnecting client resumes where the stream stopped.
 
-        mx, my = move
-        hit    = target.shoot(mx, my)
-
-        if mover is vanilla_mcts:
-            vanilla_mcts.update_with_move((mx, my))
+    Returns:
+        Response: A text/event-stream response.
+    """
+    game = current_game()
+    with game.lock:
+        if game.game_mode != 'mcts_vs_ml_mcts':
+            return jsonify({'message': 'Streaming is only available in MCTS vs ML-MCTS mode.'}), 400
+        if game.ai_busy():
+            return jsonify({'message': 'The match is already being played.',
+                            'job_id': game.pending_job_id}), 409
+        game_id, epoch = game.game_id, game.epoch
+        stream_id = uuid.uuid4().hex
+        game.set_pending(stream_id)
+        store.save(game)
+
+    def events():
+        ml_version = None
+        try:
+            while True:
+                game = store.load(game_id)
+                if game is None or game.epoch != epoch or game.pending_job_id != stream_id:
+                    break
+                if game.game_over:
+                    break
+
+                mover, target, label = bot_to_move(game)
+                move = mover.run(target, deadline=time.monotonic() + ai_jobs.timeout)
+                if mover is game.ml_mcts:
+                    ml_version = mover.model_version
+
+                with game.lock:
+                    if game.epoch != epoch:
+                        break
+                    event = apply_bot_move(game, move)
+                    if event['over']:
+                        game.set_pending(None)
+                    try:
+                        store.save(game)
+                    except StaleWriteError:
+                        continue
+
+                if event['over']:
+                    record_result(game, event['winner'])
+                yield f"data: {json.dumps(event, separators=(',', ':'))}\n\n"
+                if event['over']:
+                    break
+            yield f"event: end\ndata: {json.dumps({'model_version': ml_version})}\n\n"
+        finally:
+            # release the game if the client went away mid-match
+            game = store.load(game_id)
+            if game is not None and game.pending_job_id == stream_id:
+                game.set_pending(None)
+                try:
+                    store.save(game)
+                except StaleWriteError:
+                    pass
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/tree')
+def tree():
+    """Get part of the PC's last MCTS search tree, so the visualization can load deeper levels on demand.
+
+    Query args:
+        path: Actions from the search root to the requested node, as 'x,y;x,y'. Defaults to the root.
+        depth: Levels below that node to include (1-6). Defaults to 1.
+        top_k: Most visited children kept per node (1-36). Defaults to TREE_TOP_K.
+        format: 'nested' (default) or 'columns' for parallel arrays of parent index, action,
+            visits and wins.
 
-        if hit and target.has_won():
-            game_over = True
-            message   = f"{label} wins!"
-            record_result(label)
-            break
+    Returns:
+        json: JSON response with the requested subtree, or 404 if there is no such node.
+    """
+    game = current_game()
+    depth = min(max(request.args.get('depth', 1, type=int), 1), 6)
+    top_k = min(max(request.args.get('top_k', TREE_TOP_K, type=int), 1), 36)
+    try:
+        path = [tuple(int(v) for v in step.split(','))
+                for step in request.args.get('path', '').split(';') if step]
+    except ValueError:
+        return jsonify({'message': 'Malformed path.'}), 400
+
+    with game.lock:
+        root = game.vanilla_mcts.last_root or game.vanilla_mcts.root
+        node = root.find(path) if root is not None else None
+        if node is None:
+            return jsonify({'message': 'No such node in the search tree.'}), 404
+
+        if request.args.get('format') == 'columns':
+            cols = node.to_columns(max_depth=depth, top_k=top_k)
+            del cols['prior']
+            return jsonify({'path': path, 'columns': cols})
+        return jsonify({'path': path, 'tree': node.snapshot(max_depth=depth, top_k=top_k)})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll an AI job. Pass `wait` (seconds, at most 30) to long-poll until the job finishes.
+
+    Jobs submitted by another worker process are not known here; for those the requesting client's
+    game is read from the store, and the job counts as done once the game no longer waits for it.
 
-        if not hit:
-            message = f"{label} missed."
-            current_turn = 'player2' if current_turn == 'player1' else 'player1'
-            break
+    Args:
+        job_id (str): The id returned by /user_move or /auto_move.
 
-        message = f"{label} hit!"
+    Returns:
+        json: JSON response with the job status and, once done, the resulting game state.
+    """
+    wait = min(max(request.args.get('wait', 0, type=float), 0.0), 30.0)
+    job = ai_jobs.get(job_id)
+    if job is not None:
+        if wait:
+            job.wait(wait)
+        return jsonify(job.to_dict())
+
+    deadline = time.monotonic() + wait
+    while True:
+        game = store.load(requested_game_id())
+        if game is None:
+            return jsonify({'job_id': job_id, 'status': 'unknown'}), 404
+        if game.pending_job_id != job_id:
+            return jsonify({'job_id': job_id, 'status': 'done',
+                            'result': game_state(game), 'error': None})
+        if time.monotonic() >= deadline:
+            return jsonify({'job_id': job_id, 'status': 'running', 'result': None, 'error': None})
+        time.sleep(0.2)
+
+@app.route('/metrics')
+def metrics():
+    """Get runtime metrics of the server.
 
+    Returns:
+        json: JSON response containing AI job queue, game session, results writer, opening book and
+            model registry metrics (including the active model versions).
+    """
     return jsonify({
-        'user_board':   mask_board(user_board.board),
-        'pc_board':     mask_board(pc_board.board),
-        'game_over':    game_over,
-        'message':      message,
-        'user_boats':   user_board.get_boats_status(),
-        'pc_boats':     pc_board.get_boats_status(),
-        'current_turn': current_turn
+        'ai_jobs':      ai_jobs.stats(),
+        'games':        store.stats(),
+        'results':      results.stats(),
+        'opening_book': opening_book.stats() if opening_book else None,
+        'models':       model_registry.stats()
     })
 
-
-
 @app.route('/stats')
 def stats():
-    """Get game statistics from the database.
+    """Get aggregated game statistics, read from the precomputed rollups.
+
+    Query args:
+        bucket: Period of the time series, 'day' (default), 'week' or 'month'.
+        fresh: If 1, first write the results still queued (waiting up to 2 s). By default the
+            rollups are served as they are, up to RESULTS_FLUSH_INTERVAL behind.
 
     Returns:
-        json: JSON response containing game statistics.
+        json: JSON response with, for each game mode, the total games, wins and average duration per
+            winner, duration percentiles and the time-bucketed series.
     """
-    rows = GameResult.query.order_by(GameResult.timestamp).all()
-    out = {'uservsmcts': [], 'mcts_vs_ml_mcts': []}
-    for r in rows:
-        out[r.game_mode].append({
-            'winner':   r.winner,
-            'duration': r.duration
-        })
-    return jsonify(out)
+    if request.args.get('fresh', 0, type=int):
+        results.flush(timeout=2.0)
+    try:
+        return jsonify(game_stats.summary(db.session, bucket=request.args.get('bucket', 'day')))
+    except ValueError as err:
+        return jsonify({'message': str(err)}), 400
+
+@app.route('/stats/history')
+def stats_history():
+    """Get one page of raw game results, newest first.
+
+    Query args:
+        mode: The game mode ('uservsmcts' or 'mcts_vs_ml_mcts').
+        limit: Page size (1-500). Defaults to 50.
+        before: The `next` cursor returned with the previous page.
+
+    Returns:
+        json: JSON response with the page's rows and the cursor of the next page (null at the end).
+    """
+    mode = request.args.get('mode', 'uservsmcts')
+    if mode not in game_stats.GAME_MODES:
+        return jsonify({'message': f'Unknown game mode: {mode}'}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    before = request.args.get('before', type=int)
+    return jsonify(game_stats.history(db.session, mode, limit=limit, before=before))
+
+@app.route('/stats/export.csv')
+def stats_export():
+    """Stream every recorded game as CSV, reading the results in chunks.
+
+    Returns:
+        Response: A text/csv response.
+    """
+    def rows():
+        yield 'mode,winner,duration,timestamp\n'
+        for mode, winner, duration, ts in game_stats.iter_results(db.session):
+            yield f"{mode},{winner},{duration},{ts.isoformat() if ts else ''}\n"
+
+    return Response(stream_with_context(rows()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=battleship_stats.csv'})
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))  # 5000 is the default port if not specified
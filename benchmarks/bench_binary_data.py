@@ -0,0 +1,79 @@
+"""
+bench_binary_data.py
+=======================
+This script compares the JSONL training data with the binary format of tfg.data.binary: size on
+disk, time to open the dataset, and time for one shuffled epoch of batches through a DataLoader.
+The data is data.jsonl repeated until it reaches the requested number of records.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from torch.utils.data import DataLoader
+
+from tfg.data.binary import jsonl_to_binary
+from train import GameDataset, BinaryGameDataset
+
+
+def size_of(path):
+    """ Size of a file or of the files of a directory, in bytes."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def epoch(ds, batch_size):
+    """ Iterate once over a dataset in shuffled batches.
+
+    Returns:
+        float: Seconds spent.
+    """
+    start = time.perf_counter()
+    loader = DataLoader(ds, batch_size=batch_size, shuffle=True, collate_fn=getattr(ds, 'collate', None))
+    for _ in loader:
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Compare JSONL and binary training data")
+    parser.add_argument('--records', type=int, default=200_000, help="Records in the dataset")
+    parser.add_argument('--batch-size', type=int, default=256, help="DataLoader batch size")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(ROOT, 'data.jsonl')) as f:
+            lines = [l for l in f if l.strip()]
+        jsonl = os.path.join(tmp, 'data.jsonl')
+        with open(jsonl, 'w') as f:
+            for i in range(args.records):
+                f.write(lines[i % len(lines)])
+        binary = os.path.join(tmp, 'data_bin')
+        start = time.perf_counter()
+        jsonl_to_binary([jsonl], binary)
+        convert = time.perf_counter() - start
+
+        print(f"{args.records} records, conversion {convert:.1f}s")
+        print(f"{'format':<8} {'disk MB':>8} {'open s':>8} {'epoch s':>8}")
+        for name, path, cls in (('jsonl', jsonl, GameDataset), ('binary', binary, BinaryGameDataset)):
+            start = time.perf_counter()
+            ds = cls(path)
+            opened = time.perf_counter() - start
+            print(f"{name:<8} {size_of(path) / 2**20:>8.1f} {opened:>8.2f} {epoch(ds, args.batch_size):>8.2f}")
+            del ds  # so freeing it is not timed with the next format
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+bench_data_parallel.py
+=========================
+This script measures the training throughput of train() with 1, 2, 4 and 8 data-parallel CPU
+processes (torch.distributed with the gloo backend). The global batch size is the same for every run,
+so each step does the same work; the samples per second of the last epoch are reported. The data is
+data.jsonl repeated until it reaches the requested number of records.
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from train import train
+
+
+@contextlib.contextmanager
+def quiet():
+    """ Silence the standard output of this process and of the processes it spawns."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Measure data-parallel training throughput")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8], help="Process counts")
+    parser.add_argument('--records', type=int, default=50_000, help="Records in the dataset")
+    parser.add_argument('--batch-size', type=int, default=256, help="Global batch size")
+    parser.add_argument('--epochs', type=int, default=2, help="Epochs per run (the last one is timed)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(ROOT, 'data.jsonl')) as f:
+            lines = [l for l in f if l.strip()]
+        data = os.path.join(tmp, 'data.jsonl')
+        with open(data, 'w') as f:
+            for i in range(args.records):
+                f.write(lines[i % len(lines)])
+
+        print(f"{args.records} records, global batch {args.batch_size}, {os.cpu_count()} CPUs")
+        print(f"{'processes':>9} {'samples/s':>10} {'speedup':>8}")
+        base = None
+        for n in args.processes:
+            with quiet():
+                history = train(data, epochs=args.epochs, batch_size=args.batch_size,
+                                model_out=os.path.join(tmp, 'model.pth'), processes=n, seed=0,
+                                early_stop_patience=args.epochs)
+            rate = history[-1]['samples_per_s']
+            base = base or rate
+            print(f"{n:>9} {rate:>10.0f} {rate / base:>7.2f}x")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_distill.py
+===================
+This script reports the latency-versus-strength tradeoff of smaller GameNet variants distilled from a
+teacher (see train.py --teacher). Every student is trained on the teacher's outputs over the
+self-play positions of a data file, then measured on:
+
+1. latency: a single-position evaluation with the eager and numpy backends (what NeuralMCTS does per
+   expanded node), and the time of a full ML-MCTS move;
+2. strength: the score of ML-MCTS with the student against ML-MCTS with the teacher, at the same
+   iterations, over a match with alternating first shooters.
+
+The teacher itself is reported as the first row (its score against itself is about 0.5).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import torch
+
+from bench_inference import random_states, bench_latency
+from tfg.ai.bots import make_bot
+from tfg.ai.inference import make_backend
+from tfg.ai.lockstep import match
+from tfg.ai.network import GameNet
+from tfg.game.board import Board
+from train import train
+
+
+def move_time(model, iters, moves):
+    """ Time full ML-MCTS moves on random positions.
+
+    Args:
+        model (GameNet): The network.
+        iters (int): Search iterations per move.
+        moves (int): Moves timed.
+
+    Returns:
+        float: Median milliseconds per move.
+    """
+    rng = np.random.default_rng(0)
+    times = []
+    for _ in range(moves):
+        board = Board()
+        board.place_fleet()
+        for idx in rng.choice(36, size=rng.integers(0, 15), replace=False):
+            board.shoot(*divmod(int(idx), 6))
+        bot = make_bot('ml_mcts', iters=iters, model=model)
+        start = time.perf_counter()
+        bot.run(board)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Report the latency/strength of distilled GameNets")
+    parser.add_argument('--teacher', default='model.pth', help="Teacher weights")
+    parser.add_argument('--data', default=os.path.join(ROOT, 'data.jsonl'), help="Self-play positions")
+    parser.add_argument('--students', nargs='+', default=['8', '16', '16,32', '32'],
+                        help="Trunk widths of the students, comma-separated per student")
+    parser.add_argument('--value-hidden', type=int, default=32, help="Value head width of the students")
+    parser.add_argument('--epochs', type=int, default=20, help="Distillation epochs")
+    parser.add_argument('--iters', type=int, default=50, help="ML-MCTS iterations per move")
+    parser.add_argument('--games', type=int, default=40, help="Games per match against the teacher")
+    parser.add_argument('--lockstep', type=int, default=8, help="Games played at once")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    teacher = GameNet.from_state_dict(torch.load(args.teacher, map_location='cpu')).eval()
+    states = random_states(256)
+    rows = [('teacher ' + ','.join(map(str, teacher.channels)), teacher)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in args.students:
+            channels = tuple(int(c) for c in spec.split(','))
+            out = os.path.join(tmp, f'student-{spec}.pth')
+            with contextlib.redirect_stdout(io.StringIO()):
+                train(args.data, epochs=args.epochs, model_out=out, seed=args.seed, channels=channels,
+                      value_hidden=args.value_hidden, teacher=args.teacher)
+            rows.append((f'student {spec}', GameNet.from_state_dict(torch.load(out)).eval()))
+
+    print(f"{'network':<16} {'params':>7} {'eager us':>9} {'numpy us':>9} {'ms/move':>8} {'score':>6}")
+    for name, model in rows:
+        params = sum(p.numel() for p in model.parameters())
+        latencies = []
+        for backend in (make_backend('eager', model), make_backend('numpy', model)):
+            bench_latency(backend, states, 100)  # warm-up
+            latencies.append(bench_latency(backend, states, 2000))
+        ms = move_time(model, args.iters, 20)
+        np.random.seed(args.seed)
+        pairs = [(make_bot('ml_mcts', iters=args.iters, model=model),
+                  make_bot('ml_mcts', iters=args.iters, model=teacher)) for _ in range(args.lockstep)]
+        score = match(pairs, args.games)['score']
+        print(f"{name:<16} {params:>7} {latencies[0]:>9.1f} {latencies[1]:>9.1f} {ms:>8.1f} {score:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
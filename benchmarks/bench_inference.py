@@ -0,0 +1,114 @@
+"""
+bench_inference.py
+=====================
+This script measures the GameNet inference backends: the latency of a single-position evaluation (what
+NeuralMCTS does per expanded node) and the throughput of batched evaluations, plus the largest
+deviation of each backend from the eager priors.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import torch
+
+from tfg.ai.inference import make_backend, available_backends
+from tfg.ai.network import GameNet
+from tfg.game.board import Board
+
+
+def random_states(n):
+    """ Build random positions.
+
+    Args:
+        n (int): Number of positions.
+
+    Returns:
+        np.ndarray: Board tensors of shape (n, 3, 6, 6).
+    """
+    rng = np.random.default_rng(0)
+    states = []
+    for _ in range(n):
+        board = Board()
+        board.place_fleet()
+        for idx in rng.choice(36, size=rng.integers(0, 20), replace=False):
+            board.shoot(*divmod(int(idx), 6))
+        states.append(board.to_tensor())
+    return np.stack(states)
+
+
+def bench_latency(backend, states, repeats):
+    """ Time single-position evaluations.
+
+    Args:
+        backend (InferenceBackend): The backend.
+        states (np.ndarray): Positions to cycle through.
+        repeats (int): Number of evaluations.
+
+    Returns:
+        float: Median latency in microseconds.
+    """
+    times = []
+    for i in range(repeats):
+        x = states[i % len(states)][None]
+        start = time.perf_counter()
+        backend.evaluate_batch(x)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e6
+
+
+def bench_batch(backend, states, batch, repeats):
+    """ Time batched evaluations.
+
+    Args:
+        backend (InferenceBackend): The backend.
+        states (np.ndarray): Positions (at least `batch` of them).
+        batch (int): Batch size.
+        repeats (int): Number of batches.
+
+    Returns:
+        float: Positions evaluated per second.
+    """
+    x = states[:batch]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backend.evaluate_batch(x)
+    return batch * repeats / (time.perf_counter() - start)
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the GameNet inference backends")
+    parser.add_argument('--model', default='model.pth', help="Network weights (random if missing)")
+    parser.add_argument('--repeats', type=int, default=2000, help="Single-position evaluations")
+    parser.add_argument('--batches', type=int, nargs='+', default=[32, 256], help="Batch sizes")
+    parser.add_argument('--threads', type=int, default=1, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model = GameNet()
+    if os.path.exists(args.model):
+        model.load_state_dict(torch.load(args.model, map_location='cpu'))
+    model.eval()
+    states = random_states(max(args.batches + [256]))
+
+    ref, _ = make_backend('eager', model).evaluate_batch(states)
+    print(f"{'backend':<12} {'1-pos us':>9} " + ' '.join(f'{f"b{b} pos/s":>11}' for b in args.batches)
+          + f" {'max |dp|':>9}")
+    for name in available_backends():
+        backend = make_backend(name, model)
+        bench_latency(backend, states, 100)  # warm-up
+        latency = bench_latency(backend, states, args.repeats)
+        rates = [bench_batch(backend, states, b, max(1, 20000 // b)) for b in args.batches]
+        priors, _ = backend.evaluate_batch(states)
+        print(f"{name:<12} {latency:>9.1f} " + ' '.join(f'{r:>11.0f}' for r in rates)
+              + f" {np.abs(priors - ref).max():>9.2e}")
+
+
+if __name__ == '__main__':
+    main()
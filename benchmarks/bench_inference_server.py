@@ -0,0 +1,89 @@
+"""
+bench_inference_server.py
+============================
+This script measures the evaluation throughput of 1, 4 and 16 search processes, each evaluating one
+position at a time (as NeuralMCTS does), either with its own copy of GameNet or through a shared
+batching InferenceServer. It also reports the mean batch size the server reached.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from tfg.ai.inference_server import InferenceServer, InferenceClient
+
+
+def client_worker(model_path, address, requests, start, out):
+    """ Evaluate random single positions, locally or through the server.
+
+    Args:
+        model_path (str): The checkpoint (used when address is None).
+        address (str): Address of the server, or None to evaluate locally.
+        requests (int): Number of evaluations.
+        start (Event): Set when every worker should start.
+        out (Queue): Receives the seconds spent.
+    """
+    if address is None:
+        from tfg.ai.model_registry import registry
+        from tfg.ai.inference import default_backend
+        evaluator = registry.acquire(model_path).backend(default_backend(model_path))
+    else:
+        evaluator = InferenceClient(address)
+    states = (np.random.default_rng(os.getpid()).random((requests, 1, 3, 6, 6)) < 0.3).astype(np.float32)
+    evaluator.evaluate_batch(states[0])  # warm-up / connect
+    start.wait()
+    t = time.perf_counter()
+    for s in states:
+        evaluator.evaluate_batch(s)
+    out.put(time.perf_counter() - t)
+
+
+def run(model_path, address, clients, requests):
+    """ Run concurrent client processes.
+
+    Returns:
+        float: Positions evaluated per second over all clients.
+    """
+    ctx = mp.get_context('spawn')
+    start, out = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=client_worker, args=(model_path, address, requests, start, out))
+             for _ in range(clients)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0 + 0.2 * clients)  # let every worker load and connect
+    start.set()
+    elapsed = max(out.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return clients * requests / elapsed
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the batching inference server")
+    parser.add_argument('--model', default='model.pth', help="Checkpoint (.pth or .npz)")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16], help="Client counts")
+    parser.add_argument('--requests', type=int, default=2000, help="Evaluations per client")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help="Server batching window")
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} {'local pos/s':>12} {'server pos/s':>13} {'mean batch':>11}")
+    for n in args.clients:
+        local = run(args.model, None, n, args.requests)
+        address = os.path.join(tempfile.mkdtemp(prefix='gamenet-'), 'bench.sock')
+        with InferenceServer(args.model, address, max_wait_ms=args.max_wait_ms) as server:
+            remote = run(args.model, server.address, n, args.requests)
+            stats = InferenceClient(server.address).stats()
+        print(f"{n:>7} {local:>12.0f} {remote:>13.0f} {stats['positions'] / stats['batches']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+bench_lockstep.py
+====================
+This script measures how many positions per second the network evaluates when M self-play games are
+played in lockstep by ML-MCTS bots (see tfg.ai.lockstep), for growing M. M = 1 is the sequential
+baseline: one search evaluating one position at a time.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from tfg.ai.bots import bot_from_config
+from tfg.ai.lockstep import play_lockstep, LockstepStats
+from tfg.ai.model_registry import registry, EvalCache
+from self_play import self_play_game
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark lockstep ML-MCTS self-play")
+    parser.add_argument('--bot', default='ml_mcts:iters=50,model_path=model.pth', help="Bot spec")
+    parser.add_argument('--games', type=int, nargs='+', default=[1, 4, 16, 64], help="Values of M")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    print(f"{'M':>4} {'positions/s':>12} {'mean batch':>11} {'moves/s':>9} {'cache hits':>11}")
+    for m in args.games:
+        np.random.seed(args.seed)
+        bots = [bot_from_config(args.bot) for _ in range(m)]
+        cache, _ = bots[0].evaluator()
+        # start every run from an empty cache, so runs are comparable
+        active = registry.acquire(bots[0].model_path, bots[0].device)
+        active.cache = EvalCache(cache.max_entries)
+        stats = LockstepStats()
+        play_lockstep([self_play_game(b) for b in bots], stats)
+        d = stats.to_dict()
+        print(f"{m:>4} {d['positions_per_second']:>12.0f} {d['mean_batch']:>11.1f} "
+              f"{stats.searches / stats.seconds:>9.1f} {stats.cache_hits:>11}")
+
+
+if __name__ == '__main__':
+    main()
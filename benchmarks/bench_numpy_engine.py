@@ -0,0 +1,84 @@
+"""
+bench_numpy_engine.py
+========================
+This script compares a worker serving GameNet with torch against one serving the NumPy export: the
+cold-start time (interpreter start, imports, loading the weights and the first evaluation) and the
+peak resident memory of each, measured in fresh subprocesses, plus the steady-state evaluation
+latency of both engines.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+WORKER = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from tfg.ai.bots import make_bot
+from tfg.game.board import Board
+bot = make_bot('ml_mcts', iters=1, model_path=sys.argv[1])
+board = Board()
+board.place_fleet()
+bot.run(board)
+cold = time.perf_counter() - start
+evaluate = bot._active.backend(bot.backend).evaluate
+t = time.perf_counter()
+for _ in range(int(sys.argv[2])):
+    evaluate(board)
+latency = (time.perf_counter() - t) / int(sys.argv[2])
+try:  # ru_maxrss survives exec on Linux and would include the parent's memory
+    with open('/proc/self/status') as f:
+        peak = next(int(l.split()[1]) for l in f if l.startswith('VmHWM'))
+except OSError:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'cold_start': cold, 'latency': latency, 'torch': 'torch' in sys.modules,
+                  'max_rss_mb': peak / 1024}))
+'''
+
+
+def run_worker(model_path, repeats):
+    """ Start a fresh worker process and measure it.
+
+    Args:
+        model_path (str): The checkpoint served by the worker (.pth or .npz).
+        repeats (int): Single-position evaluations timed after the cold start.
+
+    Returns:
+        dict: Cold-start seconds, seconds per evaluation, whether torch was imported and peak RSS.
+    """
+    out = subprocess.run([sys.executable, '-c', WORKER, model_path, str(repeats)], cwd=ROOT,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Compare torch and NumPy GameNet workers")
+    parser.add_argument('--model', default=os.path.join(ROOT, 'model.pth'), help="Torch checkpoint")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes per engine")
+    parser.add_argument('--repeats', type=int, default=2000, help="Evaluations timed per process")
+    args = parser.parse_args()
+
+    import torch
+    from tfg.ai.numpy_net import export_npz
+
+    with tempfile.TemporaryDirectory() as tmp:
+        npz = os.path.join(tmp, 'model.npz')
+        export_npz(torch.load(args.model, map_location='cpu'), npz)
+        print(f"{'engine':<8} {'cold start s':>12} {'eval us':>8} {'peak RSS MB':>12} {'torch':>6}")
+        for engine, path in (('torch', args.model), ('numpy', npz)):
+            runs = [run_worker(path, args.repeats) for _ in range(args.runs)]
+            best = min(runs, key=lambda r: r['cold_start'])
+            print(f"{engine:<8} {best['cold_start']:>12.3f} {best['latency'] * 1e6:>8.1f} "
+                  f"{max(r['max_rss_mb'] for r in runs):>12.1f} {str(best['torch']):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+bench_result_writer.py
+=========================
+This script measures how fast simulated game results can be recorded: one commit per result (the old
+behaviour of app.py and simulate.py) against the batched ResultWriter. The per-result baseline runs on
+a sample and is reported as a rate, since committing every row of a large run takes minutes.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+
+from tfg.server.models import db, add_results
+from tfg.server.result_writer import ResultWriter
+
+WINNERS = ('MCTS', 'NeuralMCTS')
+
+
+def fresh_engine(directory, name):
+    """ Create an empty results database.
+
+    Args:
+        directory (str): Directory of the database file.
+        name (str): Name of the database file.
+
+    Returns:
+        Engine: A SQLAlchemy engine bound to the new database.
+    """
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    db.metadata.create_all(engine)
+    return engine
+
+
+def bench_per_commit(engine, rows):
+    """ Insert results with one transaction per result.
+
+    Args:
+        engine (Engine): The results database.
+        rows (int): Number of results to insert.
+
+    Returns:
+        float: Results inserted per second.
+    """
+    start = time.perf_counter()
+    for _ in range(rows):
+        with engine.begin() as conn:
+            add_results(conn, [{'game_mode': 'mcts_vs_ml_mcts', 'winner': random.choice(WINNERS),
+                                'duration': random.uniform(1, 120)}])
+    return rows / (time.perf_counter() - start)
+
+
+def bench_writer(engine, rows, batch_size):
+    """ Insert results through a ResultWriter, including the final flush.
+
+    Args:
+        engine (Engine): The results database.
+        rows (int): Number of results to insert.
+        batch_size (int): Batch size of the writer.
+
+    Returns:
+        tuple: Results inserted per second and the writer's final metrics.
+    """
+    start = time.perf_counter()
+    with ResultWriter(engine, batch_size=batch_size, flush_interval=1.0) as writer:
+        for _ in range(rows):
+            writer.record('mcts_vs_ml_mcts', random.choice(WINNERS), random.uniform(1, 120))
+    return rows / (time.perf_counter() - start), writer.stats()
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark batched vs per-row result recording")
+    parser.add_argument('--rows', type=int, default=100000, help="Results inserted by the writer")
+    parser.add_argument('--baseline-rows', type=int, default=2000,
+                        help="Results inserted one commit at a time")
+    parser.add_argument('--batch-size', type=int, default=500, help="Writer batch size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rate_commit = bench_per_commit(fresh_engine(tmp, 'per_commit.db'), args.baseline_rows)
+        rate_writer, stats = bench_writer(fresh_engine(tmp, 'writer.db'), args.rows, args.batch_size)
+
+    print(f"per-commit : {rate_commit:10.0f} results/s ({args.baseline_rows} rows)")
+    print(f"writer     : {rate_writer:10.0f} results/s ({args.rows} rows, {stats['batches']} batches, "
+          f"{stats['avg_flush_ms']:.1f} ms/flush)")
+    print(f"speed-up   : {rate_writer / rate_commit:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
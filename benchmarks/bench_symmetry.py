@@ -0,0 +1,95 @@
+"""
+bench_symmetry.py
+====================
+This script measures what the board symmetries (see tfg.game.symmetry) buy:
+
+1. sample efficiency: GameNet is trained on a growing fraction of data.jsonl, with and without
+   symmetry augmentation, and its loss is measured on a fixed held-out part of the file;
+2. search: lockstep self-play games are played with and without the symmetric evaluation cache, and
+   the network evaluations per move are compared.
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from tfg.ai.bots import bot_from_config
+from tfg.ai.lockstep import play_lockstep, LockstepStats
+from tfg.ai.model_registry import registry, EvalCache
+from tfg.ai.network import GameNet
+from self_play import self_play_game
+from train import TensorGameDataset, random_symmetry
+
+
+def loss(model, x, pi, z):
+    logits, v = model(x)
+    return - (pi * F.log_softmax(logits, dim=1)).sum(dim=1).mean() + F.mse_loss(v.squeeze(-1), z)
+
+
+def held_out_loss(ds, trn, val, augment, steps, batch_size, seed):
+    """ Train a fresh GameNet for a number of steps on trn and return its loss on val."""
+    torch.manual_seed(seed)
+    gen = torch.Generator().manual_seed(seed)
+    model = GameNet()
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    model.train()
+    for _ in range(steps):
+        x, pi, z = ds.__getitems__(trn[torch.randint(len(trn), (batch_size,), generator=gen)])
+        if augment:
+            x, pi = random_symmetry(x, pi, gen)
+        optimizer.zero_grad()
+        loss(model, x, pi, z).backward()
+        optimizer.step()
+    model.eval()
+    with torch.no_grad():
+        return loss(model, *ds.__getitems__(val)).item()
+
+
+def search_positions(spec, games, symmetry, seed):
+    """ Play lockstep self-play games and return the network evaluations per move."""
+    np.random.seed(seed)
+    bots = [bot_from_config(f'{spec},symmetry={int(symmetry)}') for _ in range(games)]
+    active = registry.acquire(bots[0].model_path, bots[0].device)
+    active.cache = EvalCache(active.cache.max_entries)  # start from an empty cache
+    stats = LockstepStats()
+    play_lockstep([self_play_game(b) for b in bots], stats)
+    return stats.positions / stats.searches
+
+
+def main():
+    """Main function to parse arguments and run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Measure the gains of the board symmetries")
+    parser.add_argument('--fractions', type=float, nargs='+', default=[0.125, 0.25, 0.5, 1.0],
+                        help="Fractions of the training part used")
+    parser.add_argument('--steps', type=int, default=300, help="Training steps per run")
+    parser.add_argument('--batch-size', type=int, default=64, help="Batch size")
+    parser.add_argument('--bot', default='ml_mcts:iters=50,model_path=model.pth', help="Bot spec")
+    parser.add_argument('--games', type=int, default=8, help="Self-play games of the search comparison")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    ds = TensorGameDataset.from_jsonl(os.path.join(ROOT, 'data.jsonl'))
+    perm = torch.randperm(len(ds), generator=torch.Generator().manual_seed(args.seed))
+    val, trn = perm[:len(ds) // 5], perm[len(ds) // 5:]
+    print(f"held-out loss after {args.steps} steps ({len(val)} held-out records)")
+    print(f"{'records':>8} {'plain':>8} {'augmented':>10}")
+    for fraction in args.fractions:
+        part = trn[:max(1, int(len(trn) * fraction))]
+        plain, augmented = (held_out_loss(ds, part, val, a, args.steps, args.batch_size, args.seed)
+                            for a in (False, True))
+        print(f"{len(part):>8} {plain:>8.4f} {augmented:>10.4f}")
+
+    plain, symmetric = (search_positions(args.bot, args.games, s, args.seed) for s in (False, True))
+    print(f"network evaluations per move: {plain:.1f} plain, {symmetric:.1f} with the symmetric cache")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+pipeline.py
+==================
+This script runs the continuous self-play -> training -> gating loop, with three kinds of concurrent
+stages sharing a run directory:
+
+- self-play workers play lockstep ML-MCTS games with the incumbent network (incumbent.pth) and append
+  their records to the replay buffer (see tfg.data.replay), which keeps the most recent records;
+  the model registry switches them to a newly promoted incumbent between two searches;
+- the trainer samples batches from the replay buffer, and after every steps_per_candidate steps
+  writes its network as the candidate (candidate.pth);
+- the gate plays every new candidate against the incumbent (see tfg.ai.lockstep.match), and promotes
+  it by replacing incumbent.pth if it scores above the threshold. Matches are logged to gate.jsonl.
+
+No stage waits on another: self-play always plays the current incumbent, the trainer trains on
+whatever the buffer holds, and the gate judges the latest candidate. Every file is replaced atomically
+(see tfg.ai.checkpoint), so no stage ever reads a partial network, and the trainer checkpoints its
+state so a restarted pipeline continues where it stopped. Run it with:
+
+    python pipeline.py runs/pipeline --init model.pth --duration 3600
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+
+import numpy as np
+import torch
+
+from tfg.ai.bots import make_bot
+from tfg.ai.checkpoint import atomic_save, save_checkpoint, load_checkpoint
+from tfg.ai.lockstep import play_lockstep, match
+from tfg.ai.model_registry import LoadedModel
+from tfg.ai.network import GameNet
+from tfg.data.replay import ReplayBuffer
+from self_play import self_play_game
+from train import loss_fn, random_symmetry
+
+DEFAULTS = {
+    'iters': 100,              # ML-MCTS iterations per move (self-play and gating)
+    'parallel_games': 8,       # games played in lockstep by a self-play worker or the gate
+    'capacity': 100000,        # records kept in the replay buffer
+    'min_records': 2000,       # records in the buffer before training starts
+    'batch_size': 64,
+    'lr': 1e-3,
+    'steps_per_candidate': 500,
+    'gate_games': 40,
+    'threshold': 0.55,         # score a candidate needs against the incumbent to be promoted
+    'poll': 2.0,               # seconds between checks of a stage with nothing to do
+    'seed': 0,
+}
+
+
+def incumbent_path(run_dir):
+    """ Path of the served network of a run."""
+    return os.path.join(run_dir, 'incumbent.pth')
+
+
+def candidate_path(run_dir):
+    """ Path of the latest network of the trainer."""
+    return os.path.join(run_dir, 'candidate.pth')
+
+
+def replay_buffer(run_dir, options):
+    """ The replay buffer of a run."""
+    return ReplayBuffer(os.path.join(run_dir, 'replay'), options['capacity'])
+
+
+def _read_weights(path):
+    """ Read a state dict together with its version (hash of the file, as in tfg.ai.model_registry)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return torch.load(io.BytesIO(data), map_location='cpu'), hashlib.sha1(data).hexdigest()[:12]
+
+
+def self_play_round(buffer, bots):
+    """ Play one self-play game per bot in lockstep and add their records to the buffer as one shard.
+
+    Args:
+        buffer (ReplayBuffer): The replay buffer.
+        bots (list): ML-MCTS bots, one per game.
+
+    Returns:
+        LockstepStats: The counters of the round.
+    """
+    results, stats = play_lockstep([self_play_game(b) for b in bots])
+    buffer.add([rec for records in results for rec in records], model=bots[0].model_version)
+    return stats
+
+
+def train_candidate(net, optimizer, buffer, steps, batch_size, rng):
+    """ Train a network on batches sampled from the replay buffer (with symmetry augmentation).
+
+    Args:
+        net (GameNet): The network, trained in place.
+        optimizer (torch.optim.Optimizer): Its optimizer.
+        buffer (ReplayBuffer): The replay buffer.
+        steps (int): Optimizer steps.
+        batch_size (int): Records per batch.
+        rng (random.Random): Random generator of the sampling.
+
+    Returns:
+        float: The mean training loss.
+    """
+    net.train()
+    total = 0.0
+    for _ in range(steps):
+        x, pi, z = (torch.from_numpy(a) for a in buffer.sample(batch_size, rng)[:3])
+        x, pi = random_symmetry(x, pi)
+        logits, v = net(x)
+        loss = loss_fn(logits, v, pi, z)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        total += loss.item()
+    net.eval()
+    return total / max(steps, 1)
+
+
+def gate(run_dir, options):
+    """ Play the candidate against the incumbent and promote it if it scores above the threshold.
+
+    Args:
+        run_dir (str): The run directory.
+        options (dict): Pipeline options (see DEFAULTS).
+
+    Returns:
+        dict: The match result with the candidate and incumbent versions and whether the candidate
+            was promoted (also appended to gate.jsonl).
+    """
+    candidate, candidate_version = _read_weights(candidate_path(run_dir))
+    incumbent, incumbent_version = _read_weights(incumbent_path(run_dir))
+    # one shared model (and evaluation cache) per side, so the games' evaluations are batched
+    models = [LoadedModel(GameNet.from_state_dict(w).eval(), version)
+              for w, version in ((candidate, candidate_version), (incumbent, incumbent_version))]
+    pairs = [tuple(make_bot('ml_mcts', iters=options['iters'], model=m) for m in models)
+             for _ in range(options['parallel_games'])]
+    result = match(pairs, options['gate_games'])
+    promoted = result['score'] > options['threshold']
+    if promoted:
+        atomic_save(candidate, incumbent_path(run_dir))
+    result.update(time=time.time(), candidate=candidate_version, incumbent=incumbent_version,
+                  promoted=promoted)
+    with open(os.path.join(run_dir, 'gate.jsonl'), 'a') as f:
+        f.write(json.dumps(result) + '\n')
+    return result
+
+
+def self_play_worker(run_dir, rank, options, stop):
+    """ Self-play stage: play rounds with the incumbent until stop is set.
+
+    Args:
+        run_dir (str): The run directory.
+        rank (int): Index of the worker (offsets its seed).
+        options (dict): Pipeline options.
+        stop (multiprocessing.Event): Set to end the stage.
+    """
+    torch.set_num_threads(1)
+    random.seed(options['seed'] + rank)
+    np.random.seed(options['seed'] + rank)
+    buffer = replay_buffer(run_dir, options)
+    bots = [make_bot('ml_mcts', iters=options['iters'], model_path=incumbent_path(run_dir))
+            for _ in range(options['parallel_games'])]
+    while not stop.is_set():
+        stats = self_play_round(buffer, bots)
+        print(f"[self-play {rank}] {stats.games} games with {bots[0].model_version}, "
+              f"{stats.positions_per_second:.0f} positions/s, buffer {len(buffer)} records", flush=True)
+
+
+def trainer_worker(run_dir, options, stop):
+    """ Training stage: write a new candidate every steps_per_candidate steps until stop is set. It
+    starts from its checkpoint if the run has one, from the incumbent otherwise.
+
+    Args:
+        run_dir (str): The run directory.
+        options (dict): Pipeline options.
+        stop (multiprocessing.Event): Set to end the stage.
+    """
+    torch.set_num_threads(1)
+    torch.manual_seed(options['seed'])
+    checkpoint_dir = os.path.join(run_dir, 'trainer')
+    state = load_checkpoint(checkpoint_dir)
+    weights = state['model'] if state else _read_weights(incumbent_path(run_dir))[0]
+    net = GameNet.from_state_dict(weights)
+    optimizer = torch.optim.Adam(net.parameters(), lr=options['lr'])
+    candidates = 0
+    if state:
+        optimizer.load_state_dict(state['optimizer'])
+        candidates = state['candidates']
+    rng = random.Random(options['seed'] + candidates)
+    buffer = replay_buffer(run_dir, options)
+    while not stop.is_set():
+        if len(buffer) < options['min_records']:
+            stop.wait(options['poll'])
+            continue
+        loss = train_candidate(net, optimizer, buffer, options['steps_per_candidate'],
+                               options['batch_size'], rng)
+        candidates += 1
+        atomic_save(net.state_dict(), candidate_path(run_dir))
+        save_checkpoint(checkpoint_dir, 'last', {'model': net.state_dict(), 'optimizer': optimizer.state_dict(),
+                                                 'candidates': candidates})
+        print(f"[trainer] candidate {candidates}: loss {loss:.4f}", flush=True)
+
+
+def gate_worker(run_dir, options, stop):
+    """ Gating stage: judge every new candidate until stop is set.
+
+    Args:
+        run_dir (str): The run directory.
+        options (dict): Pipeline options.
+        stop (multiprocessing.Event): Set to end the stage.
+    """
+    torch.set_num_threads(1)
+    np.random.seed(options['seed'] + 1_000_003)
+    judged = None
+    while not stop.is_set():
+        signature = None
+        if os.path.exists(candidate_path(run_dir)):
+            st = os.stat(candidate_path(run_dir))
+            signature = st.st_mtime_ns, st.st_size, st.st_ino
+        if signature is None or signature == judged:
+            stop.wait(options['poll'])
+            continue
+        judged = signature
+        result = gate(run_dir, options)
+        print(f"[gate] candidate {result['candidate']} scored {result['score']:.2f} against "
+              f"{result['incumbent']}: {'promoted' if result['promoted'] else 'rejected'}", flush=True)
+
+
+def run_pipeline(run_dir, workers=1, duration=None, init_model=None, **options):
+    """ Run the pipeline until duration elapses or the process is interrupted.
+
+    Args:
+        run_dir (str): The run directory (created if needed; an existing run is continued).
+        workers (int, optional): Self-play worker processes. Defaults to 1.
+        duration (float, optional): Seconds to run. Defaults to None (until interrupted).
+        init_model (str, optional): Weights of the first incumbent of a new run. Defaults to None
+            (a randomly initialized GameNet).
+        **options: Pipeline options overriding DEFAULTS.
+
+    Raises:
+        ValueError: If an option is unknown.
+    """
+    unknown = set(options) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown pipeline options: {', '.join(sorted(unknown))}")
+    options = {**DEFAULTS, **options}
+    os.makedirs(run_dir, exist_ok=True)
+    if not os.path.exists(incumbent_path(run_dir)):
+        if init_model:
+            weights = torch.load(init_model, map_location='cpu')
+        else:
+            torch.manual_seed(options['seed'])
+            weights = GameNet().state_dict()
+        atomic_save(weights, incumbent_path(run_dir))
+
+    ctx = mp.get_context('spawn')
+    stop = ctx.Event()
+    stages = [ctx.Process(target=self_play_worker, args=(run_dir, rank, options, stop))
+              for rank in range(workers)]
+    stages += [ctx.Process(target=trainer_worker, args=(run_dir, options, stop)),
+               ctx.Process(target=gate_worker, args=(run_dir, options, stop))]
+    for p in stages:
+        p.start()
+    try:
+        deadline = None if duration is None else time.monotonic() + duration
+        while all(p.is_alive() for p in stages):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # stages finish their current round, match or candidate before stopping
+        stop.set()
+        for p in stages:
+            p.join()
+
+
+def main():
+    """Main function to parse arguments and run the pipeline.
+    """
+    parser = argparse.ArgumentParser(description="Continuous self-play, training and gating")
+    parser.add_argument('run_dir', help="Run directory (an existing run is continued)")
+    parser.add_argument('--init', default=None, help="Weights of the first incumbent, e.g. model.pth")
+    parser.add_argument('--workers', type=int, default=1, help="Self-play worker processes")
+    parser.add_argument('--duration', type=float, default=None, help="Seconds to run (default: forever)")
+    for name, value in DEFAULTS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value)
+    args = vars(parser.parse_args())
+    run_pipeline(args.pop('run_dir'), workers=args.pop('workers'), duration=args.pop('duration'),
+                 init_model=args.pop('init'), **args)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,32 @@ self_play.py
 ==================
 This script generates self-play data for the Battleship game using MCTS,
 balances the dataset, and saves it in JSON Lines format.
+With an ML-MCTS bot (--bot ml_mcts) several games can be played in lockstep (--parallel-games), so
+their network evaluations are batched (see tfg.ai.lockstep).
+
+With --out-dir the games are split into shards played by a pool of worker processes (--workers).
+Each shard has its own seed and is streamed to its own JSON Lines file as its games finish; a
+finished shard gets a .done marker, so an interrupted run resumes where it stopped. The shards are
+then balanced into --out in constant memory (see tfg.data.balance).
 """
 
+import argparse
+import glob
 import json
+import multiprocessing as mp
+import os
 import random
+import time
+
+import numpy as np
 from tfg.game.board      import Board
-from tfg.algorithms.mcts import MCTS
+from tfg.ai.bots         import make_bot, bot_from_config
 
 #  Configurable parameters 
 NUM_GAMES  = 500 # total number of games to generate
 ITERATIONS = 200 # MCTS simulations per move
 OUT_FILE   = 'data_balanced.jsonl'
+SHARD_GAMES = 25 # games per shard of a sharded run
 
 def play_one_game(mcts):
     """ Play a single game of Battleship using MCTS for self-play.
@@ -59,6 +74,38 @@ def play_one_game(mcts):
 
     return records
 
+def self_play_game(bot):
+    """ Self-play game for the lockstep driver (see tfg.ai.lockstep): the same bot plays both sides.
+
+    Args:
+        bot (NeuralMCTS): The bot choosing every move.
+
+    Returns:
+        list: A list of records, each containing the state, policy distribution (pi), and outcome (z).
+    """
+    boardA = Board()
+    boardB = Board()
+    boardA.place_fleet()
+    boardB.place_fleet()
+    bot.root = None
+
+    trajectory = []
+    current = 'A'
+    while True:
+        target_board = boardB if current == 'A' else boardA
+        state = target_board.to_tensor().tolist()
+        move, pi = yield bot, target_board
+        trajectory.append((state, pi, current))
+
+        target_board.shoot(*move)
+        if target_board.has_won():
+            winner = current
+            break
+        current = 'B' if current == 'A' else 'A'
+
+    return [{'state': state, 'pi': pi, 'z': 1 if player == winner else -1}
+            for state, pi, player in trajectory]
+
 def balance_records(records):
     """ Balance the dataset by sampling an equal number of winning and losing records.
 
@@ -77,25 +124,43 @@ def balance_records(records):
 
 def generate_and_balance(num_games=NUM_GAMES,
                          iters=ITERATIONS,
-                         out_file=OUT_FILE):
+                         out_file=OUT_FILE,
+                         bot=None,
+                         parallel_games=1):
     """ Generate self-play data for Battleship and balance the dataset.
 
     Args:
         num_games (int): Total number of games to generate.
         iters (int): Number of MCTS iterations per move.
         out_file (str): Output file path for the balanced dataset in JSON Lines format.
+        bot (str, optional): Bot spec (see tfg.ai.bots) playing the games, e.g. 'ml_mcts'.
+            Defaults to None (plain MCTS, one game at a time).
+        parallel_games (int, optional): Games played in lockstep by an ML-MCTS bot. Defaults to 1.
     """
     all_records = []
 
-    for i in range(num_games):
-        # Instantiate a fresh MCTS for each game
-        mcts = MCTS(iterations=iters)
-        game_recs = play_one_game(mcts)
-        all_records.extend(game_recs)
+    if bot is None:
+        for i in range(num_games):
+            # Instantiate a fresh MCTS for each game
+            mcts = make_bot('mcts', iters=iters)
+            game_recs = play_one_game(mcts)
+            all_records.extend(game_recs)
 
-        if (i + 1) % 100 == 0:
-            print(f" Generated {i+1}/{num_games} games, "
-                  f"{len(all_records)} total records so far")
+            if (i + 1) % 100 == 0:
+                print(f" Generated {i+1}/{num_games} games, "
+                      f"{len(all_records)} total records so far")
+    else:
+        from tfg.ai.lockstep import play_lockstep, LockstepStats
+        bots = [bot_from_config(bot, iters=iters) for _ in range(min(parallel_games, num_games))]
+        stats = LockstepStats()
+        for first in range(0, num_games, len(bots)):
+            group = bots[:num_games - first]
+            results, _ = play_lockstep([self_play_game(b) for b in group], stats)
+            for game_recs in results:
+                all_records.extend(game_recs)
+            print(f" Generated {first + len(group)}/{num_games} games, "
+                  f"{len(all_records)} total records so far "
+                  f"({stats.positions_per_second:.0f} positions/s)")
 
     print("Balancing dataset")
     balanced = balance_records(all_records)
@@ -108,5 +173,152 @@ def generate_and_balance(num_games=NUM_GAMES,
 
     print("Self-play generation and balancing completed")
 
+def shard_path(out_dir, index):
+    """ Path of a shard of a sharded run.
+
+    Args:
+        out_dir (str): Directory of the run.
+        index (int): Index of the shard.
+
+    Returns:
+        str: The path of the shard's JSON Lines file (its marker replaces .jsonl with .done).
+    """
+    return os.path.join(out_dir, f'shard-{index:05d}.jsonl')
+
+def play_shard(task):
+    """ Play the games of one shard, appending the records of every game to the shard file as soon as
+    the game ends, then write the shard's .done marker.
+
+    Args:
+        task (dict): The shard: index, games, seed, bot, iters, parallel_games and out_dir.
+
+    Returns:
+        dict: The shard index, games played, records written and seconds spent.
+    """
+    random.seed(task['seed'])
+    np.random.seed(task['seed'])
+    start = time.time()
+    path = shard_path(task['out_dir'], task['index'])
+    bot_spec, games = task['bot'], task['games']
+    records = 0
+    with open(path, 'w') as f:
+        def write(game_recs):
+            nonlocal records
+            f.write(''.join(json.dumps(rec) + '\n' for rec in game_recs))
+            f.flush()
+            records += len(game_recs)
+
+        bots = [bot_from_config(bot_spec, iters=task['iters'])
+                for _ in range(min(task['parallel_games'], games))]
+        if len(bots) > 1 and hasattr(bots[0], 'search'):
+            from tfg.ai.lockstep import play_lockstep
+            for first in range(0, games, len(bots)):
+                play_lockstep([self_play_game(b) for b in bots[:games - first]],
+                              on_result=lambda _, game_recs: write(game_recs))
+        else:
+            for _ in range(games):
+                write(play_one_game(bot_from_config(bot_spec, iters=task['iters'])))
+
+    result = {'shard': task['index'], 'games': games, 'records': records,
+              'seconds': time.time() - start}
+    with open(path[:-len('.jsonl')] + '.done', 'w') as f:
+        json.dump(result, f)
+    return result
+
+def generate_shards(out_dir,
+                    num_games=NUM_GAMES,
+                    iters=ITERATIONS,
+                    workers=None,
+                    shard_games=SHARD_GAMES,
+                    seed=0,
+                    bot='mcts',
+                    parallel_games=1,
+                    log=print):
+    """ Generate self-play data as shards played by a pool of worker processes. Shards already
+    marked done in out_dir are kept, so calling this again after an interruption resumes the run.
+
+    Args:
+        out_dir (str): Directory receiving the shards.
+        num_games (int): Total number of games to generate.
+        iters (int): Number of MCTS iterations per move.
+        workers (int, optional): Worker processes. Defaults to None (one per CPU).
+        shard_games (int): Games per shard.
+        seed (int): Base seed; shard i is played with seed + i, whichever worker plays it.
+        bot (str): Bot spec (see tfg.ai.bots) playing the games.
+        parallel_games (int): Games played in lockstep by an ML-MCTS bot within a worker.
+        log (callable, optional): Called with progress messages. Defaults to print.
+
+    Raises:
+        ValueError: If out_dir holds a run made with other parameters.
+
+    Returns:
+        dict: Games, records and seconds of the shards played by this call, plus the number of
+            shards skipped because they were already done.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {'num_games': num_games, 'iters': iters, 'shard_games': shard_games,
+                'seed': seed, 'bot': bot}
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError(f'{out_dir} holds a run made with other parameters: {previous}')
+    else:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+    tasks = []
+    for index, first in enumerate(range(0, num_games, shard_games)):
+        if not os.path.exists(shard_path(out_dir, index)[:-len('.jsonl')] + '.done'):
+            tasks.append({'index': index, 'games': min(shard_games, num_games - first),
+                          'seed': seed + index, 'bot': bot, 'iters': iters,
+                          'parallel_games': parallel_games, 'out_dir': out_dir})
+    skipped = -(-num_games // shard_games) - len(tasks)
+    if skipped:
+        log(f"Resuming: {skipped} shards already done")
+
+    total = sum(t['games'] for t in tasks)
+    done = {'games': 0, 'records': 0, 'seconds': 0.0, 'skipped': skipped}
+    start = time.time()
+    workers = min(workers or os.cpu_count() or 1, len(tasks)) or 1
+    with mp.get_context('spawn').Pool(workers) as pool:
+        for result in pool.imap_unordered(play_shard, tasks):
+            done['games'] += result['games']
+            done['records'] += result['records']
+            elapsed = time.time() - start
+            rate = done['games'] / elapsed
+            log(f" Shard {result['shard']} done: {done['games']}/{total} games, "
+                f"{rate:.2f} games/s, {done['records'] / elapsed:.0f} positions/s, "
+                f"ETA {(total - done['games']) / rate:.0f}s")
+    done['seconds'] = time.time() - start
+    return done
+
+def main():
+    """Main function to parse arguments and generate self-play data.
+    """
+    parser = argparse.ArgumentParser(description="Generate balanced self-play data")
+    parser.add_argument('--games', type=int, default=NUM_GAMES, help="Number of games")
+    parser.add_argument('--iters', type=int, default=ITERATIONS, help="Simulations per move")
+    parser.add_argument('--out', default=OUT_FILE, help="Output JSON Lines file")
+    parser.add_argument('--bot', default=None, help="Bot spec, e.g. 'ml_mcts' (default: plain MCTS)")
+    parser.add_argument('--parallel-games', type=int, default=1,
+                        help="Games played in lockstep by an ML-MCTS bot")
+    parser.add_argument('--out-dir', default=None,
+                        help="Play shards into this directory with a worker pool, then balance them")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPUs)")
+    parser.add_argument('--shard-games', type=int, default=SHARD_GAMES, help="Games per shard")
+    parser.add_argument('--seed', type=int, default=0, help="Base seed of the shards")
+    args = parser.parse_args()
+    if args.out_dir:
+        from tfg.data.balance import balance_files
+        generate_shards(args.out_dir, args.games, args.iters, args.workers, args.shard_games,
+                        args.seed, args.bot or 'mcts', args.parallel_games)
+        shards = sorted(glob.glob(os.path.join(args.out_dir, 'shard-*.jsonl')))
+        stats = balance_files(shards, args.out, seed=args.seed)
+        print(f"Wrote {2 * stats['written_per_outcome']} balanced records to {args.out}")
+    else:
+        generate_and_balance(args.games, args.iters, args.out, args.bot, args.parallel_games)
+
 if __name__ == '__main__':
-    generate_and_balance()
+    main()
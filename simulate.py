@@ -3,26 +3,50 @@ simulate.py
 ==================
 This script simulates a series of games between MCTS and ML-MCTS bots,
 records the results, and saves them to a database.
+Bots are built with the factory in tfg.ai.bots and results are written through a plain SQLAlchemy
+engine, so the web application is never imported. With --lockstep M, M games are played at once and
+the network evaluations of their ML-MCTS searches are batched (see tfg.ai.lockstep).
 """
 
 import argparse
 import time
-from app import app, db, GameResult, vanilla_mcts, ml_mcts
+from sqlalchemy import create_engine
+from tfg.ai.bots import bot_from_config, parse_bot_spec
+from tfg.server.models import prepare_database
+from tfg.server.result_writer import ResultWriter
 from tfg.game.board import Board
 
-def play_game(bot1, bot2, iters):
+ITERATIONS = 100 # simulations per move of a bot whose spec sets none
+
+def build_bot(spec, args):
+    """Build one of the two bots: its spec's iters apply unless --iters is given, and ITERATIONS if
+    neither sets them.
+
+    Args:
+        spec (str): The bot spec, e.g. 'mcts:iters=50'.
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        object: The bot.
+    """
+    name, options = parse_bot_spec(spec)
+    return bot_from_config({'bot': name, 'iters': ITERATIONS, **options},
+                           iters=args.iters, opening_book=args.opening_book)
+
+def play_game(bot1, bot2):
     """Play a game between two bots and return the winner and duration.
 
     Args:
-        bot1 (_type_): The first bot to play.
-        bot2 (_type_): The second bot to play.
-        iters (int): Number of iterations for MCTS simulations.
+        bot1 (object): The first bot to play.
+        bot2 (object): The second bot to play.
 
     Returns:
         tuple: A tuple containing the winner's class name and the duration of the game in seconds.
     """
     b1, b2 = Board(), Board()
     b1.place_fleet(); b2.place_fleet()
+    # drop search trees kept from the previous game
+    bot1.root = bot2.root = None
     turn   = 1
     start  = time.time()
 
@@ -49,21 +73,56 @@ def main():
     """
     parser = argparse.ArgumentParser(description="Simulate MCTS vs ML-MCTS and record to DB")
     parser.add_argument('--games', type=int, default=100, help="Number of games to simulate")
-    parser.add_argument('--iters', type=int, default=100, help="Simulations per move")
+    parser.add_argument('--iters', type=int, default=None,
+                        help=f"Simulations per move of both bots, overriding their specs "
+                             f"(default: the spec's iters, else {ITERATIONS})")
+    parser.add_argument('--bot1', default='mcts', help="First bot, e.g. 'mcts' or 'mcts:iters=50'")
+    parser.add_argument('--bot2', default='ml_mcts', help="Second bot, e.g. 'ml_mcts:c_puct=1.5'")
+    parser.add_argument('--opening-book', default=None, help="Opening book (.npz) used by both bots")
+    parser.add_argument('--db', default='instance/game.db', help="SQLite database receiving results")
+    parser.add_argument('--lockstep', type=int, default=1, help="Games played at once")
     args = parser.parse_args()
 
-    # Push a Flask app context so SQLAlchemy knows which db to use
-    with app.app_context():
-        for i in range(1, args.games + 1):
-            winner, dur = play_game(vanilla_mcts, ml_mcts, args.iters)
-            gr = GameResult(
-                game_mode='mcts_vs_ml_mcts',
-                winner=winner,
-                duration=dur
-            )
-            db.session.add(gr)
-            db.session.commit()
-            print(f"[{i}/{args.games}] Winner: {winner}, duration {dur:.2f}s")
+    engine = create_engine(f'sqlite:///{args.db}')
+    prepare_database(engine)
+    with ResultWriter(engine) as writer:
+        if args.lockstep <= 1:
+            bot1 = build_bot(args.bot1, args)
+            bot2 = build_bot(args.bot2, args)
+            for i in range(1, args.games + 1):
+                winner, dur = play_game(bot1, bot2)
+                writer.record('mcts_vs_ml_mcts', winner, dur)
+                print(f"[{i}/{args.games}] Winner: {winner}, duration {dur:.2f}s")
+        else:
+            play_lockstep_games(args, writer)
+
+def play_lockstep_games(args, writer):
+    """Play the games in groups of args.lockstep, each game with its own pair of bots.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+        writer (ResultWriter): Receives the results.
+    """
+    from tfg.ai.lockstep import play_lockstep, duel, LockstepStats
+
+    m = min(args.lockstep, args.games)
+    pairs = [(build_bot(args.bot1, args), build_bot(args.bot2, args))
+             for _ in range(m)]
+    stats = LockstepStats()
+    done = 0
+
+    def record(_, result):
+        nonlocal done
+        done += 1
+        winner, dur = result
+        writer.record('mcts_vs_ml_mcts', winner, dur)
+        print(f"[{done}/{args.games}] Winner: {winner}, duration {dur:.2f}s")
+
+    for first in range(0, args.games, m):
+        group = pairs[:args.games - first]
+        play_lockstep([duel(b1, b2) for b1, b2 in group], stats, on_result=record)
+    print(f"{stats.positions} positions evaluated in {stats.batches} batches, "
+          f"{stats.positions_per_second:.0f} positions/s")
 
 if __name__ == '__main__':
     main()
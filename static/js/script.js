@@ -5,7 +5,18 @@
  * It handles game initialization, user interactions, and rendering of game boards.
  */
     
-  let autoMoveInterval = null;
+  /**
+   * Timer that schedules the next automatic move in MCTS vs ML-MCTS mode.
+   *
+   * @type {*}
+   */
+  let autoMoveTimer = null;
+  /**
+   * Server-sent event stream of the running MCTS vs ML-MCTS match.
+   *
+   * @type {EventSource}
+   */
+  let matchStream = null;
   /**
    * Indicates whether the game is in manual ship placement phase.
    *
@@ -59,6 +70,75 @@
     };
   });
 
+  /**
+   * Polls an AI job until it finishes and resolves with the resulting game state.
+   * Uses long-polling so the server answers as soon as the job is done.
+   *
+   * @param {*} jobId 
+   * @returns {Promise<*>} 
+   */
+  function pollJob(jobId) {
+    return fetch(`/jobs/${jobId}?wait=10`)
+      .then(r => r.json())
+      .then(j => {
+        if (j.status === 'done') return j.result;
+        if (j.status === 'failed' || j.status === 'unknown') {
+          throw new Error(j.error || `AI job ${jobId} ${j.status}`);
+        }
+        return pollJob(jobId);
+      });
+  }
+
+  /** Stops the automatic moves of MCTS vs ML-MCTS mode */
+  function stopAutoPlay() {
+    clearTimeout(autoMoveTimer);
+    autoMoveTimer = null;
+    if (matchStream) {
+      matchStream.close();
+      matchStream = null;
+    }
+  }
+
+  /**
+   * Applies one streamed shot to the boards without redrawing them.
+   * MCTS (player1) shoots the ML-MCTS board and ML-MCTS (player2) the MCTS board.
+   *
+   * @param {*} ev compact shot event: turn, x, y, hit, sunk, over, winner
+   */
+  function applyShotEvent(ev) {
+    const label     = ev.turn === 'player1' ? 'MCTS' : 'ML-MCTS';
+    const boardId   = ev.turn === 'player1' ? 'pcBoard' : 'userBoard';
+    const statusId  = ev.turn === 'player1' ? 'pcBoatsStatus' : 'userBoatsStatus';
+
+    if (ev.x !== null) {
+      const cell = document.querySelector(`#${boardId} td[data-i="${ev.x}"][data-j="${ev.y}"]`);
+      if (cell) cell.className = ev.hit ? 'hit' : 'miss';
+    }
+    if (ev.sunk !== null) {
+      const boat = document.querySelectorAll(`#${statusId} li`)[ev.sunk];
+      if (boat) boat.classList.add('sunk');
+    }
+
+    let msg = ev.hit ? `${label} hit!` : `${label} missed.`;
+    if (ev.over) msg = ev.x === null ? `No moves for ${label}.` : `${ev.winner} wins!`;
+    document.getElementById('message').innerText = msg;
+  }
+
+  /**
+   * Plays the MCTS vs ML-MCTS match by listening to the server's event stream,
+   * rendering each shot as soon as it is computed.
+   */
+  function startMatchStream() {
+    stopAutoPlay();
+    if (!window.EventSource) {
+      autoMoveTimer = setTimeout(autoMove, 0);
+      return;
+    }
+    matchStream = new EventSource('/match/stream');
+    matchStream.onmessage = e => applyShotEvent(JSON.parse(e.data));
+    matchStream.addEventListener('end', stopAutoPlay);
+  }
+
   /**
    * Renders the summary of AI movements
    *
@@ -86,39 +166,83 @@
   }
 
   /**
-   * Converts a tree structure into Vis.js data format
+   * Vis.js data sets of the displayed MCTS tree and, per node id, its path
+   * from the search root, its total number of children and the children shown.
    *
-   * @param {*} node 
-   * @param {{}} [nodes=[]] 
-   * @param {{}} [edges=[]] 
+   * @type {*}
+   */
+  let visNodes = null;
+  let visEdges = null;
+  const visMeta = new Map();
+
+  /**
+   * Adds a (partial) tree snapshot to the Vis.js data sets
+   *
+   * @param {*} node snapshot node with action, visits, wins, n_children and children
    * @param {*} [parentId=null] 
-   * @returns {{ nodes: {}; edges: {}; }} 
+   * @param {{}} [path=[]] actions from the search root to this node
+   */
+  function addTreeToVis(node, parentId = null, path = []) {
+    const id = visNodes.length;
+    visNodes.add({ id, label: `${node.action}\nV=${node.visits}\nW=${node.wins}` });
+    visMeta.set(id, { path, total: node.n_children || 0, shown: new Map() });
+    if (parentId !== null) {
+      visEdges.add({ from: parentId, to: id });
+      visMeta.get(parentId).shown.set(String(node.action), id);
+    }
+    (node.children || []).forEach(c => addChild(id, c));
+  }
+
+  /**
+   * Adds a child snapshot below a displayed node, skipping it if already shown
+   *
+   * @param {*} parentId 
+   * @param {*} child 
+   */
+  function addChild(parentId, child) {
+    const meta = visMeta.get(parentId);
+    if (meta.shown.has(String(child.action))) return;
+    addTreeToVis(child, parentId, meta.path.concat([child.action]));
+  }
+
+  /**
+   * Fetches the children of a displayed node that were left out of the snapshot
+   *
+   * @param {*} id Vis.js node id
    */
-  function treeToVisData(node, nodes = [], edges = [], parentId = null) {
-    const id = nodes.length;
-    nodes.push({ id, label: `${node.action}\nV=${node.visits}\nW=${node.wins}` });
-    if (parentId !== null) edges.push({ from: parentId, to: id });
-    (node.children || []).forEach(c =>
-      treeToVisData(c, nodes, edges, id)
-    );
-    return { nodes, edges };
+  function expandVisNode(id) {
+    const meta = visMeta.get(id);
+    if (!meta || meta.shown.size >= meta.total) return;
+    const path = meta.path.map(a => a.join(',')).join(';');
+    fetch(`/tree?path=${encodeURIComponent(path)}&depth=1&top_k=36`)
+      .then(r => r.ok ? r.json() : null)
+      .then(d => {
+        if (d) d.tree.children.forEach(c => addChild(id, c));
+      })
+      .catch(console.error);
   }
 
   /**
-   * Renders a tree structure using Vis.js
+   * Renders a tree structure using Vis.js. Clicking a node loads its remaining children.
    *
    * @param {*} tree 
    */
   function renderVisTree(tree) {
-    const { nodes, edges } = treeToVisData(tree);
+    visNodes = new vis.DataSet();
+    visEdges = new vis.DataSet();
+    visMeta.clear();
+    addTreeToVis(tree);
     const container = document.getElementById('network');
     container.innerHTML = '';
-    new vis.Network(container, { nodes, edges }, {
+    const network = new vis.Network(container, { nodes: visNodes, edges: visEdges }, {
       layout: { hierarchical:{ enabled:true, direction:'UD', sortMethod:'directed', levelSeparation:100, nodeSpacing:100 } },
       physics: false,
       edges: { smooth:{ type:'cubicBezier', forceDirection:'horizontal', roundness:0.4 } },
       nodes: { shape:'ellipse' }
     });
+    network.on('click', params => {
+      if (params.nodes.length) expandVisNode(params.nodes[0]);
+    });
   }
 
   /**
@@ -222,20 +346,25 @@
     })
     .then(r => r.json())
     .then(d => {
+      if (!d.pc_board) {
+        // move rejected (AI still thinking or busy)
+        msgEl.innerText = d.message;
+        return;
+      }
       drawBoard(d.pc_board, 'pcBoard', true, 'pc');
       updateBoatStatus(d.user_boats, d.pc_boats);
 
-      if (mode === 'uservsmcts' && d.summary) {
+      if (d.job_id) {
         msgEl.innerText = 'AI is thinking…';
-        setTimeout(() => applyResponse(d), 500);
-      } else {
-        applyResponse(d);
+        return pollJob(d.job_id).then(applyResponse);
       }
+      applyResponse(d);
     })
     .catch(console.error);
 
     function applyResponse(d) {
       document.getElementById('message').innerText = d.message;
+      if (!d.user_board) return;
       drawBoard(d.user_board, 'userBoard', false, 'user');
       drawBoard(d.pc_board,   'pcBoard',   true,  'pc');
       updateBoatStatus(d.user_boats, d.pc_boats);
@@ -290,14 +419,13 @@
         document.getElementById('pcBoardHeading').innerText   = 'ML-MCTS Board';
         document.getElementById('userBoatsHeading').innerText = 'MCTS Ships';
         document.getElementById('pcBoatsHeading').innerText   = 'ML-MCTS Ships';
-        clearInterval(autoMoveInterval);
-        autoMoveInterval = setInterval(autoMove, 1000);
+        startMatchStream();
       } else {
         document.getElementById('userBoardHeading').innerText = 'Your Board';
         document.getElementById('pcBoardHeading').innerText   = 'PC Board';
         document.getElementById('userBoatsHeading').innerText = 'Your Boats';
         document.getElementById('pcBoatsHeading').innerText   = 'PC Boats';
-        clearInterval(autoMoveInterval);
+        stopAutoPlay();
       }
 
       // clear the explanation text
@@ -312,17 +440,33 @@
 
   /** 
    * Automatically moves the AI players in MCTS vs ML-MCTS mode
-   * by sending a request to the server.
+   * by submitting the next turn to the server and waiting for its job.
+   * Polling fallback for browsers without EventSource support.
    */
   function autoMove() {
     fetch('/auto_move',{ method:'POST' })
     .then(r => r.json())
+    .then(j => {
+      if (!j.job_id) return null;
+      return pollJob(j.job_id);
+    })
     .then(d => {
-      document.getElementById('message').innerText = d.message;
-      drawBoard(d.user_board, 'userBoard', false, 'user');
-      drawBoard(d.pc_board,   'pcBoard',   false, 'pc');
-      updateBoatStatus(d.user_boats, d.pc_boats);
-      if (d.game_over) clearInterval(autoMoveInterval);
+      if (!autoMoveTimer) return;
+      if (d && d.user_board) {
+        document.getElementById('message').innerText = d.message;
+        drawBoard(d.user_board, 'userBoard', false, 'user');
+        drawBoard(d.pc_board,   'pcBoard',   false, 'pc');
+        updateBoatStatus(d.user_boats, d.pc_boats);
+        if (d.game_over) {
+          stopAutoPlay();
+          return;
+        }
+      }
+      autoMoveTimer = setTimeout(autoMove, 1000);
+    })
+    .catch(err => {
+      console.error(err);
+      stopAutoPlay();
     });
   }
 
@@ -372,14 +516,13 @@
           document.getElementById('pcBoardHeading').innerText   = 'ML-MCTS Board';
           document.getElementById('userBoatsHeading').innerText = 'MCTS Ships';
           document.getElementById('pcBoatsHeading').innerText   = 'ML-MCTS Ships';
-          clearInterval(autoMoveInterval);
-          autoMoveInterval = setInterval(autoMove, 1000);
+          startMatchStream();
         } else {
           document.getElementById('userBoardHeading').innerText = 'Your Board';
           document.getElementById('pcBoardHeading').innerText   = 'PC Board';
           document.getElementById('userBoatsHeading').innerText = 'Your Boats';
           document.getElementById('pcBoatsHeading').innerText   = 'PC Boats';
-          clearInterval(autoMoveInterval);
+          stopAutoPlay();
         }
       }
     });
@@ -391,7 +534,7 @@
    * and stopping any ongoing intervals.
    */
   function backToMenu() {
-    clearInterval(autoMoveInterval);
+    stopAutoPlay();
     manualPhase = false;
     manualStart = null;
     document.getElementById('options-container').style.display = 'block';
@@ -400,75 +543,71 @@
   }
 
 
+// Number of recent games listed in each statistics table
+const HISTORY_ROWS = 200;
+
+/**
+ * Fills a statistics table with the most recent games of a mode
+ *
+ * @param {string} tableId - The id of the DataTable element
+ * @param {string} mode - The game mode ('uservsmcts' or 'mcts_vs_ml_mcts')
+ */
+function loadHistory(tableId, mode) {
+  fetch(`/stats/history?mode=${mode}&limit=${HISTORY_ROWS}`)
+    .then(res => res.json())
+    .then(page => {
+      const dt = $('#' + tableId).DataTable();
+      dt.clear();
+      page.rows.forEach(r => {
+        dt.row.add([ r.winner, r.duration.toFixed(2) ]);
+      });
+      dt.draw();
+    })
+    .catch(err => console.error('Failed to load history:', err));
+}
+
 /**
  * Fetches and updates game statistics from the server
  * 
  */
 function updateStats() {
+  // — Tables 2 cols: latest games only, the aggregates below cover the full history —
+  loadHistory('statsTable1', 'uservsmcts');
+  loadHistory('statsTable2', 'mcts_vs_ml_mcts');
+
   fetch('/stats')
     .then(res => res.json())
     .then(data => {
-      // — Tables 2 cols —
-      const dt1 = $('#statsTable1').DataTable();
-      dt1.clear();
-      data.uservsmcts.forEach(r => {
-        dt1.row.add([ r.winner, r.duration.toFixed(2) ]);
-      });
-      dt1.draw();
-
-      const dt2 = $('#statsTable2').DataTable();
-      dt2.clear();
-      data.mcts_vs_ml_mcts.forEach(r => {
-        dt2.row.add([ r.winner, r.duration.toFixed(2) ]);
-      });
-      dt2.draw();
+      const fmtPct = (n, total) => total ? ((n/total)*100).toFixed(1) + '%' : '–';
+      const fmtDur = v => v !== undefined ? v.toFixed(2) : '–';
 
       // — KPI Dashboard —
-      const arr1     = data.uservsmcts;
-      const total1   = arr1.length;
-      const winsUser = arr1.filter(r => r.winner === 'user').length;
-      const winsMCTS = arr1.filter(r => r.winner === 'MCTS').length;
-      const dursUser = arr1.filter(r => r.winner === 'user').map(r => r.duration);
-      const dursMCTS = arr1.filter(r => r.winner === 'MCTS').map(r => r.duration);
+      const s1       = data.uservsmcts;
+      const total1   = s1.total;
+      const winsUser = s1.wins.user || 0;
+      const winsMCTS = s1.wins.MCTS || 0;
 
       document.getElementById('kpi-total-1').textContent         = total1 || '–';
-      document.getElementById('kpi-wpct-user-1').textContent     = total1
-        ? ((winsUser/total1)*100).toFixed(1) + '%'
-        : '–';
-      document.getElementById('kpi-wpct-mcts-1').textContent     = total1
-        ? ((winsMCTS/total1)*100).toFixed(1) + '%'
-        : '–';
-      document.getElementById('kpi-avgdur-user-1').textContent   = dursUser.length
-        ? (dursUser.reduce((s,v)=>s+v,0)/dursUser.length).toFixed(2)
-        : '–';
-      document.getElementById('kpi-avgdur-mcts-1').textContent   = dursMCTS.length
-        ? (dursMCTS.reduce((s,v)=>s+v,0)/dursMCTS.length).toFixed(2)
-        : '–';
-
-      const arr2      = data.mcts_vs_ml_mcts;
-      const total2    = arr2.length;
-      const winsMCTS2 = arr2.filter(r => r.winner === 'MCTS').length;
-      const winsML    = arr2.filter(r =>
-        r.winner === 'NeuralMCTS' || r.winner === 'ML-MCTS'
-      ).length;
-      const dursMCTS2 = arr2.filter(r => r.winner === 'MCTS').map(r => r.duration);
-      const dursML    = arr2.filter(r =>
-        r.winner === 'NeuralMCTS' || r.winner === 'ML-MCTS'
-      ).map(r => r.duration);
+      document.getElementById('kpi-wpct-user-1').textContent     = fmtPct(winsUser, total1);
+      document.getElementById('kpi-wpct-mcts-1').textContent     = fmtPct(winsMCTS, total1);
+      document.getElementById('kpi-avgdur-user-1').textContent   = fmtDur(s1.avg_duration.user);
+      document.getElementById('kpi-avgdur-mcts-1').textContent   = fmtDur(s1.avg_duration.MCTS);
+
+      const s2        = data.mcts_vs_ml_mcts;
+      const total2    = s2.total;
+      const winsMCTS2 = s2.wins.MCTS || 0;
+      const winsNN    = s2.wins.NeuralMCTS || 0;
+      const winsML    = winsNN + (s2.wins['ML-MCTS'] || 0);
+      const durML     = winsML
+        ? ((s2.avg_duration.NeuralMCTS || 0) * winsNN +
+           (s2.avg_duration['ML-MCTS'] || 0) * (winsML - winsNN)) / winsML
+        : undefined;
 
       document.getElementById('kpi-total-2').textContent         = total2 || '–';
-      document.getElementById('kpi-wpct-mcts-2').textContent     = total2
-        ? ((winsMCTS2/total2)*100).toFixed(1) + '%'
-        : '–';
-      document.getElementById('kpi-wpct-ml-2').textContent       = total2
-        ? ((winsML/total2)*100).toFixed(1) + '%'
-        : '–';
-      document.getElementById('kpi-avgdur-mcts-2').textContent   = dursMCTS2.length
-        ? (dursMCTS2.reduce((s,v)=>s+v,0)/dursMCTS2.length).toFixed(2)
-        : '–';
-      document.getElementById('kpi-avgdur-ml-2').textContent     = dursML.length
-        ? (dursML.reduce((s,v)=>s+v,0)/dursML.length).toFixed(2)
-        : '–';
+      document.getElementById('kpi-wpct-mcts-2').textContent     = fmtPct(winsMCTS2, total2);
+      document.getElementById('kpi-wpct-ml-2').textContent       = fmtPct(winsML, total2);
+      document.getElementById('kpi-avgdur-mcts-2').textContent   = fmtDur(s2.avg_duration.MCTS);
+      document.getElementById('kpi-avgdur-ml-2').textContent     = fmtDur(durML);
 
       // — Chart.js: % of wins per player —
       const labels  = ['User vs MCTS', 'MCTS vs ML-MCTS'];
@@ -522,38 +661,19 @@ function updateStats() {
 
 
   /**
-   * Exports the game statistics to a CSV file.
+   * Exports the game statistics to a CSV file, streamed by the server.
    *
    * @type {*}
    */
   const exportBtn = document.getElementById('exportCsvBtn');
   if (exportBtn) {
     exportBtn.addEventListener('click', () => {
-      fetch('/stats')
-        .then(res => {
-          if (!res.ok) throw new Error(`HTTP ${res.status}`);
-          return res.json();
-        })
-        .then(data => {
-          let csv = 'mode,winner,duration\n';
-          data.uservsmcts.forEach(row => {
-            csv += `uservsmcts,${row.winner},${row.duration}\n`;
-          });
-          data.mcts_vs_ml_mcts.forEach(row => {
-            csv += `mcts_vs_ml_mcts,${row.winner},${row.duration}\n`;
-          });
-
-          const blob = new Blob([csv], { type: 'text/csv' });
-          const url  = URL.createObjectURL(blob);
-          const a    = document.createElement('a');
-          a.href     = url;
-          a.download = 'battleship_stats.csv';
-          document.body.appendChild(a);
-          a.click();
-          document.body.removeChild(a);
-          URL.revokeObjectURL(url);
-        })
-        .catch(err => console.error('Failed to export CSV:', err));
+      const a    = document.createElement('a');
+      a.href     = '/stats/export.csv';
+      a.download = 'battleship_stats.csv';
+      document.body.appendChild(a);
+      a.click();
+      document.body.removeChild(a);
     });
   }
 
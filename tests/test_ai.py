@@ -113,3 +113,39 @@ def test_ml_mcts_uniform_network():
     assert isinstance(move, tuple) and len(move) == 2
     x, y = move
     assert 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE
+
+
+def test_mcts_expired_deadline_falls_back_to_legal_move():
+    """With a deadline already in the past MCTS.run stops immediately and still returns a legal move."""
+    board = Board()
+    board.shoot(0, 0)
+    mcts  = MCTS(iterations=1000)
+    move  = mcts.run(board, deadline=0.0)
+
+    assert move is not None
+    x, y = move
+    assert board.get_cell(x, y) not in ['X', 'O']
+    assert mcts.root.visits == 1
+
+
+def test_tree_snapshot_is_bounded():
+    """snapshot/to_columns honour depth and top-k limits, and find() follows action paths."""
+    board = Board()
+    mcts  = MCTS(iterations=200)
+    mcts.run(board)
+    root  = mcts.root
+
+    snap = root.snapshot(max_depth=1, top_k=3)
+    assert snap['n_children'] == len(root.children)
+    assert len(snap['children']) == 3
+    assert all(c['children'] == [] for c in snap['children'])
+    assert snap['children'][0]['visits'] == max(c.visits for c in root.children)
+
+    cols = root.to_columns(max_depth=2, top_k=2)
+    assert len(cols['parent']) <= 1 + 2 + 4
+    assert all(p < i for i, p in enumerate(cols['parent']))
+
+    best = root.top_children(1)[0]
+    assert root.find([best.action]) is best
+    assert root.find([(-1, -1)]) is None
+    assert [s['visits'] for s in root.summary()] == [c.visits for c in root.children]
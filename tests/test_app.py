@@ -0,0 +1,93 @@
+# tests/test_app.py
+
+import sys
+import os
+import importlib
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.game.board import BOARD_SIZE, HIT, MISS
+
+
+@pytest.fixture(scope='module')
+def web(tmp_path_factory):
+    """The app module, recording results to a temporary database and playing with small searches."""
+    db_path = tmp_path_factory.mktemp('app') / 'game.db'
+    env = {'DATABASE_URL': f'sqlite:///{db_path}', 'MCTS_BOT': 'mcts:iters=5',
+           'OPENING_BOOK': str(db_path.parent / 'missing.npz')}
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield importlib.import_module('app')
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@pytest.fixture
+def client(web):
+    client = web.app.test_client()
+    response = client.post('/set_options', json={'game_mode': 'uservsmcts', 'boat_placement': 'random'})
+    client.environ_base['HTTP_X_GAME_ID'] = response.headers['X-Game-Id']
+    return client
+
+
+def miss_cell(game, skip=()):
+    """A cell of the PC board holding no ship (other than those in skip)."""
+    ships = {tuple(p) for boat in game.pc_board.boats for p in boat['positions']}
+    return next((x, y) for x in range(BOARD_SIZE) for y in range(BOARD_SIZE)
+                if (x, y) not in ships and (x, y) not in skip)
+
+
+def test_failed_ai_job_releases_the_game(web, client, monkeypatch):
+    """When the PC's turn raises, the job fails and the game accepts the user's next move."""
+    def broken_turn(game_id, deadline, epoch):
+        raise RuntimeError('search crashed')
+
+    monkeypatch.setattr(web, 'pc_turn', broken_turn)
+    game = web.store.load(client.environ_base['HTTP_X_GAME_ID'])
+    x, y = miss_cell(game)
+    job_id = client.post('/user_move', json={'x': x, 'y': y}).get_json()['job_id']
+    job = client.get(f'/jobs/{job_id}?wait=10').get_json()
+    assert job['status'] == 'failed' and 'search crashed' in job['error']
+
+    game = web.store.load(game.game_id)
+    assert game.pending_job_id is None and not game.ai_busy()
+    monkeypatch.undo()
+    response = client.post('/user_move', json={'x': x, 'y': y})
+    assert response.status_code == 200
+
+
+class FirstFreeCellBook:
+    """Opening book stub answering every position with its first unshot cell."""
+    def lookup(self, board):
+        return next((x, y) for x in range(BOARD_SIZE) for y in range(BOARD_SIZE)
+                    if board.get_cell(x, y) not in (HIT, MISS))
+
+
+def test_tree_is_cleared_after_a_book_move(web, client):
+    """/tree serves the last search, and nothing once the PC has played a book move instead."""
+    game = web.store.load(client.environ_base['HTTP_X_GAME_ID'])
+    x, y = miss_cell(game)
+    job_id = client.post('/user_move', json={'x': x, 'y': y}).get_json()['job_id']
+    assert client.get(f'/jobs/{job_id}?wait=10').get_json()['status'] == 'done'
+    assert client.get('/tree').status_code == 200
+
+    game.vanilla_mcts.opening_book = FirstFreeCellBook()
+    x, y = miss_cell(game, skip=[(x, y)])
+    job_id = client.post('/user_move', json={'x': x, 'y': y}).get_json()['job_id']
+    assert client.get(f'/jobs/{job_id}?wait=10').get_json()['status'] == 'done'
+    assert client.get('/tree').status_code == 404
+
+
+def test_stats_flushes_queued_results_only_on_request(web, client, monkeypatch):
+    """/stats serves the rollups as they are; ?fresh=1 first writes the queued results."""
+    calls = []
+    monkeypatch.setattr(web.results, 'flush', lambda timeout=None: calls.append(timeout) or True)
+    assert client.get('/stats').status_code == 200 and calls == []
+    assert client.get('/stats?fresh=1').status_code == 200 and calls == [2.0]
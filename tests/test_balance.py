@@ -0,0 +1,52 @@
+# tests/test_balance.py
+
+import sys
+import os
+import json
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.data.balance import balance_files, count_outcomes
+
+
+def test_streaming_balance_matches_in_memory_semantics(tmp_path):
+    """The streamed output has min(wins, losses) records of each outcome, drawn from the input and
+    shuffled, even when the shuffle is split over many buckets."""
+    random.seed(0)
+    paths = []
+    records = []
+    for shard in range(3):
+        path = str(tmp_path / f'shard-{shard}.jsonl')
+        with open(path, 'w') as f:
+            for i in range(300):
+                rec = {'id': f'{shard}-{i}', 'z': 1 if random.random() < 0.3 else -1}
+                records.append(rec)
+                f.write(json.dumps(rec) + '\n')
+        paths.append(path)
+
+    wins, losses = count_outcomes(paths)
+    out = str(tmp_path / 'balanced.jsonl')
+    stats = balance_files(paths, out, seed=1, bucket_records=50)
+    with open(out) as f:
+        balanced = [json.loads(line) for line in f]
+
+    assert stats['buckets'] > 1 and stats['written_per_outcome'] == min(wins, losses)
+    assert sum(r['z'] == 1 for r in balanced) == sum(r['z'] == -1 for r in balanced) == min(wins, losses)
+    ids = [r['id'] for r in balanced]
+    assert len(set(ids)) == len(ids) and set(ids) <= {r['id'] for r in records}
+    assert ids != sorted(ids, key=lambda i: tuple(map(int, i.split('-'))))  # shuffled
+    assert not [p for p in os.listdir(tmp_path) if p.startswith('balance-')]  # buckets removed
+
+
+def test_bucket_count_follows_memory_budget(tmp_path):
+    """A smaller budget splits the shuffle over more buckets, each held within the budget."""
+    path = str(tmp_path / 'shard.jsonl')
+    with open(path, 'w') as f:
+        for i in range(2000):
+            f.write(json.dumps({'id': i, 'z': 1 if i % 2 else -1, 'pad': 'x' * 100}) + '\n')
+    out = str(tmp_path / 'balanced.jsonl')
+    assert balance_files([path], out, seed=0)['buckets'] == 1
+    budget = 40_000
+    stats = balance_files([path], out, seed=0, memory_budget=budget)
+    assert stats['buckets'] > 5 and 0 < stats['largest_bucket_bytes'] <= budget
@@ -0,0 +1,50 @@
+# tests/test_binary_data.py
+
+import sys
+import os
+import json
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.data.binary import jsonl_to_binary, binary_to_jsonl, read_shard
+from train import GameDataset, load_dataset, BinaryGameDataset
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+def test_jsonl_round_trip(tmp_path):
+    """Converting to the binary format and back keeps states and outcomes exactly, pi to float16."""
+    out = str(tmp_path / 'bin')
+    n = jsonl_to_binary([DATA], out, shard_records=400)
+    assert n == 955 and len(os.listdir(out)) == 4  # 3 shards and the index
+    binary_to_jsonl(out, str(tmp_path / 'back.jsonl'))
+    with open(DATA) as a, open(tmp_path / 'back.jsonl') as b:
+        for x, y in zip(map(json.loads, a), map(json.loads, b)):
+            assert x['state'] == y['state'] and x['z'] == y['z']
+            np.testing.assert_allclose(x['pi'], y['pi'], atol=1e-3)
+
+    with open(tmp_path / 'bad.bin', 'wb') as f:
+        f.write(b'\0' * 64)
+    with pytest.raises(ValueError):
+        read_shard(str(tmp_path / 'bad.bin'))
+
+
+def test_binary_dataset_matches_jsonl_dataset(tmp_path):
+    """The memory-mapped dataset yields the GameDataset samples, in whole batches."""
+    out = str(tmp_path / 'bin')
+    jsonl_to_binary([DATA], out, shard_records=300)
+    ds = load_dataset(out)
+    ref = GameDataset(DATA)
+    assert isinstance(ds, BinaryGameDataset) and len(ds) == len(ref)
+    for i in (0, 299, 300, 954):
+        x, pi, z = ds[i]
+        assert torch.equal(x, ref[i][0]) and float(z) == float(ref[i][2])
+        assert torch.allclose(pi, ref[i][1], atol=1e-3)
+
+    x, pi, z = next(iter(DataLoader(ds, batch_size=64, shuffle=True, collate_fn=ds.collate)))
+    assert x.shape == (64, 3, 6, 6) and pi.shape == (64, 36) and z.shape == (64,)
@@ -0,0 +1,52 @@
+# tests/test_bots.py
+
+import sys
+import os
+import subprocess
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.ai.bots import make_bot, bot_from_config, parse_bot_spec, available_bots
+from tfg.algorithms.mcts import MCTS
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_bot_specs_apply_budgets():
+    """Specs are parsed into typed options, and overrides such as --iters take precedence."""
+    assert parse_bot_spec('ml_mcts:iters=50,c_puct=1.5,device=cpu') == (
+        'ml_mcts', {'iters': 50, 'c_puct': 1.5, 'device': 'cpu'})
+    assert {'mcts', 'ml_mcts'} <= set(available_bots())
+
+    bot = bot_from_config('mcts:iters=50', iters=7)
+    assert isinstance(bot, MCTS) and bot.iterations == 7
+    assert bot_from_config({'bot': 'mcts', 'iters': 9}).iterations == 9
+    with pytest.raises(ValueError):
+        make_bot('alphazero')
+
+
+def test_ml_bot_loads_weights_lazily():
+    """Building an ML bot does not read the weights; they are loaded once and shared on first use."""
+    bot = make_bot('ml_mcts', iters=3, model_path=os.path.join(ROOT, 'model.pth'))
+    other = make_bot('ml_mcts', iters=3, model_path=os.path.join(ROOT, 'model.pth'))
+    assert bot.model_version is None
+    assert bot.model is other.model
+
+
+def test_mcts_bot_does_not_import_torch():
+    """Tools that only build MCTS bots never pay for importing torch."""
+    code = ("import sys; from tfg.ai.bots import make_bot; make_bot('mcts', iters=5); "
+            "assert 'torch' not in sys.modules")
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+
+
+def test_simulate_iters_only_override_when_given():
+    """simulate.py keeps a spec's own iters unless --iters is passed, and plays 100 otherwise."""
+    from argparse import Namespace
+    from simulate import build_bot
+
+    args = Namespace(iters=None, opening_book=None)
+    assert build_bot('mcts:iters=50', args).iterations == 50
+    assert build_bot('mcts', args).iterations == 100
+    assert build_bot('mcts:iters=50', Namespace(iters=7, opening_book=None)).iterations == 7
@@ -0,0 +1,58 @@
+# tests/test_checkpoint.py
+
+import sys
+import os
+import torch
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.ai.checkpoint import atomic_save, save_checkpoint, load_checkpoint, checkpoint_path
+from train import train
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+class Unpicklable:
+    def __reduce__(self):
+        raise RuntimeError('interrupted')
+
+
+def test_failed_save_keeps_previous_file(tmp_path):
+    """A save interrupted midway leaves the previous file intact and no temporary file."""
+    path = tmp_path / 'model.pth'
+    atomic_save({'a': torch.ones(3)}, str(path))
+    with pytest.raises(RuntimeError):
+        atomic_save({'a': torch.zeros(3), 'b': Unpicklable()}, str(path))
+    assert torch.equal(torch.load(path)['a'], torch.ones(3))
+    assert os.listdir(tmp_path) == ['model.pth']
+
+
+def test_checkpoint_slots(tmp_path):
+    assert load_checkpoint(str(tmp_path)) is None
+    save_checkpoint(str(tmp_path / 'run'), 'best', {'epoch': 3})
+    assert load_checkpoint(str(tmp_path / 'run'), 'best')['epoch'] == 3
+    with pytest.raises(ValueError):
+        checkpoint_path(str(tmp_path), 'first')
+    torch.save({'epoch': 1}, checkpoint_path(str(tmp_path), 'last'))
+    with pytest.raises(ValueError):
+        load_checkpoint(str(tmp_path))
+
+
+def test_resume_matches_uninterrupted_run(tmp_path):
+    """Training 2 epochs, then resuming to 4, gives the weights and history of 4 straight epochs."""
+    options = dict(batch_size=32, seed=3, early_stop_patience=10, augment=True)
+    straight = train(DATA, epochs=4, model_out=str(tmp_path / 'straight.pth'), **options)
+    train(DATA, epochs=2, model_out=str(tmp_path / 'resumed.pth'), **options)
+    resumed = train(DATA, epochs=4, model_out=str(tmp_path / 'resumed.pth'), resume=True,
+                    **{**options, 'seed': None})
+    assert [h['epoch'] for h in resumed] == [1, 2, 3, 4]
+    for a, b in zip(straight, resumed):
+        assert a['val_loss'] == pytest.approx(b['val_loss'], abs=1e-6)
+    last = {name: load_checkpoint(str(tmp_path / f'{name}_ckpt')) for name in ('straight', 'resumed')}
+    assert last['resumed']['epoch'] == 4
+    for k, w in last['straight']['model'].items():
+        assert torch.allclose(w, last['resumed']['model'][k], atol=1e-6)
+    assert load_checkpoint(str(tmp_path / 'resumed_ckpt'), 'best') is not None
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
@@ -0,0 +1,90 @@
+# tests/test_dedup.py
+
+import sys
+import os
+import json
+import random
+import numpy as np
+import pytest
+import torch
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.game.board import Board
+from tfg.game.symmetry import transform_board, transform_pi, canonical_masks
+from tfg.data.dedup import dedup_files
+from tfg.data.binary import jsonl_to_binary
+from tfg.ai.network import GameNet
+from train import TensorGameDataset, load_dataset, loss_fn, normalize_weights, train
+
+
+def write(path, records):
+    with open(path, 'w') as f:
+        for r in records:
+            f.write(json.dumps(r) + '\n')
+
+
+def record(board, pi, z):
+    return {'state': board.to_tensor().tolist(), 'pi': list(pi), 'z': z}
+
+
+def test_duplicates_and_images_are_merged(tmp_path):
+    """Copies of a position and of its images become one record with the mean targets."""
+    rng = np.random.default_rng(0)
+    random.seed(0)
+    board = Board()
+    board.place_fleet()
+    board.shoot(0, 1)
+    board.shoot(2, 3)
+    pis = rng.dirichlet(np.ones(36), 3)
+    records = [record(Board(), pis[0], 1), record(Board(), pis[1], -1), record(Board(), pis[2], -1),
+               record(board, pis[0], 1), record(transform_board(board, 3), transform_pi(pis[1], 3), 1)]
+    write(tmp_path / 'in.jsonl', records)
+
+    stats = dedup_files([str(tmp_path / 'in.jsonl')], str(tmp_path / 'out.jsonl'))
+    assert stats['records'] == 5 and stats['positions'] == 2 and stats['weight'] == 5
+    with open(tmp_path / 'out.jsonl') as f:
+        out = [json.loads(l) for l in f]
+    empty, shot = out
+    assert empty['w'] == 3 and empty['z'] == pytest.approx(-1 / 3)
+    np.testing.assert_allclose(empty['pi'], pis.mean(axis=0), atol=1e-9)
+    # the shot position is written in canonical orientation, with its policies moved there
+    _, k = canonical_masks(*board.shot_masks())
+    assert shot['w'] == 2 and shot['z'] == 1
+    assert np.array_equal(shot['state'], transform_board(board, k).to_tensor())
+    np.testing.assert_allclose(shot['pi'], transform_pi((pis[0] + pis[1]) / 2, k), atol=1e-9)
+
+    assert dedup_files([str(tmp_path / 'in.jsonl')], str(tmp_path / 'exact.jsonl'),
+                       canonical=False)['positions'] == 3
+    with pytest.raises(ValueError):
+        jsonl_to_binary([str(tmp_path / 'out.jsonl')], str(tmp_path / 'bin'))
+
+
+def test_weighted_loss_matches_original_records(tmp_path):
+    """The weighted loss over compacted records is the loss over the original records, less the
+    variance of the outcomes of each position (which no model can reduce)."""
+    data = os.path.join(ROOT, 'data.jsonl')
+    with open(data) as f:
+        lines = [l for l in f if l.strip()]
+    write(tmp_path / 'in.jsonl', [json.loads(l) for l in lines[:300] * 3 + lines[300:600]])
+    dedup_files([str(tmp_path / 'in.jsonl')], str(tmp_path / 'out.jsonl'), canonical=False)
+
+    orig = load_dataset(str(tmp_path / 'in.jsonl'))
+    comp = load_dataset(str(tmp_path / 'out.jsonl'))
+    assert comp.w is not None and len(comp) < len(orig) and float(comp.w.sum()) == len(orig)
+    normalize_weights(comp)
+
+    torch.manual_seed(0)
+    model = GameNet().eval()
+    with torch.no_grad():
+        full = loss_fn(*model(orig.x), orig.pi, orig.z)
+        compact = loss_fn(*model(comp.x), comp.pi, comp.z, comp.w)
+        # within-position variance of z, times the number of records, over the records
+        v_orig = (model(orig.x)[1].squeeze(-1) - orig.z) ** 2
+        v_comp = (model(comp.x)[1].squeeze(-1) - comp.z) ** 2 * comp.w
+    assert float(compact) <= float(full) + 1e-5
+    assert float(full - compact) == pytest.approx(float(v_orig.mean() - v_comp.mean()), abs=1e-5)
+
+    train(str(tmp_path / 'out.jsonl'), epochs=1, model_out=str(tmp_path / 'model.pth'))
+    assert isinstance(comp, TensorGameDataset) and len(comp[0]) == 4
@@ -0,0 +1,79 @@
+# tests/test_distill.py
+
+import sys
+import os
+import numpy as np
+import torch
+import torch.nn.functional as F
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.ai.bots import make_bot
+from tfg.ai.lockstep import match, LockstepStats
+from tfg.ai.model_registry import ModelRegistry
+from tfg.ai.network import GameNet
+from tfg.ai.numpy_net import NumpyGameNet, export_npz
+from train import distill_targets, train
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+@pytest.mark.parametrize('channels, value_hidden', [((16,), 32), ((8, 16, 16), 16)])
+def test_variants_load_from_weights(tmp_path, channels, value_hidden):
+    """Any configuration is rebuilt from its weights, by torch and by the NumPy engine."""
+    torch.manual_seed(0)
+    model = GameNet(channels, value_hidden).eval()
+    assert GameNet.config_from_state_dict(model.state_dict()) == {'channels': channels,
+                                                                  'value_hidden': value_hidden}
+    x = (np.random.default_rng(0).random((8, 3, 6, 6)) < 0.3).astype(np.float32)
+    with torch.no_grad():
+        ref_logits, ref_value = model(torch.from_numpy(x))
+        logits, value = GameNet.from_state_dict(model.state_dict())(torch.from_numpy(x))
+    assert torch.equal(logits, ref_logits) and torch.equal(value, ref_value)
+
+    path = str(tmp_path / 'small.npz')
+    export_npz(model, path)
+    logits, value = NumpyGameNet.load(path).forward(x)
+    np.testing.assert_allclose(logits, ref_logits.numpy(), atol=1e-5)
+    np.testing.assert_allclose(value, ref_value.numpy(), atol=1e-5)
+
+
+def test_default_checkpoint_still_loads():
+    model = ModelRegistry().acquire(os.path.join(ROOT, 'model.pth')).model
+    assert model.channels == (32, 64) and model.value_hidden == 64
+
+
+def test_distill_targets():
+    torch.manual_seed(0)
+    teacher = GameNet().eval()
+    x = torch.rand(4, 3, 6, 6)
+    pi, z = torch.full((4, 36), 1 / 36), torch.ones(4)
+    logits, v = teacher(x)
+    t_pi, t_z = distill_targets(teacher, x, pi, z)
+    assert torch.allclose(t_pi, F.softmax(logits, dim=1)) and torch.allclose(t_z, v)
+    h_pi, h_z = distill_targets(teacher, x, pi, z, weight=0.5)
+    assert torch.allclose(h_pi, (t_pi + pi) / 2) and torch.allclose(h_z, (t_z + z) / 2)
+
+
+def test_student_learns_teacher(tmp_path):
+    """A small student trained on the teacher's outputs ends closer to the teacher than it started."""
+    teacher = os.path.join(ROOT, 'model.pth')
+    out = str(tmp_path / 'student.pth')
+    history = train(DATA, epochs=3, batch_size=32, model_out=out, seed=0, channels=(16,),
+                    value_hidden=32, teacher=teacher, early_stop_patience=10)
+    assert history[-1]['val_loss'] < history[0]['val_loss']
+    student = GameNet.from_state_dict(torch.load(out))
+    assert student.channels == (16,)
+
+
+def test_match_alternates_and_counts(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    export_npz(GameNet(), path)
+    pairs = [(make_bot('ml_mcts', iters=5, model_path=path), make_bot('mcts', iters=5))
+             for _ in range(2)]
+    stats = LockstepStats()
+    result = match(pairs, 5, stats)
+    assert result['wins_a'] + result['wins_b'] == result['games'] == stats.games == 5
+    assert result['score'] == result['wins_a'] / 5
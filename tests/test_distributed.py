@@ -0,0 +1,43 @@
+# tests/test_distributed.py
+
+import sys
+import os
+import torch
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from train import BlockBatchSampler, train
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+def test_sharded_sampler_splits_each_global_batch():
+    """With the same seed, the ranks' batches together form the single-process batches."""
+    indices = torch.arange(100)
+    single = list(BlockBatchSampler(indices, 20, generator=torch.Generator().manual_seed(0)))
+    ranks = [list(BlockBatchSampler(indices, 10, generator=torch.Generator().manual_seed(0),
+                                    rank=r, world_size=2)) for r in range(2)]
+    assert len(ranks[0]) == len(ranks[1]) == len(single) == 5
+    for batch, parts in zip(single, zip(*ranks)):
+        assert sorted(torch.cat(parts).tolist()) == sorted(batch.tolist())
+    # uneven splits are cut so every rank runs the same number of steps
+    uneven = [BlockBatchSampler(torch.arange(101), 10, rank=r, world_size=2) for r in range(2)]
+    assert [len(list(s)) for s in uneven] == [len(s) for s in uneven] == [5, 5]
+
+
+def test_data_parallel_matches_single_process(tmp_path):
+    """Two gloo processes with all-reduced gradients train the model a single process trains."""
+    options = dict(epochs=2, batch_size=20, augment=False, seed=7, early_stop_patience=1)
+    single = train(DATA, model_out=str(tmp_path / 'single.pth'), **options)
+    parallel = train(DATA, model_out=str(tmp_path / 'parallel.pth'), processes=2, **options)
+    assert [h['epoch'] for h in parallel] == [h['epoch'] for h in single]
+    for a, b in zip(single, parallel):
+        assert a['val_loss'] == pytest.approx(b['val_loss'], abs=1e-4)
+    w1 = torch.load(tmp_path / 'single.pth')
+    w2 = torch.load(tmp_path / 'parallel.pth')
+    assert all(torch.allclose(w1[k], w2[k], atol=1e-4) for k in w1)
+
+    with pytest.raises(ValueError):
+        train(DATA, stream=True, processes=2)
@@ -81,3 +81,10 @@ def test_has_won_after_all_ship_cells_hit():
     # Hit that only cell
     board.shoot(0, 0)
     assert board.has_won() is True
+
+def test_place_fleet_always_terminates():
+    """Random placement must recover from dead ends instead of retrying forever."""
+    for _ in range(2000):
+        board = Board()
+        board.place_fleet()
+        assert sorted(int(b["value"]) for b in board.boats) == sorted(SHIPS)
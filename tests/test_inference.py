@@ -0,0 +1,57 @@
+# tests/test_inference.py
+
+import sys
+import os
+import random
+import numpy as np
+import torch
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.ai.network import GameNet
+from tfg.ai.inference import make_backend, available_backends
+from tfg.ai.model_registry import LoadedModel
+from tfg.ai.mcts_ml import NeuralMCTS
+from tfg.game.board import Board
+
+
+def _positions(n, seed=0):
+    """Random mid-game positions as a (n, 3, 6, 6) array."""
+    random.seed(seed)
+    states = []
+    for _ in range(n):
+        board = Board()
+        board.place_fleet()
+        for _ in range(random.randint(0, 20)):
+            board.shoot(random.randrange(6), random.randrange(6))
+        states.append(board.to_tensor())
+    return np.stack(states)
+
+
+@pytest.mark.parametrize('name, atol', [('torchscript', 1e-5), ('quantized', 2e-2), ('numpy', 1e-5)])
+def test_backends_match_eager(name, atol):
+    """The optimized backends reproduce the eager priors and values."""
+    torch.manual_seed(0)
+    model = GameNet().eval()
+    states = _positions(64)
+    ref_p, ref_v = make_backend('eager', model).evaluate_batch(states)
+    p, v = make_backend(name, model).evaluate_batch(states)
+    assert p.shape == (64, 36) and v.shape == (64,)
+    np.testing.assert_allclose(p, ref_p, atol=atol)
+    np.testing.assert_allclose(v, ref_v, atol=atol)
+    assert np.allclose(p.sum(axis=1), 1.0, atol=1e-4)
+
+
+def test_search_runs_on_every_backend():
+    """NeuralMCTS searches with any backend, and each loaded version builds a backend once."""
+    torch.manual_seed(0)
+    board = Board()
+    board.place_fleet()
+    for name in available_backends():
+        bot = NeuralMCTS(None, iters=10, model=GameNet().eval(), backend=name)
+        x, y = bot.run(board)
+        assert 0 <= x < 6 and 0 <= y < 6
+        assert bot._active.backend(name) is bot._active.backend(name)
+    with pytest.raises(ValueError):
+        LoadedModel(GameNet().eval()).backend('tensorrt')
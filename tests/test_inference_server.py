@@ -0,0 +1,54 @@
+# tests/test_inference_server.py
+
+import sys
+import os
+import threading
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.ai.network import GameNet
+from tfg.ai.numpy_net import NumpyGameNet, export_npz
+from tfg.ai.inference import make_backend
+from tfg.ai.inference_server import InferenceServer, InferenceClient
+from tfg.ai.bots import make_bot
+from tfg.game.board import Board
+
+
+def test_server_batches_clients_and_matches_local(tmp_path):
+    """Concurrent clients get the same evaluations as a local backend, in shared forward passes."""
+    torch.manual_seed(0)
+    path = str(tmp_path / 'model.npz')
+    export_npz(GameNet().state_dict(), path)
+    local = make_backend('numpy', NumpyGameNet.load(path))
+    states = (np.random.default_rng(0).random((40, 3, 6, 6)) < 0.3).astype(np.float32)
+
+    with InferenceServer(path, max_wait_ms=50.0) as server:
+        results = {}
+
+        def work(i):
+            client = InferenceClient(server.address)
+            results[i] = [client.evaluate_batch(states[j:j + 1]) for j in range(i, 40, 4)]
+            client.close()
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        ref_p, ref_v = local.evaluate_batch(states)
+        for i, rows in results.items():
+            for j, (p, v) in zip(range(i, 40, 4), rows):
+                np.testing.assert_allclose(p[0], ref_p[j], atol=1e-6)
+                np.testing.assert_allclose(v[0], ref_v[j], atol=1e-6)
+
+        stats = InferenceClient(server.address).stats()
+        assert stats['positions'] == 40 and stats['batches'] < 40
+
+        bot = make_bot('ml_mcts', iters=10, model_path=path, inference_server=server.address)
+        board = Board()
+        board.place_fleet()
+        bot.run(board)
+        assert bot.model_version == stats['version']
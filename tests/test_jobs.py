@@ -0,0 +1,54 @@
+# tests/test_jobs.py
+
+import sys
+import os
+import threading
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.server.jobs import MoveJobQueue, QueueFullError
+
+
+def test_job_result_is_returned_after_wait():
+    """A submitted job runs in the background and exposes its result once done."""
+    queue = MoveJobQueue(max_workers=1, max_pending=4, timeout=5.0)
+    job = queue.submit(lambda deadline: {'deadline_set': deadline > 0})
+
+    assert job.wait(5.0)
+    assert queue.get(job.id) is job
+    assert job.to_dict()['status'] == 'done'
+    assert job.result == {'deadline_set': True}
+    queue.shutdown()
+
+
+def test_queue_rejects_when_full():
+    """Submissions beyond max_pending raise QueueFullError until a slot frees up."""
+    release = threading.Event()
+    queue = MoveJobQueue(max_workers=1, max_pending=2, timeout=5.0)
+    jobs = [queue.submit(lambda deadline: release.wait(5.0)) for _ in range(2)]
+
+    assert queue.full()
+    with pytest.raises(QueueFullError):
+        queue.submit(lambda deadline: None)
+    assert queue.stats()['rejected'] == 1
+
+    release.set()
+    for job in jobs:
+        assert job.wait(5.0)
+    assert not queue.full()
+    queue.shutdown()
+
+
+def test_failed_job_reports_error():
+    """Exceptions raised by a job are captured instead of killing the worker."""
+    queue = MoveJobQueue(max_workers=1, max_pending=2)
+
+    def boom(deadline):
+        raise ValueError('search exploded')
+
+    job = queue.submit(boom)
+    assert job.wait(5.0)
+    assert job.status == 'failed'
+    assert 'search exploded' in job.error
+    queue.shutdown()
@@ -0,0 +1,65 @@
+# tests/test_lockstep.py
+
+import sys
+import os
+import random
+import numpy as np
+import torch
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.ai.network import GameNet
+from tfg.ai.numpy_net import export_npz
+from tfg.ai.bots import make_bot
+from tfg.ai.lockstep import play_lockstep, duel
+from tfg.game.board import Board
+from self_play import self_play_game
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    torch.manual_seed(0)
+    path = str(tmp_path / 'model.npz')
+    export_npz(GameNet().state_dict(), path)
+    return path
+
+
+def _one_move(bot, board):
+    move, pi = yield bot, board
+    return move, pi
+
+
+def test_lockstep_matches_sequential_search(model_path):
+    """Lockstep searches pick the same moves as running each search alone, in shared batches."""
+    random.seed(0)
+    boards = []
+    for _ in range(4):
+        board = Board()
+        board.place_fleet()
+        for _ in range(random.randint(0, 10)):
+            board.shoot(random.randrange(6), random.randrange(6))
+        boards.append(board)
+
+    bots = [make_bot('ml_mcts', iters=30, model_path=model_path, eps_noise=0.0) for _ in boards]
+    results, stats = play_lockstep([_one_move(bot, b) for bot, b in zip(bots, boards)])
+    sequential = [make_bot('ml_mcts', iters=30, model_path=model_path, eps_noise=0.0).run(b)
+                  for b in boards]
+
+    assert [move for move, _ in results] == sequential
+    assert all(abs(sum(pi) - 1.0) < 1e-9 for _, pi in results)
+    assert stats.searches == 4 and stats.batches < stats.positions
+
+
+def test_lockstep_plays_full_games(model_path):
+    """Self-play and duel games (with a plain MCTS opponent) run to completion through the driver."""
+    bots = [make_bot('ml_mcts', iters=5, model_path=model_path) for _ in range(3)]
+    finished = []
+    results, stats = play_lockstep([self_play_game(b) for b in bots[:2]]
+                                   + [duel(make_bot('mcts', iters=5), bots[2])],
+                                   on_result=lambda i, r: finished.append(i))
+    assert sorted(finished) == [0, 1, 2] and stats.games == 3
+    for records in results[:2]:
+        assert {r['z'] for r in records} == {1, -1}
+        assert all(abs(sum(r['pi']) - 1.0) < 1e-9 for r in records)
+    assert results[2][0] in ('MCTS', 'NeuralMCTS')
@@ -0,0 +1,74 @@
+# tests/test_model_registry.py
+
+import sys
+import os
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.ai.network import GameNet
+from tfg.ai.model_registry import ModelRegistry, EvalCache
+from tfg.ai import mcts_ml
+from tfg.ai.mcts_ml import NeuralMCTS
+from tfg.game.board import Board
+
+
+def _save_weights(path, seed, mtime_ns):
+    torch.manual_seed(seed)
+    torch.save(GameNet().state_dict(), path)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_registry_reloads_changed_checkpoint(tmp_path):
+    """The registry loads a checkpoint once, then swaps to a new version when the file changes."""
+    path = str(tmp_path / 'model.pth')
+    _save_weights(path, seed=0, mtime_ns=1_000_000_000)
+    registry = ModelRegistry(check_interval=0.0)
+
+    first = registry.acquire(path)
+    assert registry.acquire(path) is first
+    first.cache.put('pos', ([0.0], 0.0))
+
+    _save_weights(path, seed=1, mtime_ns=2_000_000_000)
+    second = registry.acquire(path)
+    assert second.version != first.version
+    assert len(second.cache) == 0
+    assert registry.stats()[0]['reloads'] == 1
+
+    # a truncated file (e.g. caught mid-write) keeps the current version in service
+    with open(path, 'wb') as f:
+        f.write(b'partial')
+    assert registry.acquire(path) is second
+    assert registry.stats()[0]['errors'] == 1
+
+
+def test_search_switches_weights_between_moves(tmp_path, monkeypatch):
+    """NeuralMCTS caches evaluations per version and only swaps weights at the start of a search."""
+    path = str(tmp_path / 'model.pth')
+    _save_weights(path, seed=0, mtime_ns=1_000_000_000)
+    monkeypatch.setattr(mcts_ml, 'registry', ModelRegistry(check_interval=0.0))
+
+    bot = NeuralMCTS(path, iters=5)
+    board = Board()
+    board.place_fleet()
+    bot.run(board)
+    v1 = bot.model_version
+    cache = bot._active.cache
+    assert cache.stats()['misses'] > 0
+    bot.run(board)
+    assert cache.stats()['hits'] > 0
+
+    _save_weights(path, seed=1, mtime_ns=2_000_000_000)
+    assert bot.model_version == v1
+    bot.run(board)
+    assert bot.model_version != v1
+
+
+def test_eval_cache_is_bounded():
+    """The evaluation cache evicts its least recently used entries."""
+    cache = EvalCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and len(cache) == 2
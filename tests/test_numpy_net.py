@@ -0,0 +1,41 @@
+# tests/test_numpy_net.py
+
+import sys
+import os
+import subprocess
+import numpy as np
+import torch
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.ai.network import GameNet
+from tfg.ai.numpy_net import NumpyGameNet, export_npz
+
+
+def test_numpy_forward_matches_torch(tmp_path):
+    """The exported NumPy network reproduces the torch logits and values."""
+    torch.manual_seed(0)
+    model = GameNet().eval()
+    path = str(tmp_path / 'model.npz')
+    export_npz(model.state_dict(), path)
+    net = NumpyGameNet.load(path)
+
+    x = (np.random.default_rng(0).random((32, 3, 6, 6)) < 0.3).astype(np.float32)
+    with torch.no_grad():
+        ref_logits, ref_value = model(torch.from_numpy(x))
+    logits, value = net.forward(x)
+    assert logits.shape == (32, 36) and value.shape == (32,)
+    np.testing.assert_allclose(logits, ref_logits.numpy(), atol=1e-5)
+    np.testing.assert_allclose(value, ref_value.numpy(), atol=1e-5)
+
+
+def test_ml_bot_runs_without_torch(tmp_path):
+    """An ML-MCTS bot on a .npz export searches without importing torch."""
+    path = str(tmp_path / 'model.npz')
+    export_npz(GameNet().state_dict(), path)
+    code = ("import sys; from tfg.ai.bots import make_bot; from tfg.game.board import Board; "
+            "b = Board(); b.place_fleet(); "
+            f"bot = make_bot('ml_mcts', iters=10, model_path={path!r}); bot.run(b); "
+            "assert bot.backend == 'numpy' and 'torch' not in sys.modules")
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
@@ -0,0 +1,49 @@
+# tests/test_opening_book.py
+
+import sys
+import os
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.game.board import Board, BOARD_SIZE
+from tfg.algorithms.mcts import MCTS
+from tfg.algorithms.opening_book import OpeningBook, build_opening_book, mcts_policy, sample_fleet
+
+
+def test_sampled_fleets_match_the_shots():
+    """Sampled fleets cover every hit cell, leave every missed cell empty and keep the shots marked."""
+    hits, misses = 1 << 0, (1 << 1) | (1 << 14)
+    for _ in range(20):
+        board = sample_fleet(hits, misses)
+        assert board.shot_masks() == (hits, misses)
+        assert len(board.boats) == 5
+        assert any((0, 0) in boat['positions'] for boat in board.boats)
+
+
+def test_book_round_trip_and_engine_lookup(tmp_path):
+    """A built book survives save/load and answers the engine's opening moves without a search."""
+    book = build_opening_book(mcts_policy(30), max_shots=2, samples=2, seed=0)
+    # the empty board plus at most one position per outcome of the first move
+    assert 2 <= len(book) <= 3
+
+    path = tmp_path / 'book.npz'
+    book.save(path)
+    loaded = OpeningBook.load(path)
+    assert loaded.entries == pytest.approx(book.entries)
+    assert loaded.meta['max_shots'] == 2
+
+    board = Board()
+    board.place_fleet()
+    mcts = MCTS(iterations=10, opening_book=loaded)
+    move = mcts.run(board)
+    assert move == divmod(loaded.entries[(0, 0)][0], BOARD_SIZE)
+    assert mcts.root is None
+
+    # two shots in, the position is out of the book and the engine searches as usual
+    board.shoot(*move)
+    board.shoot(*next((i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)
+                      if board.get_cell(i, j) not in ('X', 'O')))
+    assert mcts.run(board) is not None
+    assert mcts.root is not None
+    assert loaded.stats()['found'] == 1
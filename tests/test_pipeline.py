@@ -0,0 +1,78 @@
+# tests/test_pipeline.py
+
+import sys
+import os
+import json
+import random
+import torch
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.ai.bots import make_bot
+from tfg.ai.checkpoint import atomic_save
+from tfg.ai.network import GameNet
+from tfg.data.replay import ReplayBuffer
+from tfg.data.stream import ShardStream
+from pipeline import (DEFAULTS, incumbent_path, candidate_path, replay_buffer, self_play_round,
+                      train_candidate, gate)
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+@pytest.fixture
+def records():
+    with open(DATA) as f:
+        return [json.loads(line) for line in f if line.strip()][:300]
+
+
+def test_buffer_evicts_oldest_shards(tmp_path, records):
+    """The buffer keeps the newest shards holding at least capacity records, as finished shards."""
+    buffer = ReplayBuffer(str(tmp_path), capacity=200)
+    names = [buffer.add(records[i:i + 100]) for i in range(0, 300, 100)]
+    assert buffer.add([]) is None
+    assert [name for name, _ in buffer.shards()] == names[1:] and len(buffer) == 200
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+    # the buffer is a sharded run that can be streamed
+    stream = ShardStream(str(tmp_path), val_fraction=0.0, batch_size=50)
+    assert sum(len(z) for _, _, z in stream) == 200
+
+
+def test_buffer_samples_present_records(tmp_path, records):
+    buffer = ReplayBuffer(str(tmp_path), capacity=100)
+    assert buffer.sample(4) is None
+    buffer.add(records[:100])
+    buffer.add(records[100:200])
+    x, pi, z = buffer.sample(500, random.Random(0))
+    assert x.shape == (500, 3, 6, 6) and pi.shape == (500, 36) and z.shape == (500,)
+    newest = {json.dumps(r['state']) for r in records[100:200]}
+    assert all(json.dumps(s) in newest for s in x.tolist())
+
+
+def test_stages_promote_only_winning_candidates(tmp_path):
+    """Self-play fills the buffer, the trainer writes a candidate, the gate promotes it atomically
+    when it scores above the threshold and keeps the incumbent otherwise."""
+    run = str(tmp_path)
+    options = {**DEFAULTS, 'iters': 5, 'parallel_games': 2, 'gate_games': 2, 'capacity': 1000}
+    torch.manual_seed(0)
+    atomic_save(GameNet().state_dict(), incumbent_path(run))
+    buffer = replay_buffer(run, options)
+    bots = [make_bot('ml_mcts', iters=5, model_path=incumbent_path(run)) for _ in range(2)]
+    stats = self_play_round(buffer, bots)
+    assert stats.games == 2 and len(buffer) > 0
+
+    net = GameNet()
+    optimizer = torch.optim.Adam(net.parameters(), lr=1e-3)
+    loss = train_candidate(net, optimizer, buffer, steps=3, batch_size=16, rng=random.Random(0))
+    assert loss > 0
+    atomic_save(net.state_dict(), candidate_path(run))
+
+    rejected = gate(run, {**options, 'threshold': 1.0})
+    assert not rejected['promoted'] and rejected['wins_a'] + rejected['wins_b'] == 2
+    assert rejected['incumbent'] != rejected['candidate']
+    promoted = gate(run, {**options, 'threshold': -1.0})
+    assert promoted['promoted']
+    assert all(torch.equal(w, net.state_dict()[k]) for k, w in torch.load(incumbent_path(run)).items())
+    with open(tmp_path / 'gate.jsonl') as f:
+        assert [json.loads(line)['promoted'] for line in f] == [False, True]
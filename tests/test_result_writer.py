@@ -0,0 +1,68 @@
+# tests/test_result_writer.py
+
+import sys
+import os
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, func, select
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.server.models import db, GameResult, GameStatsRollup
+from tfg.server.result_writer import ResultWriter
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'results.db'}")
+    db.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _count(engine, table=GameResult.__table__):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_writer_batches_and_flushes_on_close(engine):
+    """Results from several threads are written in batches, with their rollups, and none are lost."""
+    writer = ResultWriter(engine, batch_size=50, flush_interval=60.0)
+
+    def play(n):
+        for i in range(n):
+            writer.record('mcts_vs_ml_mcts', 'MCTS' if i % 2 else 'NeuralMCTS', float(i))
+
+    threads = [threading.Thread(target=play, args=(120,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+
+    assert _count(engine) == 480
+    with engine.connect() as conn:
+        assert conn.execute(select(func.sum(GameStatsRollup.games))).scalar() == 480
+    stats = writer.stats()
+    assert stats['written'] == 480 and stats['queued'] == 0
+    assert stats['batches'] < 480 // 10
+
+
+def test_writer_flushes_on_interval_and_on_demand(engine):
+    """A partial batch is written once it has waited flush_interval, or immediately on flush()."""
+    writer = ResultWriter(engine, batch_size=1000, flush_interval=0.2)
+    writer.record('uservsmcts', 'user', 12.0)
+    time.sleep(0.6)
+    assert _count(engine) == 1
+
+    writer.flush_interval = 60.0
+    assert writer.flush(timeout=0) and not writer._flush_requested  # nothing queued
+    writer.record('uservsmcts', 'MCTS', 8.0)
+    assert writer.flush(timeout=5.0)
+    assert _count(engine) == 2
+    writer.close()
+
+    # results recorded after close are written synchronously
+    writer.record('uservsmcts', 'user', 3.0)
+    assert _count(engine) == 3
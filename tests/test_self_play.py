@@ -0,0 +1,39 @@
+# tests/test_self_play.py
+
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from self_play import generate_shards, shard_path
+
+
+def _read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_sharded_self_play_resumes(tmp_path):
+    """Shards are played by a worker pool, marked done, and only unfinished shards are replayed."""
+    out = str(tmp_path / 'run')
+    summary = generate_shards(out, num_games=5, iters=2, workers=2, shard_games=2, seed=7,
+                              log=lambda msg: None)
+    assert summary['games'] == 5 and summary['skipped'] == 0
+    shards = [_read(shard_path(out, i)) for i in range(3)]
+    assert sum(len(s) for s in shards) == summary['records']
+    assert all(set(r) == {'state', 'pi', 'z'} for s in shards for r in s)
+
+    # an interrupted shard (no marker) is replayed with its own seed, the others are kept
+    os.remove(shard_path(out, 1)[:-len('.jsonl')] + '.done')
+    with open(shard_path(out, 1), 'w') as f:
+        f.write('{"partial": ')
+    summary = generate_shards(out, num_games=5, iters=2, workers=2, shard_games=2, seed=7,
+                              log=lambda msg: None)
+    assert summary['games'] == 2 and summary['skipped'] == 2
+    assert _read(shard_path(out, 1)) == shards[1]
+
+    with pytest.raises(ValueError):
+        generate_shards(out, num_games=5, iters=3, shard_games=2, seed=7, log=lambda msg: None)
@@ -0,0 +1,70 @@
+# tests/test_sessions.py
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.algorithms.mcts import MCTS
+from tfg.server.sessions import GameSession, SessionStore, SESSION_BYTES
+
+
+class _NoBot:
+    """Stand-in for the ML bot so sessions can be built without loading a model."""
+    root = None
+
+
+def _make_session(game_id):
+    return GameSession(game_id, vanilla_mcts=MCTS(iterations=5), ml_mcts=_NoBot())
+
+
+def test_sessions_are_independent():
+    """Two games in the same store keep separate boards and turn state."""
+    store = SessionStore(_make_session)
+    a = store.get_or_create('a')
+    b = store.get_or_create('b')
+    a.init_game()
+    b.init_game()
+
+    a.pc_board.shoot(0, 0)
+    a.user_turn = False
+
+    assert store.get_or_create('a') is a
+    assert b.pc_board.get_cell(0, 0) not in ['X', 'O']
+    assert b.user_turn is True
+
+
+def test_lru_eviction_respects_max_sessions():
+    """Once max_sessions is exceeded the least recently used game is evicted."""
+    store = SessionStore(_make_session, max_sessions=2)
+    store.get_or_create('a')
+    store.get_or_create('b')
+    store.get('a')                 # 'b' becomes least recently used
+    store.get_or_create('c')
+
+    assert len(store) == 2
+    assert store.get('b') is None
+    assert store.get('a') is not None and store.get('c') is not None
+    assert store.stats()['evicted'] == 1
+
+
+def test_idle_and_memory_cap_eviction():
+    """Idle games are dropped and the estimated footprint never exceeds the memory cap."""
+    store = SessionStore(_make_session, idle_timeout=60.0, max_bytes=2 * SESSION_BYTES)
+    old = store.get_or_create('old')
+    old.last_access -= 120.0
+    store.get_or_create('new')
+    assert store.get('old') is None
+
+    store.get_or_create('x')
+    store.get_or_create('y')
+    assert store.stats()['bytes'] <= 2 * SESSION_BYTES
+
+
+def test_footprint_counts_tree_nodes():
+    """After a search, the session footprint grows with the size of its tree."""
+    game = _make_session('g')
+    game.init_game()
+    game.vanilla_mcts.run(game.user_board)
+    assert game.tree_size() > 1
+    assert game.update_footprint() > SESSION_BYTES
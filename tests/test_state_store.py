@@ -0,0 +1,101 @@
+# tests/test_state_store.py
+
+import sys
+import os
+import multiprocessing
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.algorithms.mcts import MCTS
+from tfg.game.board import BOARD_SIZE
+from tfg.server.sessions import GameSession
+from tfg.server.state_store import SQLiteGameStore, StaleWriteError, make_store
+
+
+class _NoBot:
+    """Stand-in for the ML bot so sessions can be built without loading a model."""
+    root = None
+
+
+def _make_session(game_id):
+    return GameSession(game_id, vanilla_mcts=MCTS(iterations=10), ml_mcts=_NoBot())
+
+
+def _shoot_with_retry(path, game_id, cell):
+    """Worker process: load the game, shoot one cell and save, retrying on stale writes."""
+    store = SQLiteGameStore(path, _make_session)
+    while True:
+        game = store.load(game_id)
+        game.pc_board.shoot(*cell)
+        try:
+            store.save(game)
+            return
+        except StaleWriteError:
+            continue
+
+
+def test_game_round_trips_with_search_tree(tmp_path):
+    """A saved game, including its MCTS tree, is restored identically by another store instance."""
+    path = str(tmp_path / 'games.db')
+    store = SQLiteGameStore(path, _make_session)
+    game = store.create('g1')
+    game.init_game()
+    game.vanilla_mcts.run(game.user_board)
+    store.save(game)
+
+    loaded = SQLiteGameStore(path, _make_session).load('g1')
+    assert loaded.version == 1
+    assert loaded.user_board.board == game.user_board.board
+    assert loaded.pc_board.boats == game.pc_board.boats
+    assert loaded.vanilla_mcts.root.to_dict() == game.vanilla_mcts.root.to_dict()
+    # the restored tree can keep searching
+    assert loaded.vanilla_mcts.run(loaded.user_board) is not None
+
+
+def test_stale_write_is_rejected(tmp_path):
+    """Two copies loaded from the same version: the second save must fail."""
+    store = SQLiteGameStore(str(tmp_path / 'games.db'), _make_session)
+    game = store.create('g1')
+    game.init_game()
+    store.save(game)
+
+    first, second = store.load('g1'), store.load('g1')
+    first.message = 'first'
+    store.save(first)
+    second.message = 'second'
+    with pytest.raises(StaleWriteError):
+        store.save(second)
+    assert store.load('g1').message == 'first'
+
+
+def test_concurrent_worker_processes_do_not_lose_updates(tmp_path):
+    """Several processes updating one game with retries end up applying every shot exactly once."""
+    path = str(tmp_path / 'games.db')
+    store = SQLiteGameStore(path, _make_session)
+    game = store.create('shared')
+    game.init_game()
+    store.save(game)
+
+    cells = [(i, j) for i in range(2) for j in range(BOARD_SIZE)]
+    # spawn, not fork: SQLite connections must not be inherited by child processes
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=_shoot_with_retry, args=(path, 'shared', c)) for c in cells]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+        assert p.exitcode == 0
+
+    final = store.load('shared')
+    assert final.version == 1 + len(cells)
+    assert all(final.pc_board.get_cell(*c) in ['X', 'O'] for c in cells)
+
+
+def test_make_store_selects_backend(tmp_path):
+    """'memory' gives the in-process backend, sqlite URLs the shared one."""
+    assert make_store('memory', _make_session).stats()['backend'] == 'memory'
+    url = 'sqlite:///' + str(tmp_path / 'games.db')
+    assert make_store(url, _make_session).stats()['backend'] == 'sqlite'
+    with pytest.raises(ValueError):
+        make_store('redis://localhost', _make_session)
@@ -0,0 +1,75 @@
+# tests/test_stats.py
+
+import sys
+import os
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.server.models import db, init_db, add_results, rebuild_rollups, GameStatsRollup
+from tfg.server import stats
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'stats.db'}"
+    init_db(app)
+    with app.app_context():
+        yield app
+
+
+def _results(n, start=datetime(2025, 1, 1)):
+    return [{'game_mode': 'mcts_vs_ml_mcts',
+             'winner':    'MCTS' if i % 4 == 0 else 'NeuralMCTS',
+             'duration':  float(i + 1),
+             'timestamp': start + timedelta(hours=i)} for i in range(n)]
+
+
+def test_summary_matches_raw_results(app):
+    """Win counts, averages and the daily series come from the rollups and match the raw rows."""
+    add_results(db.session, _results(100))
+    db.session.commit()
+    out = stats.summary(db.session)['mcts_vs_ml_mcts']
+
+    assert out['total'] == 100
+    assert out['wins'] == {'MCTS': 25, 'NeuralMCTS': 75}
+    assert out['avg_duration']['MCTS'] == pytest.approx(sum(range(1, 101, 4)) / 25)
+    assert out['duration']['min'] == 1.0 and out['duration']['max'] == 100.0
+    assert out['duration']['p50'] == pytest.approx(50.0, rel=0.05)
+    assert out['duration']['p90'] == pytest.approx(90.0, rel=0.05)
+    # 100 hourly games span 5 days (24 + 24 + 24 + 24 + 4)
+    assert [p['games'] for p in out['series']] == [24, 24, 24, 24, 4]
+    assert stats.summary(db.session, bucket='month')['mcts_vs_ml_mcts']['series'][0]['games'] == 100
+    assert stats.summary(db.session)['uservsmcts']['total'] == 0
+
+
+def test_rebuild_rollups_is_equivalent(app):
+    """Recomputing the rollups from raw rows gives the same aggregates as incremental updates."""
+    for batch in (_results(30), _results(30, start=datetime(2025, 3, 1))):
+        add_results(db.session, batch)
+    db.session.commit()
+    before = stats.summary(db.session)
+    rebuild_rollups(db.session, chunk=7)
+    db.session.commit()
+
+    assert stats.summary(db.session) == before
+    assert db.session.query(GameStatsRollup).count() == 2 * 2 * 2  # winners x days x batches
+
+
+def test_history_pages_through_every_game(app):
+    """Keyset pagination returns each game exactly once, newest first."""
+    add_results(db.session, _results(23))
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = stats.history(db.session, 'mcts_vs_ml_mcts', limit=5, before=cursor)
+        seen.extend(r['duration'] for r in page['rows'])
+        cursor = page['next']
+        if cursor is None:
+            break
+    assert seen == [float(i) for i in range(23, 0, -1)]
+    assert len(list(stats.iter_results(db.session, chunk=4))) == 23
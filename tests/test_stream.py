@@ -0,0 +1,82 @@
+# tests/test_stream.py
+
+import sys
+import os
+import json
+import numpy as np
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.data.stream import ShardStream, shuffle_buffer
+from train import StreamingGameDataset, train
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+@pytest.fixture
+def shard_dir(tmp_path):
+    """data.jsonl split into 20 finished shards, plus one still being written."""
+    with open(DATA) as f:
+        lines = [l for l in f if l.strip()]
+    for i in range(21):
+        path = tmp_path / f'shard-{i:05d}.jsonl'
+        path.write_text(''.join(lines[i * 45:(i + 1) * 45]))
+        if i < 20:
+            (tmp_path / f'shard-{i:05d}.done').write_text('{}')
+    return str(tmp_path)
+
+
+def states(stream):
+    return [x.reshape(len(x), -1) for x, _, _ in stream]
+
+
+def test_holdout_partitions_finished_shards(shard_dir):
+    """Training and validation splits are disjoint and together cover every finished record."""
+    for holdout in ('shard', 'hash'):
+        trn = ShardStream(shard_dir, 'train', holdout, val_fraction=0.2, batch_size=50)
+        val = ShardStream(shard_dir, 'val', holdout, val_fraction=0.2, batch_size=50)
+        x_trn, x_val = np.concatenate(states(trn)), np.concatenate(states(val))
+        assert len(x_trn) + len(x_val) == 20 * 45 and len(x_val) > 0
+        if holdout == 'shard':
+            assert not set(trn.shards()) & set(val.shards())
+            assert len(trn.shards()) + len(val.shards()) == 20
+        else:
+            # a position is always on the same side
+            assert not {r.tobytes() for r in x_trn} & {r.tobytes() for r in x_val}
+        assert np.array_equal(np.concatenate(states(val)), x_val)  # deterministic
+
+
+def test_stream_is_shuffled_and_resumes(shard_dir):
+    """Epochs differ, and a restored stream continues exactly where the saved one stopped."""
+    a = ShardStream(shard_dir, batch_size=32, buffer_size=100, seed=3)
+    first = [z.tolist() for _, _, z in a]
+    second = [z.tolist() for _, _, z in a]
+    assert a.epoch == 2 and sorted(sum(first, [])) == sorted(sum(second, [])) and first != second
+
+    b = ShardStream(shard_dir, batch_size=32, buffer_size=100, seed=3)
+    it = iter(b)
+    head = [next(it)[0] for _ in range(5)]
+    state = json.loads(json.dumps(b.state_dict()))
+    rest = [x for x, _, _ in it]
+
+    c = ShardStream(shard_dir, batch_size=32, buffer_size=100, seed=3)
+    c.load_state_dict(state)
+    resumed = [x for x, _, _ in c]
+    assert len(resumed) == len(rest) and all(np.array_equal(u, v) for u, v in zip(resumed, rest))
+    assert sum(map(len, head + rest)) == len(sum(first, []))
+
+    items = list(shuffle_buffer(range(1000), 64, __import__('random').Random(0)))
+    assert sorted(items) == list(range(1000)) and items != list(range(1000))
+
+
+def test_train_streams_shards(shard_dir, tmp_path):
+    """train() streams from a shard directory and saves the stream position after every epoch."""
+    state = str(tmp_path / 'stream.json')
+    train(shard_dir, epochs=2, batch_size=64, model_out=str(tmp_path / 'model.pth'), stream=True,
+          val_split=0.2, stream_state=state)
+    with open(state) as f:
+        assert json.load(f) == {'epoch': 2, 'position': 0, 'shards': None}
+    assert os.path.exists(tmp_path / 'model.pth')
+    assert len(next(iter(StreamingGameDataset(shard_dir, batch_size=64)))[0]) == 64
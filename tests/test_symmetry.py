@@ -0,0 +1,100 @@
+# tests/test_symmetry.py
+
+import sys
+import os
+import random
+import numpy as np
+import torch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tfg.game.board import Board
+from tfg.game.symmetry import (N_SYMMETRIES, PERMUTATIONS, INVERSE, augment, transform_board,
+                               transform_states, transform_pi, transform_mask, canonical_masks,
+                               canonical_masks_batch)
+from tfg.data.binary import states_to_masks
+from tfg.ai.network import GameNet
+from tfg.ai.mcts_ml import NeuralMCTS
+from tfg.ai.lockstep import play_lockstep
+from train import random_symmetry
+
+
+def played_board(seed, shots=12):
+    random.seed(seed)
+    board = Board()
+    board.place_fleet()
+    for _ in range(shots):
+        board.shoot(random.randrange(6), random.randrange(6))
+    return board
+
+
+def test_symmetries_form_a_group():
+    """The 8 permutations are distinct, and each has its inverse among them."""
+    assert len({p.tobytes() for p in PERMUTATIONS}) == N_SYMMETRIES
+    for k in range(N_SYMMETRIES):
+        assert np.array_equal(PERMUTATIONS[k][PERMUTATIONS[INVERSE[k]]], np.arange(36))
+
+
+def test_transforms_agree_on_tensors_masks_and_boards():
+    """Transforming a board, its tensor or its masks gives the same position."""
+    board = played_board(0)
+    for k in range(N_SYMMETRIES):
+        image = transform_board(board, k)
+        assert np.array_equal(image.to_tensor(), transform_states(board.to_tensor(), k))
+        hits, misses = board.shot_masks()
+        assert image.shot_masks() == (transform_mask(hits, k), transform_mask(misses, k))
+        # the fleet moves with the grid
+        assert all(image.get_cell(x, y) == boat['value'] or image.get_cell(x, y) == 'X'
+                   for boat in image.boats for x, y in boat['positions'])
+
+
+def test_canonical_key_is_shared_by_all_images():
+    """All images of a position have one canonical key, and the scalar and batch forms agree."""
+    boards = [played_board(seed) for seed in range(20)]
+    for board in boards:
+        key, k = canonical_masks(*board.shot_masks())
+        for j in range(N_SYMMETRIES):
+            assert canonical_masks(*transform_board(board, j).shot_masks())[0] == key
+        assert transform_board(board, k).shot_masks() == key
+
+    hits, misses = states_to_masks(np.stack([b.to_tensor() for b in boards]))
+    ch, cm, ks = canonical_masks_batch(hits, misses)
+    assert [canonical_masks(*b.shot_masks()) for b in boards] == \
+        [((int(h), int(m)), int(k)) for h, m, k in zip(ch, cm, ks)]
+
+
+def test_augmentation_moves_states_and_policies_together():
+    """The batch augmentations (numpy and torch) apply the same symmetry to a state and its policy."""
+    states = np.stack([played_board(seed).to_tensor() for seed in range(16)])
+    pi = np.random.default_rng(0).random((16, 36)).astype(np.float32)
+    ks = np.arange(16) % N_SYMMETRIES
+    x, p = augment(states, pi, ks)
+    for i, k in enumerate(ks):
+        assert np.array_equal(x[i], transform_states(states[i], k))
+        assert np.array_equal(p[i], transform_pi(pi[i], k))
+
+    gen = torch.Generator().manual_seed(5)
+    tx, tp = random_symmetry(torch.from_numpy(states), torch.from_numpy(pi), gen)
+    ks = torch.randint(N_SYMMETRIES, (16,), generator=torch.Generator().manual_seed(5)).numpy()
+    x, p = augment(states, pi, ks)
+    assert np.array_equal(tx.numpy(), x) and np.array_equal(tp.numpy(), p)
+
+
+def test_symmetric_search_shares_evaluations():
+    """With symmetry, the images of a position hit one cache entry and get the moved priors."""
+    torch.manual_seed(0)
+    bot = NeuralMCTS(None, iters=5, model=GameNet().eval(), symmetry=True)
+    board = played_board(1)
+    priors, value = bot._evaluate(board)
+    cache, _ = bot.evaluator()
+    for k in range(N_SYMMETRIES):
+        p, v = bot._evaluate(transform_board(board, k))
+        np.testing.assert_allclose(p, transform_pi(np.array(priors), k), rtol=1e-6)
+        assert v == value
+    assert len(cache) == 1
+
+    # lockstep games use the same keys
+    def game(b):
+        move, _ = yield bot, b
+        return move
+    results, stats = play_lockstep([game(transform_board(board, k)) for k in range(N_SYMMETRIES)])
+    assert len(results) == N_SYMMETRIES and stats.positions < N_SYMMETRIES * 6
@@ -0,0 +1,55 @@
+# tests/test_train_pipeline.py
+
+import sys
+import os
+import torch
+from torch.utils.data import DataLoader
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from tfg.data.binary import jsonl_to_binary
+from train import (GameDataset, TensorGameDataset, BinaryGameDataset, BlockBatchSampler,
+                   split_indices, load_dataset, train)
+
+DATA = os.path.join(ROOT, 'data.jsonl')
+
+
+def test_tensor_dataset_matches_jsonl_dataset(tmp_path):
+    """The in-memory dataset holds the GameDataset samples, from JSONL or from binary shards."""
+    ref = GameDataset(DATA)
+    ds = load_dataset(DATA)
+    assert isinstance(ds, TensorGameDataset) and len(ds) == len(ref)
+    for i in (0, 500, 954):
+        assert all(torch.equal(a, b) for a, b in zip(ds[i], ref[i]))
+
+    jsonl_to_binary([DATA], str(tmp_path / 'bin'), shard_records=400)
+    assert isinstance(load_dataset(str(tmp_path / 'bin')), BinaryGameDataset)
+    mem = load_dataset(str(tmp_path / 'bin'), in_memory=True)
+    assert isinstance(mem, TensorGameDataset) and torch.equal(mem.x, ds.x)
+    assert torch.allclose(mem.pi, ds.pi, atol=1e-3) and torch.equal(mem.z, ds.z)
+
+
+def test_block_batch_sampler_covers_split_once():
+    """Every epoch visits each index of the split exactly once, in a new order."""
+    trn, val = split_indices(955, 0.1, torch.Generator().manual_seed(0))
+    assert len(val) == 95 and sorted(torch.cat([trn, val]).tolist()) == list(range(955))
+
+    sampler = BlockBatchSampler(trn, 128, generator=torch.Generator().manual_seed(1))
+    epochs = [torch.cat(list(sampler)) for _ in range(2)]
+    assert len(sampler) == 7 and [len(b) for b in sampler][-1] == 860 - 6 * 128
+    assert all(sorted(e.tolist()) == sorted(trn.tolist()) for e in epochs)
+    assert not torch.equal(epochs[0], epochs[1])
+    assert torch.equal(torch.cat(list(BlockBatchSampler(val, 64, shuffle=False))), val)
+
+    ds = load_dataset(DATA)
+    loader = DataLoader(ds, batch_sampler=BlockBatchSampler(trn, 128), collate_fn=ds.collate)
+    x, pi, z = next(iter(loader))
+    assert x.shape == (128, 3, 6, 6) and pi.shape == (128, 36) and z.shape == (128,)
+
+
+def test_train_runs(tmp_path, capsys):
+    """train() runs an epoch end to end, reports its throughput and saves the model."""
+    out = str(tmp_path / 'model.pth')
+    train(DATA, epochs=1, batch_size=128, model_out=out)
+    assert os.path.exists(out) and 'samples/s' in capsys.readouterr().out
@@ -0,0 +1,181 @@
+"""
+tfg.ai.bots
+==============
+This module implements the bot factory used by the web application and the batch tools. Bots are
+registered by name and built from a plain configuration (a dict or a 'name:key=value,...' spec), so
+every tool applies the same search budgets. Builders import their engine only when called, so tools
+that never build an ML bot never import torch, and ML bots load their weights on their first search.
+"""
+
+import functools
+
+_REGISTRY = {}
+
+
+def register_bot(name):
+    """ Register a bot builder under a name.
+
+    The builder receives the bot options as keyword arguments; every builder accepts `iters`
+    (search budget per move) and `opening_book` (an OpeningBook or the path of one).
+
+    Args:
+        name (str): The name of the bot, as used in configurations.
+
+    Returns:
+        callable: Decorator registering the builder.
+    """
+    def decorator(builder):
+        _REGISTRY[name] = builder
+        return builder
+    return decorator
+
+
+def available_bots():
+    """ List the registered bots.
+
+    Returns:
+        list: The registered bot names, sorted.
+    """
+    return sorted(_REGISTRY)
+
+
+def make_bot(name, **options):
+    """ Build a bot.
+
+    Args:
+        name (str): The name of a registered bot, e.g. 'mcts' or 'ml_mcts'.
+        **options: Options passed to the bot's builder.
+
+    Raises:
+        ValueError: If no bot is registered under that name.
+
+    Returns:
+        object: The bot, exposing run(board).
+    """
+    if name not in _REGISTRY:
+        raise ValueError(f"Unknown bot '{name}'. Available: {', '.join(available_bots())}")
+    return _REGISTRY[name](**options)
+
+
+def bot_from_config(config, **overrides):
+    """ Build a bot from a configuration.
+
+    Args:
+        config (str | dict): A spec like 'ml_mcts:iters=100,c_puct=1.5', or a dict with a 'bot' key
+            and the options.
+        **overrides: Options taking precedence over the configuration (None values are ignored).
+
+    Returns:
+        object: The bot.
+    """
+    name, options = parse_bot_spec(config) if isinstance(config, str) else (
+        config['bot'], {k: v for k, v in config.items() if k != 'bot'})
+    options.update({k: v for k, v in overrides.items() if v is not None})
+    return make_bot(name, **options)
+
+
+def parse_bot_spec(spec):
+    """ Parse a bot spec of the form 'name' or 'name:key=value,key=value'.
+    Values are converted to int or float when possible.
+
+    Args:
+        spec (str): The spec.
+
+    Raises:
+        ValueError: If an option is not of the form key=value.
+
+    Returns:
+        tuple: The bot name and a dict of options.
+    """
+    name, _, rest = spec.partition(':')
+    options = {}
+    for item in filter(None, rest.split(',')):
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"Malformed bot option '{item}' in '{spec}'")
+        for cast in (int, float):
+            try:
+                value = cast(value)
+                break
+            except ValueError:
+                pass
+        options[key.strip()] = value
+    return name.strip(), options
+
+
+@functools.lru_cache(maxsize=None)
+def load_opening_book(path):
+    """ Load an opening book once per process.
+
+    Args:
+        path (str): Path of the .npz book.
+
+    Returns:
+        OpeningBook: The book.
+    """
+    from tfg.algorithms.opening_book import OpeningBook
+    return OpeningBook.load(path)
+
+
+def _book(opening_book):
+    """ Resolve the opening_book option of a builder.
+
+    Args:
+        opening_book (OpeningBook | str): A book, the path of one, or None.
+
+    Returns:
+        OpeningBook: The book, or None.
+    """
+    return load_opening_book(opening_book) if isinstance(opening_book, str) else opening_book
+
+
+@register_bot('mcts')
+def _build_mcts(iters=200, opening_book=None):
+    """ Build a plain MCTS bot.
+
+    Args:
+        iters (int, optional): MCTS iterations per move. Defaults to 200.
+        opening_book (OpeningBook | str, optional): Opening book. Defaults to None.
+
+    Returns:
+        MCTS: The bot.
+    """
+    from tfg.algorithms.mcts import MCTS
+    return MCTS(iterations=iters, opening_book=_book(opening_book))
+
+
+@register_bot('ml_mcts')
+def _build_ml_mcts(iters=100, c_puct=1.0, model_path='model.pth', device='cpu', alpha_noise=0.3,
+                   eps_noise=0.25, model=None, opening_book=None, backend=None,
+                   inference_server=None, symmetry=False):
+    """ Build a neural-guided MCTS bot. Its weights are loaded on its first search.
+
+    Args:
+        iters (int, optional): ML-MCTS iterations per move. Defaults to 100.
+        c_puct (float, optional): Exploration constant. Defaults to 1.0.
+        model_path (str, optional): Path of the network weights, a torch state dict or a .npz export.
+            Defaults to 'model.pth'.
+        device (str, optional): Device to run the network on. Defaults to 'cpu'.
+        alpha_noise (float, optional): Dirichlet noise parameter at the root. Defaults to 0.3.
+        eps_noise (float, optional): Weight of the root noise. Defaults to 0.25.
+        model (GameNet, optional): An already loaded network to use. Defaults to None.
+        opening_book (OpeningBook | str, optional): Opening book. Defaults to None.
+        backend (str, optional): Inference backend (see tfg.ai.inference). Defaults to None (chosen
+            from the checkpoint type).
+        inference_server (str, optional): Address of an inference server (see
+            tfg.ai.inference_server) evaluating positions instead of a local network. Defaults to None.
+        symmetry (bool | int, optional): Whether symmetric positions share their cached evaluation
+            (see tfg.game.symmetry), e.g. 'ml_mcts:symmetry=1'. Defaults to False.
+
+    Returns:
+        NeuralMCTS: The bot.
+    """
+    from tfg.ai.mcts_ml import NeuralMCTS
+    inference = None
+    if inference_server is not None:
+        from tfg.ai.inference_server import InferenceClient
+        inference = InferenceClient(inference_server)
+    return NeuralMCTS(model_path, iters=iters, c_puct=c_puct, alpha_noise=alpha_noise,
+                      eps_noise=eps_noise, device=device, model=model,
+                      opening_book=_book(opening_book), backend=backend, inference=inference,
+                      symmetry=bool(symmetry))
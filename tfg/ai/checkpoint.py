@@ -0,0 +1,95 @@
+"""
+tfg.ai.checkpoint
+====================
+This module writes training checkpoints and served weights crash-safely. Every file is written to a
+temporary file in the destination directory, flushed to disk, and renamed over the destination, so a
+reader (the model registry of the web app, a resumed training) sees either the previous file or the
+new one, never a partial file.
+
+A training run keeps two full checkpoints (model, optimizer, scheduler, early-stopping counters,
+history and data position) in its checkpoint directory: 'last', rewritten periodically, to resume
+from, and 'best', the state at the best validation loss so far.
+"""
+
+import os
+import tempfile
+
+SLOTS = ('last', 'best')
+FORMAT_VERSION = 1
+
+
+def atomic_save(obj, path):
+    """ Save an object with torch.save, replacing path atomically.
+
+    Args:
+        obj (object): The object (e.g. a state dict).
+        path (str): The destination file.
+    """
+    import torch
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            torch.save(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def checkpoint_path(checkpoint_dir, slot):
+    """ Path of a checkpoint slot.
+
+    Args:
+        checkpoint_dir (str): The checkpoint directory of a run.
+        slot (str): 'last' or 'best'.
+
+    Raises:
+        ValueError: If the slot is unknown.
+
+    Returns:
+        str: The path of the slot's file.
+    """
+    if slot not in SLOTS:
+        raise ValueError(f"Unknown checkpoint slot '{slot}', expected one of {SLOTS}.")
+    return os.path.join(checkpoint_dir, f'{slot}.pt')
+
+
+def save_checkpoint(checkpoint_dir, slot, state):
+    """ Write a full training checkpoint to a slot.
+
+    Args:
+        checkpoint_dir (str): The checkpoint directory (created if needed).
+        slot (str): 'last' or 'best'.
+        state (dict): The training state.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    atomic_save({'format_version': FORMAT_VERSION, **state}, checkpoint_path(checkpoint_dir, slot))
+
+
+def load_checkpoint(checkpoint_dir, slot='last', device='cpu'):
+    """ Read a training checkpoint.
+
+    Args:
+        checkpoint_dir (str): The checkpoint directory.
+        slot (str, optional): 'last' or 'best'. Defaults to 'last'.
+        device (str, optional): Device to map the tensors to. Defaults to 'cpu'.
+
+    Raises:
+        ValueError: If the file is a checkpoint of another format.
+
+    Returns:
+        dict: The training state, or None if the slot was never written.
+    """
+    import torch
+
+    path = checkpoint_path(checkpoint_dir, slot)
+    if not os.path.exists(path):
+        return None
+    state = torch.load(path, map_location=device, weights_only=False)
+    if state.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f'{path} is not a version {FORMAT_VERSION} training checkpoint.')
+    return state
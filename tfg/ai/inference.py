@@ -0,0 +1,218 @@
+"""
+tfg.ai.inference
+===================
+This module implements the CPU inference backends used by NeuralMCTS to evaluate positions with
+GameNet. Every backend exposes evaluate_batch, taking a stack of board tensors and returning softmax
+priors and values as NumPy arrays, plus evaluate for a single Board:
+
+- 'eager': the GameNet module as trained.
+- 'torchscript': the module traced and frozen with TorchScript, which folds the weights into the graph
+  and removes most of the Python overhead of a call.
+- 'quantized': the linear layers dynamically quantized to int8 (the convolutions stay in float).
+- 'numpy': the NumPy engine of tfg.ai.numpy_net. It runs a torch GameNet or, torch-free, the
+  NumpyGameNet loaded from an exported .npz checkpoint.
+
+torch is only imported by the backends that need it.
+"""
+
+import warnings
+
+import numpy as np
+
+from tfg.game.board import Board, BOARD_SIZE
+
+_BACKENDS = {}
+
+
+def register_backend(name):
+    """ Register an inference backend class under a name.
+
+    Args:
+        name (str): The name of the backend.
+
+    Returns:
+        callable: Decorator registering the class.
+    """
+    def decorator(cls):
+        cls.name = name
+        _BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def available_backends():
+    """ List the registered inference backends.
+
+    Returns:
+        list: The backend names, sorted.
+    """
+    return sorted(_BACKENDS)
+
+
+def make_backend(name, model, device='cpu'):
+    """ Build an inference backend for a network.
+
+    Args:
+        name (str): The name of a registered backend.
+        model (GameNet): The network, in evaluation mode.
+        device (str, optional): Device the network runs on. Defaults to 'cpu'.
+
+    Raises:
+        ValueError: If no backend is registered under that name.
+
+    Returns:
+        InferenceBackend: The backend.
+    """
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Available: {', '.join(available_backends())}")
+    return _BACKENDS[name](model, device)
+
+
+def default_backend(model_path):
+    """ Choose the backend for a checkpoint: 'numpy' for .npz exports, 'eager' for torch state dicts.
+
+    Args:
+        model_path (str): Path of the checkpoint.
+
+    Returns:
+        str: The backend name.
+    """
+    return 'numpy' if str(model_path).endswith('.npz') else 'eager'
+
+
+class InferenceBackend:
+    """Base class of the inference backends.
+    """
+    name = None
+
+    def evaluate_batch(self, states):
+        """ Evaluate a batch of positions.
+
+        Args:
+            states (np.ndarray): Board tensors of shape (N, 3, BOARD_SIZE, BOARD_SIZE).
+
+        Returns:
+            tuple: Priors of shape (N, BOARD_SIZE**2) and values of shape (N,), as float32 arrays.
+        """
+        raise NotImplementedError
+
+    def evaluate(self, board: Board):
+        """ Evaluate a single position.
+
+        Args:
+            board (Board): The position.
+
+        Returns:
+            tuple: The priors (list of BOARD_SIZE**2 floats) and the value (float).
+        """
+        priors, values = self.evaluate_batch(board.to_tensor()[None])
+        return priors[0].tolist(), float(values[0])
+
+
+class TorchBackend(InferenceBackend):
+    """Base class of the backends running a torch module; subclasses prepare the module in _build.
+    """
+    def __init__(self, model, device='cpu'):
+        """ Initializes the backend.
+
+        Args:
+            model (GameNet): The network, in evaluation mode.
+            device (str, optional): Device the network runs on. Defaults to 'cpu'.
+
+        Raises:
+            ValueError: If the model is not a torch module (e.g. a NumpyGameNet).
+        """
+        import torch
+
+        if not isinstance(model, torch.nn.Module):
+            raise ValueError(f"The '{self.name}' backend needs a torch GameNet; "
+                             f"use the 'numpy' backend for .npz checkpoints.")
+        self.device = torch.device(device)
+        with torch.inference_mode():
+            self.module = self._build(model)
+
+    def _build(self, model):
+        """ Prepare the module used for inference.
+
+        Args:
+            model (GameNet): The network.
+
+        Returns:
+            callable: Module mapping a (N, 3, 6, 6) tensor to (logits, value).
+        """
+        return model
+
+    def evaluate_batch(self, states):
+        import torch
+
+        x = torch.from_numpy(np.ascontiguousarray(states, dtype=np.float32)).to(self.device)
+        with torch.inference_mode():
+            logits, value = self.module(x)
+            priors = torch.softmax(logits, dim=1)
+        return priors.cpu().numpy(), value.reshape(-1).cpu().numpy()
+
+
+@register_backend('eager')
+class EagerBackend(TorchBackend):
+    """Runs the GameNet module as trained."""
+
+
+@register_backend('torchscript')
+class TorchScriptBackend(TorchBackend):
+    """Runs GameNet traced and frozen with TorchScript."""
+
+    def _build(self, model):
+        import torch
+
+        example = torch.zeros(1, 3, BOARD_SIZE, BOARD_SIZE, device=self.device)
+        with warnings.catch_warnings():
+            # TorchScript is deprecated upstream in favour of torch.compile, which needs a compiler
+            warnings.simplefilter('ignore', FutureWarning)
+            traced = torch.jit.trace(model, example)
+            return torch.jit.freeze(traced.eval())
+
+
+@register_backend('quantized')
+class QuantizedBackend(TorchBackend):
+    """Runs GameNet with its linear layers dynamically quantized to int8 (CPU only)."""
+
+    def _build(self, model):
+        import torch
+
+        if self.device.type != 'cpu':
+            raise ValueError('The quantized backend only runs on CPU.')
+        with warnings.catch_warnings():
+            # torch.ao.quantization is deprecated upstream but still the only dependency-free option;
+            # silence its deprecation notices only (the quantized tensor one is raised as a UserWarning)
+            warnings.filterwarnings('ignore', 'torch.ao.quantization is deprecated', DeprecationWarning)
+            warnings.filterwarnings('ignore', 'torch.quantize_per_tensor, torch.quantize_per_channel',
+                                    UserWarning)
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+@register_backend('numpy')
+class NumpyBackend(InferenceBackend):
+    """Runs GameNet with the NumPy engine (CPU only)."""
+
+    def __init__(self, model, device='cpu'):
+        """ Initializes the backend.
+
+        Args:
+            model (NumpyGameNet | GameNet): The network; a torch GameNet has its weights copied.
+            device (str, optional): Must be 'cpu'. Defaults to 'cpu'.
+
+        Raises:
+            ValueError: If the device is not the CPU.
+        """
+        from tfg.ai.numpy_net import NumpyGameNet
+
+        if str(device) != 'cpu':
+            raise ValueError('The numpy backend only runs on CPU.')
+        self.net = model if isinstance(model, NumpyGameNet) else NumpyGameNet.from_module(model)
+
+    def evaluate_batch(self, states):
+        logits, values = self.net.forward(states)
+        logits -= logits.max(axis=1, keepdims=True)
+        priors = np.exp(logits)
+        priors /= priors.sum(axis=1, keepdims=True)
+        return priors, values
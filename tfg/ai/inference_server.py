@@ -0,0 +1,312 @@
+"""
+tfg.ai.inference_server
+==========================
+This module implements a local inference service shared by many search processes. Instead of every
+process holding its own GameNet and evaluating one position at a time, the server process holds the
+network (through the model registry, so it also hot-reloads new weights) and clients send their
+positions over a Unix socket. The server collects the requests of all clients until it has max_batch
+positions, every connected client is waiting, or the oldest request has waited max_wait_ms, then runs
+a single forward pass and sends each client its rows.
+
+Start a server with:
+
+    python -m tfg.ai.inference_server --model model.pth --address /tmp/gamenet.sock
+
+and point bots at it, e.g. ML_BOT='ml_mcts:iters=100,inference_server=/tmp/gamenet.sock'.
+
+Wire format: a request is the board tensors of the positions as uint8 bytes (an empty request asks
+for the server statistics); a reply is the model version (VERSION_BYTES ASCII bytes) followed by
+float32 rows holding the BOARD_SIZE**2 priors and the value of each position.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Listener, Client, wait
+
+import numpy as np
+
+from tfg.game.board import Board, BOARD_SIZE
+from tfg.ai.model_registry import EvalCache
+
+log = logging.getLogger(__name__)
+
+N_CELLS = BOARD_SIZE * BOARD_SIZE
+STATE_SHAPE = (3, BOARD_SIZE, BOARD_SIZE)
+VERSION_BYTES = 16
+
+
+class InferenceServer:
+    """Runs the batching inference loop in a separate process.
+    """
+    def __init__(self, model_path, address=None, backend=None, max_batch: int = 256,
+                 max_wait_ms: float = 2.0, device='cpu'):
+        """ Initializes the server (call start to launch it).
+
+        Args:
+            model_path (str): Path of the checkpoint served.
+            address (str, optional): Path of the Unix socket. Defaults to None (a temporary path).
+            backend (str, optional): Inference backend (see tfg.ai.inference). Defaults to None
+                ('numpy' for .npz checkpoints, 'eager' otherwise).
+            max_batch (int, optional): Positions that trigger a forward pass. Defaults to 256.
+            max_wait_ms (float, optional): Maximum milliseconds a request waits for a batch to fill.
+                Defaults to 2.0.
+            device (str, optional): Device to run the network on. Defaults to 'cpu'.
+        """
+        self.model_path = model_path
+        self.address = address or os.path.join(tempfile.mkdtemp(prefix='gamenet-'), 'inference.sock')
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.device = device
+        self._process = None
+
+    def start(self, timeout: float = 60.0):
+        """ Launch the server process and wait until it accepts connections.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the server to load its model. Defaults to 60.
+
+        Raises:
+            RuntimeError: If the server did not come up in time.
+
+        Returns:
+            str: The address clients connect to.
+        """
+        ctx = mp.get_context('spawn')
+        ready = ctx.Event()
+        self._process = ctx.Process(
+            target=serve, name='inference-server', daemon=True,
+            args=(self.model_path, self.address, self.backend, self.max_batch, self.max_wait_ms,
+                  self.device, ready))
+        self._process.start()
+        if not ready.wait(timeout):
+            self.stop()
+            raise RuntimeError(f'Inference server for {self.model_path} did not start')
+        return self.address
+
+    def stop(self):
+        """Stop the server process."""
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve(model_path, address, backend=None, max_batch: int = 256, max_wait_ms: float = 2.0,
+          device='cpu', ready=None):
+    """ Run the batching inference loop until the process is terminated.
+
+    Args:
+        model_path (str): Path of the checkpoint served.
+        address (str): Path of the Unix socket to listen on.
+        backend (str, optional): Inference backend. Defaults to None (see InferenceServer).
+        max_batch (int, optional): Positions that trigger a forward pass. Defaults to 256.
+        max_wait_ms (float, optional): Maximum milliseconds a request waits. Defaults to 2.0.
+        device (str, optional): Device to run the network on. Defaults to 'cpu'.
+        ready (Event, optional): Set once the model is loaded and connections are accepted.
+    """
+    from tfg.ai.inference import default_backend
+    from tfg.ai.model_registry import registry
+
+    if backend is None:
+        backend = default_backend(model_path)
+    registry.acquire(model_path, device).backend(backend)  # load before accepting clients
+
+    if os.path.exists(address):
+        os.unlink(address)
+    listener = Listener(address, family='AF_UNIX')
+    clients = []
+    lock = threading.Lock()
+
+    def accept():
+        while True:
+            conn = listener.accept()
+            with lock:
+                clients.append(conn)
+
+    threading.Thread(target=accept, name='inference-accept', daemon=True).start()
+    if ready is not None:
+        ready.set()
+
+    stats = {'batches': 0, 'positions': 0, 'requests': 0, 'busy_seconds': 0.0, 'version': None}
+    pending = []  # (conn, states)
+    waiting = 0
+    first = None
+    max_wait = max_wait_ms / 1000.0
+    while True:
+        with lock:
+            conns = [c for c in clients if all(c is not p[0] for p in pending)]
+            n_clients = len(clients)
+        timeout = 0.05 if first is None else max(0.0, first + max_wait - time.monotonic())
+        if conns:
+            readable = wait(conns, timeout)
+        else:
+            readable = []
+            if not pending:
+                time.sleep(timeout)
+        for conn in readable:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                with lock:
+                    clients.remove(conn)
+                conn.close()
+                continue
+            if not data:
+                conn.send_bytes(json.dumps({**stats, 'clients': n_clients, 'backend': backend}).encode())
+                continue
+            states = np.frombuffer(data, dtype=np.uint8).reshape(-1, *STATE_SHAPE)
+            pending.append((conn, states))
+            waiting += len(states)
+            first = first or time.monotonic()
+        if not pending:
+            continue
+        if (waiting < max_batch and len(pending) < n_clients
+                and time.monotonic() - first < max_wait):
+            continue
+
+        start = time.perf_counter()
+        active = registry.acquire(model_path, device)
+        priors, values = active.backend(backend).evaluate_batch(
+            np.concatenate([s for _, s in pending]).astype(np.float32))
+        rows = np.concatenate([priors, values[:, None]], axis=1).astype(np.float32)
+        header = active.version.encode()[:VERSION_BYTES].ljust(VERSION_BYTES)
+        offset = 0
+        for conn, states in pending:
+            try:
+                conn.send_bytes(header + rows[offset:offset + len(states)].tobytes())
+            except OSError:
+                pass  # the client went away; it is dropped on its next read
+            offset += len(states)
+
+        stats['batches'] += 1
+        stats['positions'] += waiting
+        stats['requests'] += len(pending)
+        stats['busy_seconds'] += time.perf_counter() - start
+        stats['version'] = active.version
+        pending, waiting, first = [], 0, None
+
+
+class InferenceClient:
+    """Evaluates positions through an InferenceServer. Exposes the interface of the local inference
+    backends (evaluate and evaluate_batch), plus an evaluation cache dropped when the server
+    switches to a new model version.
+
+        Attributes:
+            address (str): Address of the server.
+            version (str): Model version of the last reply, or None before the first one.
+            cache (EvalCache): Evaluations of the current version.
+    """
+    def __init__(self, address, cache_size: int = 50000):
+        """ Initializes the client. The connection is opened on first use, so a client can be built
+        before a process forks.
+
+        Args:
+            address (str): Path of the server's Unix socket.
+            cache_size (int, optional): Evaluation cache size. Defaults to 50000.
+        """
+        self.address = address
+        self.version = None
+        self.cache = EvalCache(cache_size)
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = Client(self.address, family='AF_UNIX')
+            self._pid = os.getpid()
+        return self._conn
+
+    def evaluate_batch(self, states):
+        """ Evaluate a batch of positions on the server.
+
+        Args:
+            states (np.ndarray): Board tensors of shape (N, 3, BOARD_SIZE, BOARD_SIZE).
+
+        Returns:
+            tuple: Priors of shape (N, BOARD_SIZE**2) and values of shape (N,), as float32 arrays.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.send_bytes(np.asarray(states, dtype=np.uint8).tobytes())
+            reply = conn.recv_bytes()
+        version = reply[:VERSION_BYTES].decode().rstrip()
+        if version != self.version:
+            if self.version is not None:
+                self.cache = EvalCache(self.cache.max_entries)
+            self.version = version
+        rows = np.frombuffer(reply, dtype=np.float32, offset=VERSION_BYTES).reshape(-1, N_CELLS + 1)
+        return rows[:, :N_CELLS], rows[:, N_CELLS]
+
+    def evaluate(self, board: Board):
+        """ Evaluate a single position, using the cache.
+
+        Args:
+            board (Board): The position.
+
+        Returns:
+            tuple: The priors (list of BOARD_SIZE**2 floats) and the value (float).
+        """
+        key = board.shot_masks()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        priors, values = self.evaluate_batch(board.to_tensor()[None])
+        result = (priors[0].tolist(), float(values[0]))
+        self.cache.put(key, result)
+        return result
+
+    def stats(self):
+        """ Fetch the server statistics.
+
+        Returns:
+            dict: Forward passes, positions and requests served, busy seconds, model version,
+                backend and number of connected clients.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.send_bytes(b'')
+            return json.loads(conn.recv_bytes())
+
+    def close(self):
+        """Close the connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def main():
+    """Main function to parse arguments and run an inference server.
+    """
+    parser = argparse.ArgumentParser(description="Serve GameNet evaluations to search processes")
+    parser.add_argument('--model', default='model.pth', help="Checkpoint (.pth or .npz export)")
+    parser.add_argument('--address', default='/tmp/gamenet.sock', help="Unix socket path")
+    parser.add_argument('--backend', default=None, help="Inference backend")
+    parser.add_argument('--max-batch', type=int, default=256, help="Positions per forward pass")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help="Batching window")
+    parser.add_argument('--device', default='cpu', help="Device to run the network on")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    log.info('Serving %s on %s', args.model, args.address)
+    serve(args.model, args.address, args.backend, args.max_batch, args.max_wait_ms, args.device)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+tfg.ai.lockstep
+==================
+This module implements a driver playing many games at once with NeuralMCTS bots, advancing all their
+searches in lockstep. A single search only ever waits on one position, so on its own it evaluates the
+network one position at a time; the driver instead runs every search up to its next position to
+evaluate, evaluates the positions of all games in one batched forward pass per model, sends each
+search its result, and moves every game whose search has finished.
+
+A game is a generator yielding (bot, board) when a bot must pick a shot at a board, and receiving
+the chosen (move, pi) back, pi being the visit distribution of the search (None for bots without a
+stepwise search, which are simply run). Its return value is the game result; see duel for the game
+played by simulate.py, match for head-to-head matches between two bots (e.g. two versions of the
+network) and self_play.py for self-play games.
+"""
+
+import time
+
+import numpy as np
+
+from tfg.game.board import Board
+from tfg.game.symmetry import transform_states
+from tfg.ai.mcts_ml import orient_evaluation, visit_policy
+
+
+class LockstepStats:
+    """Counters of a lockstep run.
+
+        Attributes:
+            games (int): Games finished.
+            searches (int): Searches completed (moves chosen).
+            positions (int): Positions evaluated by the network.
+            cache_hits (int): Positions answered by an evaluation cache.
+            batches (int): Forward passes run.
+            seconds (float): Wall-clock duration of the run.
+    """
+    def __init__(self):
+        self.games = 0
+        self.searches = 0
+        self.positions = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def positions_per_second(self):
+        """float: Positions evaluated by the network per second."""
+        return self.positions / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        """ Convert the counters to a dictionary.
+
+        Returns:
+            dict: The counters, the evaluation rate and the mean batch size.
+        """
+        return {
+            'games':                self.games,
+            'searches':             self.searches,
+            'positions':            self.positions,
+            'cache_hits':           self.cache_hits,
+            'batches':              self.batches,
+            'seconds':              self.seconds,
+            'positions_per_second': self.positions_per_second,
+            'mean_batch':           self.positions / self.batches if self.batches else 0.0
+        }
+
+
+class _Slot:
+    """One game being played: its generator, and the search and position it is waiting on."""
+    def __init__(self, index, game):
+        self.index = index
+        self.game = game
+        self.bot = None
+        self.search = None
+        self.board = None
+
+
+def play_lockstep(games, stats: LockstepStats = None, on_result=None):
+    """ Play games to completion, evaluating the positions of all their searches together.
+
+    Args:
+        games (iterable): Game generators (see the module documentation).
+        stats (LockstepStats, optional): Counters to update. Defaults to None (a new one).
+        on_result (callable, optional): Called with (index, result) as each game finishes.
+            Defaults to None.
+
+    Returns:
+        tuple: The results of the games, in the order of games, and the LockstepStats.
+    """
+    stats = stats or LockstepStats()
+    start = time.perf_counter()
+    slots = [_Slot(i, game) for i, game in enumerate(games)]
+    results = [None] * len(slots)
+
+    def finish(slot, result):
+        results[slot.index] = result
+        stats.games += 1
+        if on_result is not None:
+            on_result(slot.index, result)
+
+    def next_search(slot, reply):
+        """ Send a game its move and start its next search; False once the game is over."""
+        while True:
+            try:
+                bot, board = slot.game.send(reply) if reply is not None else next(slot.game)
+            except StopIteration as stop:
+                finish(slot, stop.value)
+                return False
+            if not hasattr(bot, 'search'):
+                reply = (bot.run(board), None)
+                stats.searches += 1
+                continue
+            slot.bot, slot.search = bot, bot.search(board)
+            try:
+                slot.board = next(slot.search)
+                return True
+            except StopIteration as stop:
+                reply = _reply(stop.value, stats)
+
+    def step(slot, evaluation):
+        """ Send a search its evaluation, then move on to its next position to evaluate."""
+        try:
+            slot.board = slot.search.send(evaluation)
+            return True
+        except StopIteration as stop:
+            return next_search(slot, _reply(stop.value, stats))
+
+    active = [slot for slot in slots if next_search(slot, None)]
+    while active:
+        # answer what the caches know; the rest waits for a batched evaluation
+        groups = {}
+        waiting = []
+        for slot in active:
+            while True:
+                cache, evaluator = slot.bot.evaluator()
+                key, k = slot.bot.position_key(slot.board)
+                cached = cache.get(key)
+                if cached is None:
+                    groups.setdefault(id(evaluator), (evaluator, []))[1].append((slot, cache, key, k))
+                    waiting.append(slot)
+                    break
+                stats.cache_hits += 1
+                if not step(slot, orient_evaluation(cached, k)):
+                    break
+
+        for evaluator, members in groups.values():
+            # a position can be pending in several games; evaluate it once
+            unique = {}
+            for _, _, key, _ in members:
+                unique.setdefault(key, len(unique))
+            boards = {key: (slot.board, k) for slot, _, key, k in members}
+            states = np.stack([transform_states(boards[key][0].to_tensor(), boards[key][1])
+                               for key in unique])
+            priors, values = evaluator.evaluate_batch(states)
+            stats.batches += 1
+            stats.positions += len(unique)
+            for slot, cache, key, k in members:
+                row = unique[key]
+                result = (priors[row].tolist(), float(values[row]))
+                cache.put(key, result)
+                if not step(slot, orient_evaluation(result, k)):
+                    waiting.remove(slot)
+        active = waiting
+
+    stats.seconds += time.perf_counter() - start
+    return results, stats
+
+
+def _reply(value, stats):
+    """ Turn the return value of a finished search into the (move, pi) sent to its game."""
+    stats.searches += 1
+    move, root = value
+    return move, visit_policy(root, move)
+
+
+def _game(bot1, bot2):
+    """ Game between two bots, each shooting at the other's fleet (bot1 first).
+
+    Args:
+        bot1 (object): The first bot.
+        bot2 (object): The second bot.
+
+    Returns:
+        tuple: The winning bot and the duration of the game in seconds.
+    """
+    b1, b2 = Board(), Board()
+    b1.place_fleet()
+    b2.place_fleet()
+    bot1.root = bot2.root = None
+    start = time.time()
+    while True:
+        move, _ = yield bot1, b2
+        b2.shoot(*move)
+        if b2.has_won():
+            return bot1, time.time() - start
+        move, _ = yield bot2, b1
+        b1.shoot(*move)
+        if b1.has_won():
+            return bot2, time.time() - start
+
+
+def duel(bot1, bot2):
+    """ Game between two bots, each shooting at the other's fleet (bot1 first).
+
+    Args:
+        bot1 (object): The first bot.
+        bot2 (object): The second bot.
+
+    Returns:
+        tuple: The winner's class name and the duration of the game in seconds.
+    """
+    winner, seconds = yield from _game(bot1, bot2)
+    return winner.__class__.__name__, seconds
+
+
+def match(pairs, games, stats: LockstepStats = None):
+    """ Play a match between two bots A and B (e.g. two networks), alternating the first shooter.
+
+    Args:
+        pairs (list): (bot_a, bot_b) pairs, one per game played at once (a bot keeps the search
+            tree of its game, so concurrent games need their own bots).
+        games (int): Games of the match.
+        stats (LockstepStats, optional): Counters to update. Defaults to None.
+
+    Returns:
+        dict: The games, the wins of A and B, and A's score (fraction of the games won).
+    """
+    wins_a = 0
+    for first in range(0, games, len(pairs)):
+        group = pairs[:games - first]
+        order = [(a, b) if (first + i) % 2 == 0 else (b, a) for i, (a, b) in enumerate(group)]
+        results, _ = play_lockstep([_game(*bots) for bots in order], stats)
+        wins_a += sum(winner is a for (winner, _), (a, _) in zip(results, group))
+    return {'games': games, 'wins_a': wins_a, 'wins_b': games - wins_a,
+            'score': wins_a / games if games else 0.0}
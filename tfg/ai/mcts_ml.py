@@ -2,13 +2,30 @@
 tfg.ai.mcts_ml
 ========================
 This module implements a Neural-guided Monte Carlo Tree Search (MCTS) for Battleship using a PyTorch policy/value network.
+The network is run through an inference backend (see tfg.ai.inference); with a .npz export and the
+'numpy' backend the search runs without torch. With symmetry enabled, evaluations are cached under
+the canonical form of a position (see tfg.game.symmetry), so the 8 images of a position share one
+network evaluation.
 """
-import copy
 import math
+import time
 import numpy as np
-import torch
 from tfg.game.board import Board, BOARD_SIZE
-from tfg.ai.network import GameNet
+from tfg.game.symmetry import INVERSE, canonical_masks, transform_pi, transform_states
+from tfg.ai.inference import default_backend
+from tfg.ai.model_registry import LoadedModel, registry
+
+def load_model(model_path, device='cpu'):
+    """ Load a GameNet from a weights file, reusing the copy already loaded by another search.
+
+    Args:
+        model_path (str): Path to the pre-trained PyTorch model.
+        device (str, optional): Device to run the model on. Defaults to 'cpu'.
+
+    Returns:
+        GameNet: The current version of the network (see tfg.ai.model_registry), in evaluation mode.
+    """
+    return registry.acquire(model_path, device).model
 
 class NNode:
     """Node in the Monte Carlo Tree Search (MCTS) tree.
@@ -75,7 +92,7 @@ class NNode:
         ]
         for (i, j) in moves:
             idx   = i * BOARD_SIZE + j
-            new_st = copy.deepcopy(self.state)
+            new_st = self.state.copy()
             new_st.shoot(i, j)
             child = NNode(new_st, parent=self, action=(i, j), prior=priors[idx])
             self.children.append(child)
@@ -108,30 +125,113 @@ class NNode:
 class NeuralMCTS:
     """Neural-guided Monte Carlo Tree Search (MCTS) for Battleship.
     """
+    opening_book = None
+    model_path = None
+    backend = 'eager'
+    inference = None
+    symmetry = False
+    _active = None
+    _pinned = False
+
     def __init__(self, model_path, iters=200, c_puct=1.0,
-                 alpha_noise=0.3, eps_noise=0.25, device='cpu'):
+                 alpha_noise=0.3, eps_noise=0.25, device='cpu', model=None, opening_book=None,
+                 backend=None, inference=None, symmetry=False):
         """ Initializes the NeuralMCTS with a pre-trained model.
 
         Args:
-            model_path (str): Path to the pre-trained PyTorch model.
+            model_path (str): Path to the pre-trained PyTorch model, or to its .npz export.
             iters (int): Number of MCTS iterations to perform.
             c_puct (float): Exploration constant for balancing exploration and exploitation.
             alpha_noise (float): Dirichlet noise parameter for root node exploration.
             eps_noise (float): Epsilon for noise injection in root node children.
             device (str): Device to run the model on ('cpu' or 'cuda').
+            model (GameNet | LoadedModel, optional): An already loaded network to use instead of
+                model_path; bots given the same LoadedModel share its evaluation cache and batch
+                their evaluations together in lockstep. By default the weights are loaded from the
+                model registry on first use, and a newer version of the file is picked up at the
+                start of the next search.
+            opening_book (OpeningBook, optional): Book consulted before searching. Defaults to None.
+            backend (str, optional): Inference backend evaluating positions: 'eager', 'torchscript',
+                'quantized' or 'numpy' (see tfg.ai.inference). Defaults to None ('numpy' for .npz
+                checkpoints, 'eager' otherwise).
+            inference (InferenceClient, optional): Remote evaluator (see tfg.ai.inference_server) used
+                instead of a local network; model_path and backend are then ignored. Defaults to None.
+            symmetry (bool): Whether to evaluate positions in canonical form, sharing the cached
+                evaluation of all their symmetric images. Defaults to False.
         """
         self.device = device
-        self.model = GameNet().to(device)
-        self.model.load_state_dict(torch.load(model_path, map_location=device))
-        self.model.eval()
+        self.backend = backend or default_backend(model_path)
+        self.model_path = model_path
+        self._pinned = model is not None
+        if model is not None and not isinstance(model, LoadedModel):
+            model = LoadedModel(model, device=device)
+        self._active = model
         self.iters = iters
         self.c_puct  = c_puct
         self.alpha_noise = alpha_noise
         self.eps_noise = eps_noise
         self.root = None 
+        self.opening_book = opening_book
+        self.inference = inference
+        self.symmetry = symmetry
+
+    @property
+    def model(self):
+        """GameNet: The policy/value network, loaded from model_path the first time it is needed."""
+        if self._active is None:
+            self._refresh_model()
+        return self._active.model
+
+    @model.setter
+    def model(self, model):
+        self._pinned = True
+        self._active = LoadedModel(model, device=self.device)
+
+    @property
+    def model_version(self):
+        """str: Version of the network used by the last search, or None if it is not loaded yet."""
+        if self.inference is not None:
+            return self.inference.version
+        return self._active.version if self._active is not None else None
+
+    def _refresh_model(self):
+        """ Switch to the registry's current version of model_path. Called between searches, so a
+        search always runs with a single version of the weights and its evaluation cache.
+        """
+        if self.model_path is not None and not self._pinned and self.inference is None:
+            self._active = registry.acquire(self.model_path, self.device)
+
+    def evaluator(self):
+        """ Get what evaluates this search's positions: the evaluation cache and the batch evaluator of
+        the current model version, or those of the remote inference client.
+
+        Returns:
+            tuple: An EvalCache and an object exposing evaluate_batch (see tfg.ai.inference).
+        """
+        if self.inference is not None:
+            return self.inference.cache, self.inference
+        if self._active is None:
+            self._refresh_model()
+        return self._active.cache, self._active.backend(self.backend)
+
+    def position_key(self, board: Board):
+        """ Get the evaluation cache key of a position: its shot masks (the only input of the network),
+        in canonical form when symmetry is enabled.
+
+        Args:
+            board (Board): The position.
+
+        Returns:
+            tuple: The key and the symmetry mapping the board to the position evaluated under it
+                (0 without symmetry).
+        """
+        if self.symmetry:
+            return canonical_masks(*board.shot_masks())
+        return board.shot_masks(), 0
 
     def _evaluate(self, board: Board):
-        """ Evaluate the board state using the neural network.
+        """ Evaluate the board state using the neural network. Evaluations are cached per model version,
+        keyed by position_key.
 
         Args:
             board (Board): The current game state represented as a Board object.
@@ -141,25 +241,79 @@ class NeuralMCTS:
                 - priors (list): List of prior probabilities for each possible move.
                 - value (float): Value estimate of the board state.
         """
-        tensor = torch.tensor(board.to_tensor(), dtype=torch.float32,
-                              device=self.device).unsqueeze(0)
-        with torch.no_grad():
-            logits, value = self.model(tensor)
-            priors = torch.softmax(logits, dim=1).squeeze(0).cpu().tolist()
-            return priors, value.item()
-
-    def run(self, root_board: Board):
+        if self.inference is not None and not self.symmetry:
+            return self.inference.evaluate(board)
+        cache, backend = self.evaluator()
+        key, k = self.position_key(board)
+        cached = cache.get(key)
+        if cached is not None:
+            return orient_evaluation(cached, k)
+
+        priors, values = backend.evaluate_batch(transform_states(board.to_tensor(), k)[None])
+        result = (priors[0].tolist(), float(values[0]))
+        self.evaluator()[0].put(key, result)  # a remote client may have switched version and cache
+        return orient_evaluation(result, k)
+
+    def run(self, root_board: Board, deadline: float = None):
         """ Run the MCTS algorithm on the given root board.
 
         Args:
             root_board (Board): The initial game state to start the MCTS from.
+            deadline (float, optional): time.monotonic() value after which the search stops early and
+                returns the best move found so far. Defaults to None (no time limit).
 
         Returns:
-            tuple: The action (i, j) to take based on the MCTS results.
+            tuple: The action (i, j) to take based on the MCTS results, or the book move if the position
+                is in the opening book (no search is run and the tree is cleared).
         """
+        search = self.search(root_board, deadline)
+        try:
+            board = next(search)
+            while True:
+                board = search.send(self._evaluate(board))
+        except StopIteration as stop:
+            return stop.value[0]
+
+    def run_with_policy(self, root_board: Board):
+        """ Run the search and also return the visit distribution of the root (see visit_policy).
+
+        Args:
+            root_board (Board): The initial game state to start the MCTS from.
+
+        Returns:
+            tuple: The action (i, j) and a flat policy vector pi of BOARD_SIZE**2 visit shares.
+        """
+        move = self.run(root_board)
+        return move, visit_policy(self.root, move)
+
+    def search(self, root_board: Board, deadline: float = None):
+        """ The search as a generator, so a caller can evaluate the positions of many searches together
+        (see tfg.ai.lockstep). It yields every position to evaluate and expects the (priors, value)
+        evaluation to be sent back; run drives it one evaluation at a time.
+
+        Args:
+            root_board (Board): The initial game state to start the MCTS from.
+            deadline (float, optional): time.monotonic() value after which the search stops early.
+                Defaults to None (no time limit).
+
+        Yields:
+            Board: A position to evaluate.
+
+        Returns:
+            tuple: The action (i, j) and the root of the search tree (None for a book move).
+        """
+        if self.opening_book is not None:
+            move = self.opening_book.lookup(root_board)
+            if move is not None:
+                self.root = None
+                return move, None
+
+        # Pick up new weights, if any, before this search starts
+        self._refresh_model()
+
         # Create root node and evaluate
-        root = NNode(copy.deepcopy(root_board), parent=None, action=None)
-        priors, value = self._evaluate(root.state)
+        root = NNode(root_board.copy(), parent=None, action=None)
+        priors, value = yield root.state
         root.prior = 0.0
         root.visit_count = 1
         root.value_sum = value
@@ -181,13 +335,15 @@ class NeuralMCTS:
 
         # MCTS main loop
         for _ in range(sims):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
             node = root
             # selection
             while node.children:
                 node = max(node.children, key=lambda n: n.score(self.c_puct))
             # expansion and evaluation
             if not node.state.has_won():
-                priors_leaf, value_leaf = self._evaluate(node.state)
+                priors_leaf, value_leaf = yield node.state
                 node.expand(priors_leaf)
                 node.backpropagate(value_leaf)
             else:
@@ -195,6 +351,42 @@ class NeuralMCTS:
                 terminal_value = 1.0 if node.state.has_won() else -1.0
                 node.backpropagate(terminal_value)
 
-        # Choose the action with highest visit count
-        best_child = max(root.children, key=lambda n: n.visit_count)
-        return best_child.action
+        # Choose the action with highest visit count (prior breaks ties after an early stop)
+        best_child = max(root.children, key=lambda n: (n.visit_count, n.prior))
+        return best_child.action, root
+
+
+def orient_evaluation(result, k):
+    """ Map an evaluation of a canonical position back to the position (see NeuralMCTS.position_key).
+
+    Args:
+        result (tuple): The priors (list of BOARD_SIZE**2 floats) and the value of the canonical position.
+        k (int): The symmetry mapping the position to the canonical one.
+
+    Returns:
+        tuple: The priors and the value of the position.
+    """
+    if not k:
+        return result
+    priors, value = result
+    return transform_pi(np.asarray(priors), INVERSE[k]).tolist(), value
+
+
+def visit_policy(root, move):
+    """ Compute the visit distribution of a search.
+
+    Args:
+        root (NNode): Root of the search tree, or None for a book move.
+        move (tuple): The move played.
+
+    Returns:
+        list: BOARD_SIZE**2 visit shares (all on the move for a book move).
+    """
+    pi = [0.0] * (BOARD_SIZE * BOARD_SIZE)
+    if root is None:
+        pi[move[0] * BOARD_SIZE + move[1]] = 1.0
+        return pi
+    total = sum(c.visit_count for c in root.children) or 1
+    for c in root.children:
+        pi[c.action[0] * BOARD_SIZE + c.action[1]] = c.visit_count / total
+    return pi
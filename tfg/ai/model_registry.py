@@ -0,0 +1,269 @@
+"""
+tfg.ai.model_registry
+========================
+This module implements the registry of GameNet checkpoints used by the ML-MCTS searches. A checkpoint
+is loaded the first time a search needs it and shared by every search of the process. The registry
+watches the file and loads a new version when it changes (e.g. after train.py saved new weights);
+searches pick the new version up at the start of their next move, so a move never mixes two models.
+Each loaded version carries its own evaluation cache, so replacing the weights also drops every
+evaluation made with the old ones. Checkpoints ending in .npz are NumPy exports (see tfg.ai.numpy_net)
+and are loaded without importing torch.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class EvalCache:
+    """Bounded LRU cache of network evaluations keyed by position.
+    """
+    def __init__(self, max_entries: int = 50000):
+        """ Initializes the cache.
+
+        Args:
+            max_entries (int, optional): Maximum number of cached positions. Defaults to 50000.
+        """
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Look up a cached evaluation.
+
+        Args:
+            key (hashable): The position key, e.g. Board.shot_masks().
+
+        Returns:
+            object: The cached evaluation, or None.
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ Store an evaluation, evicting the least recently used one if the cache is full.
+
+        Args:
+            key (hashable): The position key.
+            value (object): The evaluation.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """ Return cache metrics.
+
+        Returns:
+            dict: Number of entries, hits and misses.
+        """
+        return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+class LoadedModel:
+    """One loaded version of a checkpoint.
+
+        Attributes:
+            model (GameNet): The network, in evaluation mode.
+            version (str): Short content hash of the checkpoint ('custom' for models not loaded from a file).
+            path (str): Path of the checkpoint.
+            device (str): Device the network runs on.
+            loaded_at (float): Wall-clock time at which this version was loaded.
+            cache (EvalCache): Evaluations made with this version.
+    """
+    def __init__(self, model, version='custom', path=None, device='cpu', cache_size: int = 50000):
+        self.model = model
+        self.version = version
+        self.path = path
+        self.device = device
+        self.loaded_at = time.time()
+        self.cache = EvalCache(cache_size)
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    def backend(self, name='eager'):
+        """ Get an inference backend running this version, building it on first use.
+
+        Args:
+            name (str, optional): The backend name (see tfg.ai.inference). Defaults to 'eager'.
+
+        Returns:
+            InferenceBackend: The backend.
+        """
+        backend = self._backends.get(name)
+        if backend is None:
+            with self._lock:
+                backend = self._backends.get(name)
+                if backend is None:
+                    from tfg.ai.inference import make_backend
+                    backend = self._backends[name] = make_backend(name, self.model, self.device)
+        return backend
+
+
+class _Entry:
+    """Registry bookkeeping for one (path, device) pair."""
+    def __init__(self, active, signature):
+        self.active = active
+        self.signature = signature
+        self.checked = time.monotonic()
+        self.reloads = 0
+        self.errors = 0
+
+
+class ModelRegistry:
+    """Loads GameNet checkpoints on first use and reloads them when the file changes.
+    """
+    def __init__(self, check_interval: float = 2.0, cache_size: int = 50000):
+        """ Initializes the registry.
+
+        Args:
+            check_interval (float, optional): Minimum seconds between two checks of a checkpoint file.
+                Defaults to 2.0.
+            cache_size (int, optional): Evaluation cache size of each loaded version. Defaults to 50000.
+        """
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, path, device='cpu'):
+        """ Get the current version of a checkpoint, loading it or its newer version if needed.
+
+        Args:
+            path (str): Path of the checkpoint.
+            device (str, optional): Device to run the network on. Defaults to 'cpu'.
+
+        Raises:
+            OSError: If the checkpoint has never been loaded and cannot be read.
+
+        Returns:
+            LoadedModel: The loaded version.
+        """
+        key = (os.path.abspath(path), str(device))
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.checked < self.check_interval:
+            return entry.active
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                signature = _signature(key[0])
+                entry = _Entry(self._load(key[0], device), signature)
+                self._entries[key] = entry
+                return entry.active
+            if time.monotonic() - entry.checked < self.check_interval:
+                return entry.active
+
+            entry.checked = time.monotonic()
+            try:
+                signature = _signature(key[0])
+            except OSError:
+                # the file is being replaced; keep serving the loaded version
+                return entry.active
+            if signature != entry.signature:
+                try:
+                    loaded = self._load(key[0], device)
+                except Exception:
+                    entry.errors += 1
+                    log.exception('Could not reload %s; keeping version %s', path, entry.active.version)
+                    return entry.active
+                entry.signature = signature
+                if loaded.version != entry.active.version:
+                    log.info('Loaded %s version %s', path, loaded.version)
+                    entry.active = loaded
+                    entry.reloads += 1
+            return entry.active
+
+    def version(self, path, device='cpu'):
+        """ Get the version of a checkpoint without loading it.
+
+        Args:
+            path (str): Path of the checkpoint.
+            device (str, optional): Device of the network. Defaults to 'cpu'.
+
+        Returns:
+            str: The loaded version, or None if the checkpoint has not been loaded yet.
+        """
+        entry = self._entries.get((os.path.abspath(path), str(device)))
+        return entry.active.version if entry else None
+
+    def stats(self):
+        """ Return registry metrics.
+
+        Returns:
+            list: One dictionary per loaded checkpoint with its path, device, version, load time,
+                number of reloads and failed reloads, and evaluation cache metrics.
+        """
+        return [
+            {
+                'path':      path,
+                'device':    device,
+                'version':   entry.active.version,
+                'loaded_at': entry.active.loaded_at,
+                'reloads':   entry.reloads,
+                'errors':    entry.errors,
+                'cache':     entry.active.cache.stats()
+            }
+            for (path, device), entry in list(self._entries.items())
+        ]
+
+    def _load(self, path, device):
+        """ Load a checkpoint: a torch state dict, or a NumPy export if the path ends in .npz.
+
+        Args:
+            path (str): Path of the checkpoint.
+            device (str): Device to run the network on.
+
+        Returns:
+            LoadedModel: The loaded version.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.npz'):
+            from tfg.ai.numpy_net import NumpyGameNet
+            model = NumpyGameNet.from_bytes(data)
+        else:
+            import torch
+            from tfg.ai.network import GameNet
+            state_dict = torch.load(io.BytesIO(data), map_location=device)
+            model = GameNet.from_state_dict(state_dict).to(device).eval()
+        version = hashlib.sha1(data).hexdigest()[:12]
+        return LoadedModel(model, version, path, str(device), self.cache_size)
+
+
+def _signature(path):
+    """ Get the modification signature of a file.
+
+    Args:
+        path (str): The file.
+
+    Returns:
+        tuple: Modification time in nanoseconds, size and inode.
+    """
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+# Registry shared by every search of the process
+registry = ModelRegistry(check_interval=float(os.environ.get('MODEL_CHECK_INTERVAL', 2.0)))
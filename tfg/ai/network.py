@@ -1,33 +1,82 @@
 """
 tgf.ai.network
 ===================
-This module defines the neural network architecture used for the game AI.
+This module defines the neural network architecture used for the game AI. The trunk widths and the
+hidden width of the value head are configurable, so smaller (faster) variants can be distilled from a
+served model (see train.py --teacher); the default configuration is the served GameNet, and
+from_state_dict rebuilds any variant from its weights alone.
 """
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+DEFAULT_CHANNELS = (32, 64)
+DEFAULT_VALUE_HIDDEN = 64
+
 class GameNet(nn.Module):
     """GameNet is a neural network for the Battleship game.
 
     Args:
         nn.Module: Inherits from PyTorch's nn.Module to define a neural network.
     """
-    def __init__(self):
+    def __init__(self, channels=DEFAULT_CHANNELS, value_hidden=DEFAULT_VALUE_HIDDEN):
         """ Initializes the GameNet architecture.
+
+        Args:
+            channels (tuple, optional): Output channels of the 3x3 convolutions of the trunk, one per
+                layer (named conv1, conv2, ...). Defaults to (32, 64).
+            value_hidden (int, optional): Width of the hidden layer of the value head. Defaults to 64.
+
+        Raises:
+            ValueError: If the trunk has no layer.
         """
         super().__init__()
+        if not channels:
+            raise ValueError('GameNet needs at least one trunk layer.')
+        self.channels = tuple(int(c) for c in channels)
+        self.value_hidden = int(value_hidden)
         # conv trunk
-        self.conv1 = nn.Conv2d(3, 32, kernel_size=3, padding=1)
-        self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
+        self.trunk = [f'conv{i}' for i in range(1, len(self.channels) + 1)]
+        for name, c_in, c_out in zip(self.trunk, (3,) + self.channels, self.channels):
+            setattr(self, name, nn.Conv2d(c_in, c_out, kernel_size=3, padding=1))
+        width = self.channels[-1]
         # policy head
-        self.p_conv = nn.Conv2d(64, 4, kernel_size=1)
+        self.p_conv = nn.Conv2d(width, 4, kernel_size=1)
         self.p_fc = nn.Linear(4 * 6 * 6, 36)
         # value head
-        self.v_conv = nn.Conv2d(64, 2, kernel_size=1)
-        self.v_fc1  = nn.Linear(2 * 6 * 6, 64)
-        self.v_fc2  = nn.Linear(64, 1)
+        self.v_conv = nn.Conv2d(width, 2, kernel_size=1)
+        self.v_fc1  = nn.Linear(2 * 6 * 6, self.value_hidden)
+        self.v_fc2  = nn.Linear(self.value_hidden, 1)
+
+    @staticmethod
+    def config_from_state_dict(state_dict):
+        """ Read the configuration of a GameNet from its weights.
+
+        Args:
+            state_dict (dict): The GameNet state dict.
+
+        Returns:
+            dict: The channels and value_hidden arguments of the network.
+        """
+        channels = []
+        while f'conv{len(channels) + 1}.weight' in state_dict:
+            channels.append(state_dict[f'conv{len(channels) + 1}.weight'].shape[0])
+        return {'channels': tuple(channels), 'value_hidden': state_dict['v_fc1.weight'].shape[0]}
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        """ Build the GameNet of the configuration of some weights and load them.
+
+        Args:
+            state_dict (dict): The GameNet state dict.
+
+        Returns:
+            GameNet: The network.
+        """
+        model = cls(**cls.config_from_state_dict(state_dict))
+        model.load_state_dict(state_dict)
+        return model
 
     def forward(self, x):
         """Forward pass of the network.
@@ -40,8 +89,8 @@ class GameNet(nn.Module):
                 - logits (torch.Tensor): Output tensor for policy head of shape (batch_size, 36).
                 - value (torch.Tensor): Output tensor for value head of shape (batch_size, 1).
         """
-        x = F.relu(self.conv1(x))
-        x = F.relu(self.conv2(x))
+        for name in self.trunk:
+            x = F.relu(getattr(self, name)(x))
         # policy
         p = F.relu(self.p_conv(x))
         p = p.view(-1, 4 * 6 * 6)
@@ -0,0 +1,201 @@
+"""
+tfg.ai.numpy_net
+===================
+This module implements a pure-NumPy copy of GameNet for inference, so bots can serve the network
+without importing torch (which dominates the start-up time and the memory of a worker). The weights
+are exported once from a torch checkpoint to a flat .npz file:
+
+    python -m tfg.ai.numpy_net model.pth model.npz
+
+The forward pass keeps activations in (N, H, W, C) layout: the 3x3 convolutions are computed as one
+matrix product over im2col patches, the 1x1 head convolutions as a product over the channels, and the
+linear weights are permuted at load time to match the flattening order of that layout. Any GameNet
+configuration is supported: the trunk depth and the widths are read from the weights.
+"""
+
+import argparse
+import io
+
+import numpy as np
+
+from tfg.game.board import BOARD_SIZE
+
+FORMAT_VERSION = 1
+HEAD_PARAMETERS = (
+    'p_conv.weight', 'p_conv.bias', 'p_fc.weight', 'p_fc.bias',
+    'v_conv.weight', 'v_conv.bias', 'v_fc1.weight', 'v_fc1.bias', 'v_fc2.weight', 'v_fc2.bias',
+)
+
+
+def parameter_names(weights):
+    """ Names of the GameNet parameters of some weights: the trunk convolutions conv1, conv2, ...
+    present, then the heads.
+
+    Args:
+        weights (Mapping): GameNet parameters by name (a state dict or an .npz file).
+
+    Returns:
+        tuple: The parameter names.
+    """
+    trunk = []
+    while f'conv{len(trunk) // 2 + 1}.weight' in weights:
+        i = len(trunk) // 2 + 1
+        trunk += [f'conv{i}.weight', f'conv{i}.bias']
+    return tuple(trunk) + HEAD_PARAMETERS
+
+
+def export_npz(state_dict, path):
+    """ Export GameNet weights to a .npz file readable by NumpyGameNet.
+
+    Args:
+        state_dict (dict): The GameNet state dict (torch tensors or arrays), or a GameNet module.
+        path (str | file): Destination file.
+    """
+    if hasattr(state_dict, 'state_dict'):
+        state_dict = state_dict.state_dict()
+    arrays = {name: _to_array(state_dict[name]) for name in parameter_names(state_dict)}
+    np.savez(path, format_version=np.array(FORMAT_VERSION), board_size=np.array(BOARD_SIZE), **arrays)
+
+
+class NumpyGameNet:
+    """GameNet forward pass implemented with NumPy.
+    """
+    def __init__(self, weights):
+        """ Initializes the network from GameNet parameters.
+
+        Args:
+            weights (dict): Maps the GameNet parameter names (see parameter_names) to arrays.
+
+        Raises:
+            KeyError: If a parameter is missing.
+        """
+        w = {name: _to_array(weights[name]) for name in parameter_names(weights)}
+        self.trunk = [(_conv3x3(w[name]), w[name[:-len('weight')] + 'bias'])
+                      for name in w if name.startswith('conv') and name.endswith('.weight')]
+        self.p_conv = w['p_conv.weight'][:, :, 0, 0].T.copy(), w['p_conv.bias']
+        self.v_conv = w['v_conv.weight'][:, :, 0, 0].T.copy(), w['v_conv.bias']
+        self.p_fc = _fc_nhwc(w['p_fc.weight']), w['p_fc.bias']
+        self.v_fc1 = _fc_nhwc(w['v_fc1.weight']), w['v_fc1.bias']
+        self.v_fc2 = w['v_fc2.weight'].T.copy(), w['v_fc2.bias']
+
+    @classmethod
+    def load(cls, path):
+        """ Load weights exported with export_npz.
+
+        Args:
+            path (str | file): The .npz file.
+
+        Raises:
+            ValueError: If the file was exported for another format or board size.
+
+        Returns:
+            NumpyGameNet: The network.
+        """
+        with np.load(path) as data:
+            if int(data['format_version']) != FORMAT_VERSION or int(data['board_size']) != BOARD_SIZE:
+                raise ValueError(f'{path} is not a GameNet export for a {BOARD_SIZE}x{BOARD_SIZE} board.')
+            return cls({name: data[name] for name in parameter_names(data)})
+
+    @classmethod
+    def from_bytes(cls, data):
+        """ Load weights from the contents of an exported file.
+
+        Args:
+            data (bytes): The contents of the .npz file.
+
+        Returns:
+            NumpyGameNet: The network.
+        """
+        return cls.load(io.BytesIO(data))
+
+    @classmethod
+    def from_module(cls, model):
+        """ Copy the weights of a torch GameNet.
+
+        Args:
+            model (GameNet): The torch network.
+
+        Returns:
+            NumpyGameNet: The network.
+        """
+        return cls(model.state_dict())
+
+    def forward(self, x):
+        """ Forward pass.
+
+        Args:
+            x (np.ndarray): Board tensors of shape (N, 3, BOARD_SIZE, BOARD_SIZE).
+
+        Returns:
+            tuple: Policy logits of shape (N, BOARD_SIZE**2) and values of shape (N,).
+        """
+        n = x.shape[0]
+        h = np.ascontiguousarray(np.asarray(x, dtype=np.float32).transpose(0, 2, 3, 1))
+        for weight, bias in self.trunk:
+            h = _relu(_im2col(h) @ weight + bias).reshape(n, BOARD_SIZE, BOARD_SIZE, -1)
+        h = h.reshape(n * BOARD_SIZE * BOARD_SIZE, -1)   # (N * H * W, channels)
+
+        p = _relu(h @ self.p_conv[0] + self.p_conv[1]).reshape(n, -1)
+        logits = p @ self.p_fc[0] + self.p_fc[1]
+
+        v = _relu(h @ self.v_conv[0] + self.v_conv[1]).reshape(n, -1)
+        v = _relu(v @ self.v_fc1[0] + self.v_fc1[1])
+        value = np.tanh(v @ self.v_fc2[0] + self.v_fc2[1]).reshape(n)
+        return logits, value
+
+    __call__ = forward
+
+
+def _to_array(value):
+    """ Convert a parameter (torch tensor or array) to a float32 array."""
+    if hasattr(value, 'detach'):
+        value = value.detach().cpu().numpy()
+    return np.asarray(value, dtype=np.float32)
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _conv3x3(weight):
+    """ Reshape a (out, in, 3, 3) convolution weight into the (in * 9, out) matrix used with _im2col."""
+    return weight.reshape(weight.shape[0], -1).T.copy()
+
+
+def _fc_nhwc(weight):
+    """ Permute the input axis of a linear weight from (C, H, W) to (H, W, C) flattening order."""
+    out = weight.shape[0]
+    c = weight.shape[1] // (BOARD_SIZE * BOARD_SIZE)
+    return weight.reshape(out, c, BOARD_SIZE, BOARD_SIZE).transpose(2, 3, 1, 0).reshape(-1, out).copy()
+
+
+def _im2col(x):
+    """ Gather the 3x3 neighbourhoods (zero-padded) of every cell.
+
+    Args:
+        x (np.ndarray): Activations of shape (N, H, W, C).
+
+    Returns:
+        np.ndarray: Patches of shape (N * H * W, C * 9), ordered (C, kh, kw) like torch weights.
+    """
+    n, hh, ww, c = x.shape
+    padded = np.pad(x, ((0, 0), (1, 1), (1, 1), (0, 0)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (3, 3), axis=(1, 2))  # (N, H, W, C, 3, 3)
+    return windows.reshape(n * hh * ww, c * 9)
+
+
+def main():
+    """Main function to export a torch checkpoint to a .npz file.
+    """
+    parser = argparse.ArgumentParser(description="Export GameNet weights for the NumPy engine")
+    parser.add_argument('checkpoint', help="Torch state dict, e.g. model.pth")
+    parser.add_argument('out', help="Destination .npz file")
+    args = parser.parse_args()
+
+    import torch
+    export_npz(torch.load(args.checkpoint, map_location='cpu'), args.out)
+    print(f"Exported {args.checkpoint} to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ This module implements a Monte Carlo Tree Search (MCTS) algorithm for the Battle
 import random
 import math
 import copy
+import time
 from tfg.game.board import Board, SHIPS, BOARD_SIZE
 
 class Node:
@@ -117,19 +118,148 @@ class Node:
             "children": [c.to_dict() for c in self.children]
     }
 
+    def top_children(self, top_k: int = None):
+        """ Get the children of this node ordered by visit count.
+
+        Args:
+            top_k (int, optional): Keep only the top_k most visited children. Defaults to None (all).
+
+        Returns:
+            list: The selected child nodes, most visited first.
+        """
+        children = sorted(self.children, key=lambda c: c.visits, reverse=True)
+        return children if top_k is None else children[:top_k]
+
+    def find(self, path):
+        """ Follow a sequence of actions from this node.
+
+        Args:
+            path (list): Actions (x, y) to follow, starting with a child of this node.
+
+        Returns:
+            Node: The node reached, or None if some action along the path was never expanded.
+        """
+        node = self
+        for action in path:
+            node = next((c for c in node.children if c.action == tuple(action)), None)
+            if node is None:
+                return None
+        return node
+
+    def summary(self):
+        """ Summarize the statistics of this node's children without serializing the tree.
+
+        Returns:
+            list: One dictionary per child with its action, visits, wins and win rate.
+        """
+        return [
+            {
+                'action':   {'x': c.action[0], 'y': c.action[1]},
+                'visits':   c.visits,
+                'wins':     c.wins,
+                'win_rate': round(c.wins / c.visits, 3) if c.visits else 0.0
+            }
+            for c in self.children
+        ]
+
+    def snapshot(self, max_depth: int = 2, top_k: int = None):
+        """ Convert a bounded part of the subtree to a dictionary, like to_dict but limited in size.
+
+        Args:
+            max_depth (int, optional): Levels of children to include below this node. Defaults to 2.
+            top_k (int, optional): Keep only the top_k most visited children of each node.
+                Defaults to None (all).
+
+        Returns:
+            dict: A dictionary containing the node's action, visits, wins, win rate, total number of
+                children ('n_children') and the included children.
+        """
+        return {
+            "action": self.action,
+            "visits": self.visits,
+            "wins": self.wins,
+            "win_rate": (self.wins / self.visits) if self.visits else 0.0,
+            "n_children": len(self.children),
+            "children": [c.snapshot(max_depth - 1, top_k) for c in self.top_children(top_k)]
+                        if max_depth > 0 else []
+        }
+
+    def to_columns(self, max_depth: int = None, top_k: int = None):
+        """ Serialize the subtree rooted at this node into a compact columnar form.
+
+        Nodes are stored in breadth-first order as parallel lists; the parent of node i is
+        `parent[i]` (-1 for this node) and its action is encoded as x * BOARD_SIZE + y.
+        Board states are not stored, since they can be replayed from the root state.
+
+        Args:
+            max_depth (int, optional): Levels of children to include below this node.
+                Defaults to None (the whole subtree).
+            top_k (int, optional): Keep only the top_k most visited children of each node.
+                Defaults to None (all).
+
+        Returns:
+            dict: A dictionary of parallel lists 'parent', 'action', 'visits', 'wins' and 'prior'.
+        """
+        cols = {"parent": [], "action": [], "visits": [], "wins": [], "prior": []}
+        queue = [(self, -1, 0)]
+        for node, parent, depth in queue:
+            idx = len(cols["parent"])
+            cols["parent"].append(parent)
+            cols["action"].append(-1 if node.action is None
+                                  else node.action[0] * BOARD_SIZE + node.action[1])
+            cols["visits"].append(node.visits)
+            cols["wins"].append(node.wins)
+            cols["prior"].append(node.prior)
+            if max_depth is None or depth < max_depth:
+                children = node.children if top_k is None else node.top_children(top_k)
+                queue.extend((c, idx, depth + 1) for c in children)
+        return cols
+
+    @classmethod
+    def from_columns(cls, state: Board, cols: dict, heatmap=None):
+        """ Rebuild a tree serialized with to_columns.
+
+        Args:
+            state (Board): The game state of the root node.
+            cols (dict): The columnar representation produced by to_columns.
+            heatmap (list, optional): Heatmap attached to every node of the tree. Defaults to None.
+
+        Returns:
+            Node: The root of the restored tree.
+        """
+        nodes = []
+        for i, parent in enumerate(cols["parent"]):
+            action = cols["action"][i]
+            move = None if action < 0 else (action // BOARD_SIZE, action % BOARD_SIZE)
+            if parent < 0:
+                node = cls(state, action=move, prior=cols["prior"][i])
+            else:
+                new_state = copy.deepcopy(nodes[parent].state)
+                new_state.shoot(*move)
+                node = cls(new_state, parent=nodes[parent], action=move, prior=cols["prior"][i])
+                nodes[parent].children.append(node)
+            node.visits = cols["visits"][i]
+            node.wins = cols["wins"][i]
+            node.heatmap = heatmap
+            nodes.append(node)
+        return nodes[0]
+
 
 class MCTS:
     """Monte Carlo Tree Search (MCTS) algorithm for the Battleship game.
     """
-    def __init__(self, iterations: int = 200):
+    def __init__(self, iterations: int = 200, opening_book=None):
         """ Initializes the MCTS instance.
 
         Args:
             iterations (int, optional): Number of MCTS iterations to run. Defaults to 200.
+            opening_book (OpeningBook, optional): Book consulted before searching. Defaults to None.
         """
         self.iterations = iterations
+        self.opening_book = opening_book
         self.heatmap = []
         self.root = None
+        self.last_root = None  # root of the last search, kept for inspection after the tree advances
         
     def update_with_move(self, move):
         """ Updates the MCTS tree to reflect a move made by the opponent.
@@ -139,6 +269,7 @@ class MCTS:
         """
         if not self.root:
             return
+        self.last_root = self.root
         for c in self.root.children:
             if c.action == move:
                 c.parent = None
@@ -170,16 +301,26 @@ class MCTS:
         total = sum(flat) or 1
         return [c/total for c in flat]
 
-    def run(self, board: Board, iterations: int = None):
+    def run(self, board: Board, iterations: int = None, deadline: float = None):
         """ Runs the MCTS algorithm for a given number of iterations.
 
         Args:
             board (Board): The current game board.
             iterations (int, optional): Number of MCTS iterations to run. Defaults to self.iterations.
+            deadline (float, optional): time.monotonic() value after which the search stops early and
+                returns the best move found so far. Defaults to None (no time limit).
 
         Returns:
-            tuple: The best move (x, y) determined by MCTS.
+            tuple: The best move (x, y) determined by MCTS, or the book move if the position is in the
+                opening book (no search is run and the tree is cleared).
         """
+        if self.opening_book is not None:
+            move = self.opening_book.lookup(board)
+            if move is not None:
+                # no search: drop the tree, and the last one so it is not taken for this move's
+                self.root = self.last_root = None
+                return move
+
         iters = iterations or self.iterations
 
         # Recompute heatmap (static + dynamic) 
@@ -208,6 +349,8 @@ class MCTS:
 
         # MCTS main loop
         for _ in range(iters):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
             node = self.root
 
             # selection
@@ -250,9 +393,29 @@ class MCTS:
             node.backpropagate(result)
 
         # Select best move (most visits) from root
+        if not self.root.children:
+            return self.fallback_move(board)
         best = max(self.root.children, key=lambda c: c.visits)
         return best.action
 
+    def fallback_move(self, board: Board):
+        """ Picks the unshot cell with the highest heatmap weight, used when the search was stopped
+        before any child of the root was expanded.
+
+        Args:
+            board (Board): The current game board.
+
+        Returns:
+            tuple: The chosen move (x, y), or None if every cell has already been shot.
+        """
+        avail = [
+            (i, j) for i in range(BOARD_SIZE)
+                   for j in range(BOARD_SIZE)
+                   if board.get_cell(i, j) not in ['X', 'O']
+        ]
+        if not avail:
+            return None
+        return max(avail, key=lambda m: self.heatmap[m[0]*BOARD_SIZE + m[1]])
 
 
     def simulate(self, sim: Board):
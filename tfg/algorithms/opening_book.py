@@ -0,0 +1,307 @@
+"""
+tfg.algorithms.opening_book
+==============================
+This module implements an opening book for the Battleship search engines. Every game starts from the
+same shot-free board, so the first moves can be searched once, offline and much deeper than a live
+search, and then looked up in microseconds. Positions are keyed by their shot masks (see
+Board.shot_masks), so a book move only depends on what the shooter can observe.
+
+The builder starts from the empty board, and for every position samples fleets consistent with the
+shots fired so far, runs a deep search on each sample and stores the move with the most accumulated
+visits. It then follows that move for both outcomes (hit and miss) until the position cap or the shot
+limit is reached. Build a book with:
+
+    python -m tfg.algorithms.opening_book --engine mcts --shots 4 --out opening_book.npz
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from tfg.game.board import Board, SHIPS, BOARD_SIZE, HIT, MISS, SEA
+
+N_CELLS = BOARD_SIZE * BOARD_SIZE
+
+
+class OpeningBook:
+    """Table of precomputed moves keyed by the shot masks of a position.
+    """
+    def __init__(self, entries=None, meta=None):
+        """ Initializes the book.
+
+        Args:
+            entries (dict, optional): Maps (hits, misses) masks to (move index, visit share).
+                Defaults to None (empty book).
+            meta (dict, optional): Build parameters stored with the book. Defaults to None.
+        """
+        self.entries = dict(entries or {})
+        self.meta = dict(meta or {})
+        self.probes = 0
+        self.found = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, hits, misses, move, share=1.0):
+        """ Add or replace the move of a position.
+
+        Args:
+            hits (int): Mask of the hit cells.
+            misses (int): Mask of the missed cells.
+            move (tuple): The book move (x, y).
+            share (float, optional): Fraction of the search visits the move received. Defaults to 1.0.
+        """
+        self.entries[(hits, misses)] = (move[0] * BOARD_SIZE + move[1], share)
+
+    def lookup(self, board: Board):
+        """ Look up the book move of a position.
+
+        Args:
+            board (Board): The board being shot at; only its shots are looked at.
+
+        Returns:
+            tuple: The book move (x, y), or None if the position is not in the book.
+        """
+        self.probes += 1
+        entry = self.entries.get(board.shot_masks())
+        if entry is None:
+            return None
+        x, y = divmod(entry[0], BOARD_SIZE)
+        if board.get_cell(x, y) in (HIT, MISS):
+            return None
+        self.found += 1
+        return x, y
+
+    def stats(self):
+        """ Return book metrics.
+
+        Returns:
+            dict: Number of positions, lookups and lookups answered by the book.
+        """
+        return {'positions': len(self.entries), 'probes': self.probes, 'found': self.found}
+
+    def save(self, path):
+        """ Save the book as a compressed .npz file of parallel arrays.
+
+        Args:
+            path (str): Destination file.
+        """
+        keys = sorted(self.entries)
+        np.savez_compressed(
+            path,
+            hits=np.array([k[0] for k in keys], dtype=np.uint64),
+            misses=np.array([k[1] for k in keys], dtype=np.uint64),
+            move=np.array([self.entries[k][0] for k in keys], dtype=np.uint8),
+            share=np.array([self.entries[k][1] for k in keys], dtype=np.float32),
+            board_size=np.array(BOARD_SIZE),
+            ships=np.array(SHIPS),
+            **{f'meta_{k}': np.array(v) for k, v in self.meta.items()}
+        )
+
+    @classmethod
+    def load(cls, path):
+        """ Load a book saved with save.
+
+        Args:
+            path (str): The .npz file.
+
+        Raises:
+            ValueError: If the book was built for another board size or fleet.
+
+        Returns:
+            OpeningBook: The loaded book.
+        """
+        with np.load(path) as data:
+            if int(data['board_size']) != BOARD_SIZE or data['ships'].tolist() != SHIPS:
+                raise ValueError(f'{path} was built for another board size or fleet.')
+            entries = {
+                (int(h), int(m)): (int(mv), float(s))
+                for h, m, mv, s in zip(data['hits'], data['misses'], data['move'], data['share'])
+            }
+            meta = {k[len('meta_'):]: data[k].item() for k in data.files if k.startswith('meta_')}
+        return cls(entries, meta)
+
+
+def sample_fleet(hits, misses, max_tries: int = 2000):
+    """ Sample a fleet placement consistent with the shots fired so far, and apply those shots.
+
+    Ships are placed at random avoiding the missed cells; placements that leave a hit cell uncovered
+    are rejected.
+
+    Args:
+        hits (int): Mask of the hit cells.
+        misses (int): Mask of the missed cells.
+        max_tries (int, optional): Placements tried before giving up. Defaults to 2000.
+
+    Returns:
+        Board: A board with the sampled fleet and the shots marked, or None if no consistent fleet
+            was found.
+    """
+    cells = [(i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)]
+    for _ in range(max_tries):
+        board = Board()
+        for i, j in cells:
+            if misses >> (i * BOARD_SIZE + j) & 1:
+                board.board[i][j] = MISS  # ships may touch but not cover missed cells
+        for ship in SHIPS:
+            spots = [(i, j, d) for i, j in cells for d in ('H', 'V')
+                     if _fits(board, i, j, d, ship)]
+            if not spots:
+                break
+            positions = board.place_ship(*random.choice(spots), ship)
+            board.boats.append({"value": str(ship), "positions": positions})
+        else:
+            if all(board.board[i][j] not in (SEA, MISS)
+                   for i, j in cells if hits >> (i * BOARD_SIZE + j) & 1):
+                for i, j in cells:
+                    if hits >> (i * BOARD_SIZE + j) & 1:
+                        board.board[i][j] = HIT
+                return board
+    return None
+
+
+def _fits(board, x, y, direction, ship):
+    """ Check a placement like Board.can_place_ship, but letting ships touch (not cover) missed cells.
+
+    Args:
+        board (Board): Board with the missed cells marked.
+        x (int): Row of the first cell.
+        y (int): Column of the first cell.
+        direction (str): 'H' or 'V'.
+        ship (int): Length of the ship.
+
+    Returns:
+        bool: True if the ship can be placed there.
+    """
+    if (direction == 'H' and y + ship > BOARD_SIZE) or (direction == 'V' and x + ship > BOARD_SIZE):
+        return False
+    for k in range(ship):
+        nx, ny = (x, y + k) if direction == 'H' else (x + k, y)
+        if board.board[nx][ny] != SEA:
+            return False
+        for ax in (nx - 1, nx, nx + 1):
+            for ay in (ny - 1, ny, ny + 1):
+                if 0 <= ax < BOARD_SIZE and 0 <= ay < BOARD_SIZE and board.board[ax][ay] not in (SEA, MISS):
+                    return False
+    return True
+
+
+def mcts_policy(iterations: int):
+    """ Build a search policy running a plain MCTS search.
+
+    Args:
+        iterations (int): MCTS iterations per search.
+
+    Returns:
+        callable: Function taking a Board and returning a flat list of visit shares per cell.
+    """
+    from tfg.algorithms.mcts import MCTS
+
+    def policy(board):
+        _, pi = MCTS(iterations=iterations).run_with_policy(board)
+        return pi
+    return policy
+
+
+def neural_policy(model_path: str, iterations: int):
+    """ Build a search policy running an ML-MCTS search (without root noise).
+
+    Args:
+        model_path (str): Path of the network weights.
+        iterations (int): ML-MCTS iterations per search.
+
+    Returns:
+        callable: Function taking a Board and returning a flat list of visit shares per cell.
+    """
+    from tfg.ai.mcts_ml import NeuralMCTS
+    engine = NeuralMCTS(model_path, iters=iterations, eps_noise=0.0)
+
+    def policy(board):
+        _, pi = engine.run_with_policy(board)
+        return pi
+    return policy
+
+
+def build_opening_book(policy, max_shots: int = 4, samples: int = 8, max_positions: int = 1000,
+                       seed: int = None, log=None):
+    """ Build an opening book by searching the positions reachable by following the book.
+
+    Args:
+        policy (callable): Function taking a Board (with a sampled fleet) and returning a flat list
+            of visit shares per cell, e.g. mcts_policy(...).
+        max_shots (int, optional): Positions with fewer shots than this get a book move. Defaults to 4.
+        samples (int, optional): Sampled fleets searched per position. Defaults to 8.
+        max_positions (int, optional): Maximum number of positions in the book. Defaults to 1000.
+        seed (int, optional): Seed of the random generators. Defaults to None.
+        log (callable, optional): Called with a progress message after each position. Defaults to None.
+
+    Returns:
+        OpeningBook: The book.
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    book = OpeningBook(meta={'max_shots': max_shots, 'samples': samples})
+    queue = deque([(0, 0, 0)])
+    seen = {(0, 0)}
+    start = time.time()
+    while queue and len(book) < max_positions:
+        hits, misses, shots = queue.popleft()
+        boards = [b for b in (sample_fleet(hits, misses) for _ in range(samples)) if b is not None]
+        if not boards:
+            continue
+
+        visits = np.zeros(N_CELLS)
+        for board in boards:
+            visits += np.asarray(policy(board), dtype=float)
+        for idx in range(N_CELLS):
+            if (hits | misses) >> idx & 1:
+                visits[idx] = -1.0
+        idx = int(np.argmax(visits))
+        move = divmod(idx, BOARD_SIZE)
+        book.add(hits, misses, move, float(visits[idx] / len(boards)))
+        if log:
+            log(f'[{len(book)}] shots={shots} move={move} share={visits[idx] / len(boards):.2f} '
+                f'({time.time() - start:.0f}s)')
+
+        if shots + 1 >= max_shots:
+            continue
+        # follow the book move for every outcome some sampled fleet allows
+        bit = 1 << idx
+        outcomes = {b.board[move[0]][move[1]] not in (SEA, MISS) for b in boards}
+        for hit in outcomes:
+            child = (hits | bit, misses) if hit else (hits, misses | bit)
+            if child not in seen:
+                seen.add(child)
+                queue.append((*child, shots + 1))
+    return book
+
+
+def main():
+    """Main function to parse arguments and build an opening book.
+    """
+    parser = argparse.ArgumentParser(description="Build an opening book for MCTS or ML-MCTS")
+    parser.add_argument('--engine', choices=['mcts', 'ml'], default='mcts', help="Search engine")
+    parser.add_argument('--model', default='model.pth', help="Network weights for --engine ml")
+    parser.add_argument('--iters', type=int, default=1000, help="Search iterations per sampled fleet")
+    parser.add_argument('--shots', type=int, default=4, help="Number of opening moves covered")
+    parser.add_argument('--samples', type=int, default=8, help="Sampled fleets per position")
+    parser.add_argument('--max-positions', type=int, default=1000, help="Position cap")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('--out', default='opening_book.npz', help="Output file")
+    args = parser.parse_args()
+
+    policy = (mcts_policy(args.iters) if args.engine == 'mcts'
+              else neural_policy(args.model, args.iters))
+    book = build_opening_book(policy, max_shots=args.shots, samples=args.samples,
+                              max_positions=args.max_positions, seed=args.seed, log=print)
+    book.meta.update(engine=args.engine, iters=args.iters)
+    book.save(args.out)
+    print(f"Saved {len(book)} positions to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
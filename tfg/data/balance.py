@@ -0,0 +1,174 @@
+"""
+tfg.data.balance
+===================
+This module balances self-play data (equal numbers of won and lost positions, shuffled) without
+loading it in memory, so datasets of tens of millions of positions can be balanced within a fixed
+memory budget.
+It produces what self_play.balance_records produces, in three streaming passes over the files:
+
+1. count the won and lost records and their bytes;
+2. draw exactly min(wins, losses) records of each outcome by selection sampling (every record is
+   kept with probability needed / remaining), scattering the kept lines over temporary bucket files
+   chosen uniformly at random;
+3. shuffle each bucket in memory and append it to the output.
+
+Assigning records to random buckets and shuffling every bucket yields a uniformly shuffled output.
+Peak memory is that of the largest bucket, held as a list of lines: about its bytes plus
+LINE_OVERHEAD per line. The number of buckets is derived from the size of the kept records so that a
+bucket averages FILL times the memory budget; buckets get a random share of the records, and the
+slack keeps the largest one under the budget. Balance shards with:
+
+    python -m tfg.data.balance shards/shard-*.jsonl --out data_balanced.jsonl
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+
+
+# Memory of a line held in a list, beyond its characters: the str header and the list slot
+LINE_OVERHEAD = 57
+# Mean bucket size as a fraction of the memory budget
+FILL = 0.8
+
+
+def iter_lines(paths):
+    """ Iterate over the non-empty lines of JSON Lines files.
+
+    Args:
+        paths (list): The files, read in order.
+
+    Yields:
+        str: A line, with its newline.
+    """
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield line if line.endswith('\n') else line + '\n'
+
+
+def outcome(line):
+    """ Get the outcome of a record.
+
+    Args:
+        line (str): A JSON record with a 'z' field.
+
+    Returns:
+        int: 1 for a won position, -1 for a lost one.
+    """
+    return 1 if json.loads(line)['z'] > 0 else -1
+
+
+def count_outcomes(paths):
+    """ Count the won and lost records of JSON Lines files.
+
+    Args:
+        paths (list): The files.
+
+    Returns:
+        tuple: The number of won records and the number of lost records.
+    """
+    counts, _ = _scan(paths)
+    return counts[1], counts[-1]
+
+
+def _scan(paths):
+    """ Count the records and bytes of each outcome.
+
+    Returns:
+        tuple: Records and bytes, as dicts keyed by outcome (1 and -1).
+    """
+    counts, sizes = {1: 0, -1: 0}, {1: 0, -1: 0}
+    for line in iter_lines(paths):
+        z = outcome(line)
+        counts[z] += 1
+        sizes[z] += len(line)
+    return counts, sizes
+
+
+def balance_files(paths, out_path, seed: int = None, memory_budget: int = 256 * 2**20,
+                  bucket_records: int = None, tmp_dir: str = None):
+    """ Write a balanced, shuffled copy of JSON Lines records within a memory budget.
+
+    Args:
+        paths (list): Input files (e.g. self-play shards).
+        out_path (str): Output JSON Lines file.
+        seed (int, optional): Seed of the sampling and shuffling. Defaults to None.
+        memory_budget (int, optional): Bytes the in-memory shuffle of a bucket may use; the number of
+            buckets is derived from it (see the module documentation). Defaults to 256 MiB.
+        bucket_records (int, optional): Additional limit on the mean number of records per bucket.
+            Defaults to None.
+        tmp_dir (str, optional): Directory for the bucket files. Defaults to None (next to out_path).
+
+    Returns:
+        dict: Input counts, records written per outcome, number of buckets, estimated memory of the
+            largest bucket and seconds spent.
+    """
+    rng = random.Random(seed)
+    start = time.time()
+    counts, sizes = _scan(paths)
+    wins, losses = counts[1], counts[-1]
+    m = min(wins, losses)
+    # expected memory of the kept records, each outcome contributing m records of its mean size
+    kept = sum(m * (sizes[z] / counts[z] + LINE_OVERHEAD) for z in (1, -1) if counts[z])
+    n_buckets = max(1, math.ceil(kept / (FILL * memory_budget)))
+    if bucket_records:
+        n_buckets = max(n_buckets, -(-2 * m // bucket_records))
+    largest = 0
+
+    work = tempfile.mkdtemp(prefix='balance-', dir=tmp_dir or os.path.dirname(os.path.abspath(out_path)))
+    try:
+        buckets = [open(os.path.join(work, f'{i}.jsonl'), 'w') for i in range(n_buckets)]
+        needed = {1: m, -1: m}
+        remaining = {1: wins, -1: losses}
+        for line in iter_lines(paths):
+            z = outcome(line)
+            if rng.random() * remaining[z] < needed[z]:
+                needed[z] -= 1
+                buckets[rng.randrange(n_buckets)].write(line)
+            remaining[z] -= 1
+        for f in buckets:
+            f.close()
+
+        tmp_out = out_path + '.tmp'
+        with open(tmp_out, 'w') as out:
+            for i in range(n_buckets):
+                with open(os.path.join(work, f'{i}.jsonl')) as f:
+                    lines = f.readlines()
+                largest = max(largest, sum(map(len, lines)) + LINE_OVERHEAD * len(lines))
+                rng.shuffle(lines)
+                out.writelines(lines)
+        os.replace(tmp_out, out_path)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    return {'wins': wins, 'losses': losses, 'written_per_outcome': m, 'buckets': n_buckets,
+            'largest_bucket_bytes': largest, 'seconds': time.time() - start}
+
+
+def main():
+    """Main function to parse arguments and balance JSON Lines files.
+    """
+    parser = argparse.ArgumentParser(description="Balance and shuffle self-play data within a memory budget")
+    parser.add_argument('inputs', nargs='+', help="JSON Lines files or glob patterns")
+    parser.add_argument('--out', default='data_balanced.jsonl', help="Output file")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('--memory-mb', type=float, default=256,
+                        help="Memory budget of the in-memory shuffle of a bucket, in MiB")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])})
+    stats = balance_files(paths, args.out, args.seed, int(args.memory_mb * 2**20))
+    print(f"{stats['wins']} won / {stats['losses']} lost records in {len(paths)} files; wrote "
+          f"{2 * stats['written_per_outcome']} to {args.out} ({stats['seconds']:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
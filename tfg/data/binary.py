@@ -0,0 +1,313 @@
+"""
+tfg.data.binary
+==================
+This module implements the compact binary format of the training data. A record is a position (its
+hit and miss cells as two bit masks, cell (x, y) being bit x * BOARD_SIZE + y, as in
+Board.shot_masks), the search policy pi and the outcome z. A dataset is a directory of shard files
+plus an index.json listing the shards and their record counts. Each shard stores its records
+column by column after a fixed header:
+
+    magic 'TFGREC01' | version u32 | board size u32 | records u64 | offsets of the 4 columns (u64)
+    hits uint64[n] | misses uint64[n] | pi float16[n, BOARD_SIZE**2] | z int8[n]
+
+A record takes 8 + 8 + 72 + 1 = 89 bytes, against about 800 bytes of JSON text. Columns are read
+with np.memmap, so opening a dataset costs nothing and only the rows used are paged in. Convert with:
+
+    python -m tfg.data.binary to-binary data.jsonl data_bin/
+    python -m tfg.data.binary to-jsonl data_bin/ data.jsonl
+"""
+
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from tfg.game.board import BOARD_SIZE
+
+MAGIC = b'TFGREC01'
+VERSION = 1
+N_CELLS = BOARD_SIZE * BOARD_SIZE
+HEADER = struct.Struct('<8sIIQ4Q')
+HEADER_SIZE = 64
+INDEX_FILE = 'index.json'
+COLUMNS = (('hits', np.uint64, ()), ('misses', np.uint64, ()), ('pi', np.float16, (N_CELLS,)),
+           ('z', np.int8, ()))
+_BITS = (np.uint64(1) << np.arange(N_CELLS, dtype=np.uint64))
+
+
+def states_to_masks(states):
+    """ Encode board tensors as hit and miss masks.
+
+    Args:
+        states (np.ndarray): Board tensors of shape (N, 3, BOARD_SIZE, BOARD_SIZE).
+
+    Returns:
+        tuple: The hit masks and the miss masks, as uint64 arrays of shape (N,).
+    """
+    states = np.asarray(states).reshape(len(states), 3, N_CELLS)
+    hits = np.bitwise_or.reduce(np.where(states[:, 0] > 0.5, _BITS, np.uint64(0)), axis=1)
+    misses = np.bitwise_or.reduce(np.where(states[:, 1] > 0.5, _BITS, np.uint64(0)), axis=1)
+    return hits, misses
+
+
+def masks_to_states(hits, misses):
+    """ Expand hit and miss masks into board tensors (the inverse of states_to_masks).
+
+    Args:
+        hits (np.ndarray): Hit masks, uint64 of shape (N,).
+        misses (np.ndarray): Miss masks, uint64 of shape (N,).
+
+    Returns:
+        np.ndarray: Float32 board tensors of shape (N, 3, BOARD_SIZE, BOARD_SIZE).
+    """
+    h = (np.asarray(hits, dtype=np.uint64)[:, None] & _BITS) != 0
+    m = (np.asarray(misses, dtype=np.uint64)[:, None] & _BITS) != 0
+    states = np.stack([h, m, ~(h | m)], axis=1).astype(np.float32)
+    return states.reshape(-1, 3, BOARD_SIZE, BOARD_SIZE)
+
+
+def write_shard(path, hits, misses, pi, z):
+    """ Write records to a shard file.
+
+    Args:
+        path (str): Destination file.
+        hits (np.ndarray): Hit masks, shape (N,).
+        misses (np.ndarray): Miss masks, shape (N,).
+        pi (np.ndarray): Policies, shape (N, BOARD_SIZE**2).
+        z (np.ndarray): Outcomes (1 or -1), shape (N,).
+    """
+    arrays = [np.ascontiguousarray(a, dtype=dtype).reshape(-1, *shape)
+              for a, (_, dtype, shape) in zip((hits, misses, pi, z), COLUMNS)]
+    n = len(arrays[0])
+    offsets, offset = [], HEADER_SIZE
+    for a in arrays:
+        offsets.append(offset)
+        offset += -(-a.nbytes // 8) * 8  # keep every column 8-byte aligned
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BOARD_SIZE, n, *offsets).ljust(HEADER_SIZE, b'\0'))
+        for a, start in zip(arrays, offsets):
+            f.seek(start)
+            f.write(a.tobytes())
+        f.truncate(offset)
+    os.replace(path + '.tmp', path)
+
+
+def read_shard(path):
+    """ Map the columns of a shard file.
+
+    Args:
+        path (str): The shard file.
+
+    Raises:
+        ValueError: If the file is not a shard of this format and board size.
+
+    Returns:
+        dict: Read-only memory-mapped arrays 'hits', 'misses', 'pi' and 'z'.
+    """
+    with open(path, 'rb') as f:
+        magic, version, board_size, n, *offsets = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or board_size != BOARD_SIZE:
+        raise ValueError(f'{path} is not a version {VERSION} record shard for a {BOARD_SIZE}x{BOARD_SIZE} board.')
+    if n == 0:
+        return {name: np.zeros((0, *shape), dtype=dtype) for name, dtype, shape in COLUMNS}
+    return {name: np.memmap(path, dtype=dtype, mode='r', offset=start, shape=(n, *shape))
+            for (name, dtype, shape), start in zip(COLUMNS, offsets)}
+
+
+class ShardedWriter:
+    """Writes records to a dataset directory, starting a new shard every shard_records records, and
+    writes the index when closed.
+    """
+    def __init__(self, out_dir, shard_records: int = 1_000_000):
+        """ Initializes the writer.
+
+        Args:
+            out_dir (str): Dataset directory (created if needed).
+            shard_records (int, optional): Records per shard. Defaults to 1000000.
+        """
+        self.out_dir = out_dir
+        self.shard_records = shard_records
+        self.shards = []
+        self._hits = np.zeros(shard_records, dtype=np.uint64)
+        self._misses = np.zeros(shard_records, dtype=np.uint64)
+        self._pi = np.zeros((shard_records, N_CELLS), dtype=np.float16)
+        self._z = np.zeros(shard_records, dtype=np.int8)
+        self._n = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def add(self, state, pi, z):
+        """ Add one record.
+
+        Args:
+            state (array-like): Board tensor of shape (3, BOARD_SIZE, BOARD_SIZE).
+            pi (array-like): Policy of BOARD_SIZE**2 floats.
+            z (int): Outcome, 1 or -1.
+        """
+        hits, misses = states_to_masks(np.asarray(state, dtype=np.float32)[None])
+        self.add_masks(hits[0], misses[0], pi, z)
+
+    def add_masks(self, hits, misses, pi, z):
+        """ Add one record given as masks.
+
+        Args:
+            hits (int): Mask of the hit cells.
+            misses (int): Mask of the missed cells.
+            pi (array-like): Policy of BOARD_SIZE**2 floats.
+            z (int): Outcome, 1 or -1.
+        """
+        i = self._n
+        self._hits[i], self._misses[i], self._pi[i], self._z[i] = hits, misses, pi, z
+        self._n += 1
+        if self._n == self.shard_records:
+            self._flush()
+
+    def _flush(self):
+        if not self._n:
+            return
+        n = self._n
+        name = f'shard-{len(self.shards):05d}.bin'
+        write_shard(os.path.join(self.out_dir, name), self._hits[:n], self._misses[:n], self._pi[:n],
+                    self._z[:n])
+        self.shards.append({'file': name, 'records': n})
+        self._n = 0
+
+    def close(self):
+        """ Write the last shard and the index.
+
+        Returns:
+            int: Number of records written.
+        """
+        self._flush()
+        index = {'format': MAGIC.decode(), 'version': VERSION, 'board_size': BOARD_SIZE,
+                 'records': sum(s['records'] for s in self.shards), 'shards': self.shards}
+        with open(os.path.join(self.out_dir, INDEX_FILE) + '.tmp', 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(os.path.join(self.out_dir, INDEX_FILE) + '.tmp', os.path.join(self.out_dir, INDEX_FILE))
+        return index['records']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinaryRecords:
+    """Read-only view of a dataset directory, concatenating the memory-mapped shards.
+    """
+    def __init__(self, path):
+        """ Opens a dataset.
+
+        Args:
+            path (str): The dataset directory, or its index.json.
+        """
+        self.path = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+        with open(os.path.join(self.path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.shards = [read_shard(os.path.join(self.path, s['file'])) for s in self.index['shards']]
+        self.starts = np.cumsum([0] + [len(s['z']) for s in self.shards])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def get(self, indices):
+        """ Gather records, expanding their masks into board tensors.
+
+        Args:
+            indices (array-like): Record indices.
+
+        Returns:
+            tuple: States (N, 3, BOARD_SIZE, BOARD_SIZE) float32, pi (N, BOARD_SIZE**2) float32 and
+                z (N,) float32 arrays, in the order of indices.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        hits = np.empty(len(indices), dtype=np.uint64)
+        misses = np.empty(len(indices), dtype=np.uint64)
+        pi = np.empty((len(indices), N_CELLS), dtype=np.float32)
+        z = np.empty(len(indices), dtype=np.float32)
+        shard_of = np.searchsorted(self.starts, indices, side='right') - 1
+        for s in np.unique(shard_of):
+            sel = np.nonzero(shard_of == s)[0]
+            rows = indices[sel] - self.starts[s]
+            order = np.argsort(rows)  # read each shard sequentially
+            rows, sel = rows[order], sel[order]
+            shard = self.shards[s]
+            hits[sel] = shard['hits'][rows]
+            misses[sel] = shard['misses'][rows]
+            pi[sel] = shard['pi'][rows]
+            z[sel] = shard['z'][rows]
+        return masks_to_states(hits, misses), pi, z
+
+
+def jsonl_to_binary(paths, out_dir, shard_records: int = 1_000_000):
+    """ Convert JSON Lines records ({'state', 'pi', 'z'}) to a binary dataset.
+
+    Args:
+        paths (list): The JSON Lines files.
+        out_dir (str): The dataset directory.
+        shard_records (int, optional): Records per shard. Defaults to 1000000.
+
+    Raises:
+        ValueError: If the records are weighted (see tfg.data.dedup), which the format cannot store.
+
+    Returns:
+        int: Number of records converted.
+    """
+    with ShardedWriter(out_dir, shard_records) as writer:
+        for path in paths:
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        if 'w' in rec:
+                            raise ValueError(f'{path} holds weighted records, which the binary format cannot store.')
+                        writer.add(rec['state'], rec['pi'], rec['z'])
+    return sum(s['records'] for s in writer.shards)
+
+
+def binary_to_jsonl(path, out_path, chunk: int = 65536):
+    """ Convert a binary dataset back to JSON Lines records.
+
+    Args:
+        path (str): The dataset directory.
+        out_path (str): The JSON Lines file.
+        chunk (int, optional): Records converted at a time. Defaults to 65536.
+
+    Returns:
+        int: Number of records converted.
+    """
+    records = BinaryRecords(path)
+    with open(out_path, 'w') as f:
+        for start in range(0, len(records), chunk):
+            states, pi, z = records.get(np.arange(start, min(start + chunk, len(records))))
+            for s, p, v in zip(states.tolist(), pi.tolist(), z.tolist()):
+                f.write(json.dumps({'state': s, 'pi': p, 'z': int(v)}) + '\n')
+    return len(records)
+
+
+def main():
+    """Main function to parse arguments and convert datasets.
+    """
+    parser = argparse.ArgumentParser(description="Convert training data between JSONL and binary")
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_bin = sub.add_parser('to-binary', help="JSONL files to a binary dataset directory")
+    to_bin.add_argument('inputs', nargs='+', help="JSON Lines files")
+    to_bin.add_argument('out_dir', help="Dataset directory")
+    to_bin.add_argument('--shard-records', type=int, default=1_000_000, help="Records per shard")
+    to_json = sub.add_parser('to-jsonl', help="A binary dataset directory to a JSONL file")
+    to_json.add_argument('dataset', help="Dataset directory")
+    to_json.add_argument('out', help="JSON Lines file")
+    args = parser.parse_args()
+
+    if args.command == 'to-binary':
+        n = jsonl_to_binary(args.inputs, args.out_dir, args.shard_records)
+        print(f"Converted {n} records to {args.out_dir}")
+    else:
+        n = binary_to_jsonl(args.dataset, args.out)
+        print(f"Converted {n} records to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
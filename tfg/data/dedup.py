@@ -0,0 +1,129 @@
+"""
+tfg.data.dedup
+=================
+This module compacts self-play data by merging the records of the same position. Early positions
+(above all the empty board) appear in nearly every game, each time with its own noisy search policy;
+compaction keeps one record per position with the mean pi and the mean z of its copies, and their
+number as the sample weight 'w', which train.py uses to weight the loss.
+
+Positions are grouped by their canonical shot masks (see tfg.game.symmetry), so the 8 symmetric
+images of a position are merged too: every policy is moved to the canonical orientation before it is
+averaged, and the record is written in that orientation. With weights, the weighted loss over the
+compacted records has the same gradient as the loss over the original records (the policy loss is
+linear in pi, and the value loss only differs by the variance of z), while an epoch visits each
+position once. Compact with:
+
+    python -m tfg.data.dedup data_balanced.jsonl --out data_dedup.jsonl
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from tfg.data.balance import iter_lines
+from tfg.data.binary import states_to_masks, masks_to_states
+from tfg.data.stream import decode
+from tfg.game.symmetry import N_CELLS, PERMUTATIONS, canonical_masks_batch
+
+
+class _Groups:
+    """Running sums of the records of each position, in arrays grown by doubling."""
+    def __init__(self, capacity: int = 1024):
+        self.rows = {}
+        self.hits = np.zeros(capacity, dtype=np.uint64)
+        self.misses = np.zeros(capacity, dtype=np.uint64)
+        self.pi = np.zeros((capacity, N_CELLS), dtype=np.float64)
+        self.z = np.zeros(capacity, dtype=np.float64)
+        self.w = np.zeros(capacity, dtype=np.float64)
+
+    def _grow(self, size):
+        while len(self.w) < size:
+            for name in ('hits', 'misses', 'pi', 'z', 'w'):
+                a = getattr(self, name)
+                setattr(self, name, np.concatenate([a, np.zeros_like(a)]))
+
+    def add(self, hits, misses, pi, z, w):
+        rows = np.empty(len(hits), dtype=np.int64)
+        for i, key in enumerate(zip(hits.tolist(), misses.tolist())):
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = len(self.rows)
+            rows[i] = row
+        self._grow(len(self.rows))
+        self.hits[rows], self.misses[rows] = hits, misses
+        np.add.at(self.pi, rows, pi * w[:, None])
+        np.add.at(self.z, rows, z * w)
+        np.add.at(self.w, rows, w)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def dedup_files(paths, out_path, canonical: bool = True, chunk: int = 65536):
+    """ Write one weighted record per position of JSON Lines records.
+
+    Args:
+        paths (list): Input files (records {'state', 'pi', 'z'} and optionally a weight 'w').
+        out_path (str): Output JSON Lines file, with records {'state', 'pi', 'z', 'w'}.
+        canonical (bool, optional): Whether to merge the symmetric images of a position.
+            Defaults to True.
+        chunk (int, optional): Records decoded at a time. Defaults to 65536.
+
+    Returns:
+        dict: Records read, positions written, total weight and seconds spent.
+    """
+    start = time.time()
+    groups = _Groups()
+    records = 0
+    lines = iter_lines(paths)
+    while True:
+        batch = [line for _, line in zip(range(chunk), lines)]
+        if not batch:
+            break
+        states, pi, z, *w = decode(batch)
+        w = w[0] if w else np.ones(len(z), dtype=np.float32)
+        hits, misses = states_to_masks(states)
+        if canonical:
+            hits, misses, ks = canonical_masks_batch(hits, misses)
+            pi = np.take_along_axis(pi, PERMUTATIONS[ks], axis=1)
+        groups.add(hits, misses, pi, z, w)
+        records += len(batch)
+
+    n = len(groups)
+    weight = groups.w[:n]
+    tmp_out = out_path + '.tmp'
+    with open(tmp_out, 'w') as f:
+        for first in range(0, n, chunk):
+            rows = slice(first, min(first + chunk, n))
+            states = masks_to_states(groups.hits[rows], groups.misses[rows])
+            pi = groups.pi[rows] / weight[rows, None]
+            z = groups.z[rows] / weight[rows]
+            for s, p, v, c in zip(states.tolist(), pi.tolist(), z.tolist(), weight[rows].tolist()):
+                f.write(json.dumps({'state': s, 'pi': p, 'z': v, 'w': c}) + '\n')
+    os.replace(tmp_out, out_path)
+    return {'records': records, 'positions': n, 'weight': float(weight.sum()),
+            'seconds': time.time() - start}
+
+
+def main():
+    """Main function to parse arguments and compact JSON Lines files.
+    """
+    parser = argparse.ArgumentParser(description="Merge the duplicate positions of self-play data")
+    parser.add_argument('inputs', nargs='+', help="JSON Lines files or glob patterns")
+    parser.add_argument('--out', default='data_dedup.jsonl', help="Output file")
+    parser.add_argument('--exact', action='store_true',
+                        help="Only merge identical positions, not symmetric images")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])})
+    stats = dedup_files(paths, args.out, canonical=not args.exact)
+    print(f"{stats['records']} records -> {stats['positions']} positions in {args.out} "
+          f"({stats['records'] / max(stats['positions'], 1):.1f}x, {stats['seconds']:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+tfg.data.replay
+==================
+This module implements the bounded on-disk replay buffer shared by the stages of pipeline.py. Writers
+(self-play workers, each in its own process) append the records of their finished games as a new
+shard; readers (the trainer) sample uniformly from the records of the shards present. The buffer
+keeps the layout of a sharded self-play run (see self_play.py --out-dir and tfg.data.stream): every
+shard is a JSON Lines file that only counts once its .done marker exists, so the buffer can also be
+streamed, balanced or compacted like any run.
+
+Shards are immutable: a shard is written to a temporary file and renamed, then marked done, and the
+oldest shards are evicted (marker first) once the buffer holds more than capacity records. Shard
+names start with their creation time, so several writers never collide and sorting the names sorts
+the shards from the oldest to the newest.
+"""
+
+import glob
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from tfg.data.stream import SHARD_PATTERN, decode
+
+
+class ReplayBuffer:
+    """A directory of self-play shards holding at most about capacity records.
+
+        Attributes:
+            directory (str): Directory of the shards.
+            capacity (int): Records kept; the oldest shards are evicted beyond it.
+    """
+    def __init__(self, directory, capacity: int = 100000):
+        """ Initializes the buffer (the directory is created if needed).
+
+        Args:
+            directory (str): Directory of the shards.
+            capacity (int, optional): Records kept. Defaults to 100000.
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self._lines = {}  # shard name -> its records, read once (shards never change)
+        os.makedirs(directory, exist_ok=True)
+
+    def shards(self):
+        """ List the finished shards with their record counts.
+
+        Returns:
+            list: (name, records) pairs, from the oldest to the newest shard.
+        """
+        shards = []
+        for marker in sorted(glob.glob(os.path.join(self.directory, SHARD_PATTERN[:-len('.jsonl')] + '.done'))):
+            try:
+                with open(marker) as f:
+                    records = json.load(f)['records']
+            except (FileNotFoundError, ValueError):
+                continue  # evicted or being written meanwhile
+            shards.append((os.path.basename(marker)[:-len('.done')] + '.jsonl', records))
+        return shards
+
+    def __len__(self):
+        return sum(records for _, records in self.shards())
+
+    def add(self, records, **info):
+        """ Append records as a new shard, then evict the oldest shards beyond capacity.
+
+        Args:
+            records (list): The records ({'state', 'pi', 'z'} dicts).
+            **info: Extra fields of the shard's .done marker (e.g. the model version).
+
+        Returns:
+            str: The name of the shard, or None if records is empty.
+        """
+        if not records:
+            return None
+        name = f'shard-{time.time_ns():020d}-{os.getpid()}.jsonl'
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'w') as f:
+            f.write(''.join(json.dumps(rec) + '\n' for rec in records))
+        os.replace(path + '.tmp', path)
+        with open(path[:-len('.jsonl')] + '.done.tmp', 'w') as f:
+            json.dump({'records': len(records), 'created': time.time(), **info}, f)
+        os.replace(path[:-len('.jsonl')] + '.done.tmp', path[:-len('.jsonl')] + '.done')
+        self.evict()
+        return name
+
+    def evict(self):
+        """ Delete the oldest shards while the others still hold at least capacity records.
+
+        Returns:
+            int: Shards deleted.
+        """
+        shards = self.shards()
+        total = sum(records for _, records in shards)
+        deleted = 0
+        for name, records in shards[:-1]:
+            if total - records < self.capacity:
+                break
+            path = os.path.join(self.directory, name)
+            for victim in (path[:-len('.jsonl')] + '.done', path):
+                try:
+                    os.unlink(victim)
+                except FileNotFoundError:
+                    pass  # another writer evicted it
+            total -= records
+            deleted += 1
+        return deleted
+
+    def _read(self, name):
+        if name not in self._lines:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    self._lines[name] = [line for line in f if line.strip()]
+            except FileNotFoundError:
+                return []
+        return self._lines[name]
+
+    def sample(self, n, rng: random.Random = None):
+        """ Draw records uniformly (with replacement) from the shards present.
+
+        Args:
+            n (int): Records drawn.
+            rng (random.Random, optional): Random generator. Defaults to the random module.
+
+        Returns:
+            tuple: States, pi and z arrays (see tfg.data.stream.decode), or None if the buffer is empty.
+        """
+        rng = rng or random
+        shards = [(name, self._read(name)) for name, _ in self.shards()]
+        shards = [(name, lines) for name, lines in shards if lines]
+        # forget the evicted shards
+        self._lines = {name: lines for name, lines in shards}
+        if not shards:
+            return None
+        counts = np.array([len(lines) for _, lines in shards])
+        offsets = np.cumsum(counts)
+        picks = [rng.randrange(int(offsets[-1])) for _ in range(n)]
+        batch = []
+        for i in picks:
+            s = int(np.searchsorted(offsets, i, side='right'))
+            batch.append(shards[s][1][i - (offsets[s] - counts[s])])
+        return decode(batch)
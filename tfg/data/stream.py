@@ -0,0 +1,237 @@
+"""
+tfg.data.stream
+==================
+This module streams training batches straight from the shards of a sharded self-play run (see
+self_play.py --out-dir), so training does not wait for the whole run nor load it in memory. Only
+finished shards (those with a .done marker) are read; a stream picks up the shards finished so far at
+the start of every epoch, so training can begin as soon as the first shards are done and each epoch
+sees the shards finished since.
+
+Records are split deterministically between training and validation, either by shard (a shard is held
+out when the CRC32 of its file name falls below val_fraction, which keeps all the positions of a game
+on the same side) or by hash (a record is held out when the CRC32 of its state text does, which keeps
+repeated positions on the same side). The training split is shuffled by visiting the shards in a
+random order and passing the records through a shuffle buffer; both depend only on the seed and the
+epoch, so the stream is reproducible and can resume: state_dict records the epoch, its shards and the
+number of records already consumed, and a stream restored with load_state_dict continues with the
+next batch it would have produced. That position lives in the stream object, so a stream is read by
+the process that owns it (not by DataLoader workers).
+
+Note that shards are not balanced between won and lost positions like self_play.py's output file.
+"""
+
+import glob
+import json
+import os
+import random
+import time
+import zlib
+
+import numpy as np
+
+SHARD_PATTERN = 'shard-*.jsonl'
+HOLDOUTS = ('shard', 'hash')
+
+
+def held_out(key, val_fraction):
+    """ Whether a key (shard file name or record state) belongs to the validation split.
+
+    Args:
+        key (str): The key.
+        val_fraction (float): Fraction of the keys held out.
+
+    Returns:
+        bool: True if the key is in the validation split.
+    """
+    return zlib.crc32(key.encode()) < val_fraction * 2**32
+
+
+def shuffle_buffer(items, size, rng):
+    """ Shuffle an iterable approximately, holding at most size items in memory.
+
+    Args:
+        items (iterable): The items.
+        size (int): Size of the buffer (0 or 1 keeps the order).
+        rng (random.Random): Random generator.
+
+    Yields:
+        object: The items, each once.
+    """
+    if size <= 1:
+        yield from items
+        return
+    buf = []
+    for item in items:
+        if len(buf) < size:
+            buf.append(item)
+            continue
+        j = rng.randrange(size)
+        yield buf[j]
+        buf[j] = item
+    rng.shuffle(buf)
+    yield from buf
+
+
+def decode(lines):
+    """ Decode JSON Lines records into arrays.
+
+    Args:
+        lines (list): The records, as JSON text.
+
+    Returns:
+        tuple: States (N, 3, BOARD_SIZE, BOARD_SIZE), pi (N, BOARD_SIZE**2) and z (N,) float32 arrays,
+            followed by the weights (N,) if any record has a weight 'w' (see tfg.data.dedup; records
+            without one weigh 1).
+    """
+    recs = [json.loads(line) for line in lines]
+    arrays = (np.array([r['state'] for r in recs], dtype=np.float32),
+              np.array([r['pi'] for r in recs], dtype=np.float32),
+              np.array([r['z'] for r in recs], dtype=np.float32))
+    if any('w' in r for r in recs):
+        arrays += (np.array([r.get('w', 1) for r in recs], dtype=np.float32),)
+    return arrays
+
+
+class ShardStream:
+    """Iterates over the training or validation records of a shard directory in batches.
+
+        Attributes:
+            epoch (int): Current epoch (incremented when an epoch is iterated to its end).
+            position (int): Records of the current epoch already produced.
+    """
+    def __init__(self, shard_dir, split: str = 'train', holdout: str = 'shard', val_fraction: float = 0.05,
+                 batch_size: int = 256, buffer_size: int = 20000, seed: int = 0):
+        """ Initializes the stream.
+
+        Args:
+            shard_dir (str): Directory of the sharded run.
+            split (str, optional): 'train' or 'val'. Defaults to 'train'.
+            holdout (str, optional): Validation holdout by 'shard' or by record 'hash'.
+                Defaults to 'shard'.
+            val_fraction (float, optional): Fraction of the shards or records held out.
+                Defaults to 0.05.
+            batch_size (int, optional): Records per batch. Defaults to 256.
+            buffer_size (int, optional): Size of the shuffle buffer of the training split (the
+                validation split is not shuffled). Defaults to 20000.
+            seed (int, optional): Seed of the shuffling. Defaults to 0.
+
+        Raises:
+            ValueError: If split or holdout is unknown.
+        """
+        if split not in ('train', 'val'):
+            raise ValueError(f"Unknown split '{split}', expected 'train' or 'val'.")
+        if holdout not in HOLDOUTS:
+            raise ValueError(f"Unknown holdout '{holdout}', expected one of {HOLDOUTS}.")
+        self.shard_dir = shard_dir
+        self.split = split
+        self.holdout = holdout
+        self.val_fraction = val_fraction
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size if split == 'train' else 0
+        self.seed = seed
+        self.epoch = 0
+        self.position = 0
+        self._shards = None
+
+    def shards(self):
+        """ List the finished shards of the split.
+
+        Returns:
+            list: File names of the shards, sorted.
+        """
+        names = []
+        for path in sorted(glob.glob(os.path.join(self.shard_dir, SHARD_PATTERN))):
+            name = os.path.basename(path)
+            if not os.path.exists(path[:-len('.jsonl')] + '.done'):
+                continue
+            if self.holdout == 'shard' and held_out(name, self.val_fraction) != (self.split == 'val'):
+                continue
+            names.append(name)
+        return names
+
+    def wait_for_shards(self, n: int = 1, timeout: float = None, poll: float = 2.0):
+        """ Wait until at least n finished shards belong to the split.
+
+        Args:
+            n (int, optional): Shards to wait for. Defaults to 1.
+            timeout (float, optional): Maximum seconds to wait. Defaults to None (forever).
+            poll (float, optional): Seconds between checks. Defaults to 2.0.
+
+        Raises:
+            TimeoutError: If the shards did not appear in time.
+
+        Returns:
+            list: File names of the finished shards.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            shards = self.shards()
+            if len(shards) >= n:
+                return shards
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f'{len(shards)} of {n} {self.split} shards finished in {self.shard_dir}')
+            time.sleep(poll)
+
+    def _lines(self, shards):
+        for name in shards:
+            with open(os.path.join(self.shard_dir, name)) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    if self.holdout == 'hash':
+                        state = line[:line.find('"pi"')] if '"pi"' in line else line
+                        if held_out(state, self.val_fraction) != (self.split == 'val'):
+                            continue
+                    yield line
+
+    def batches(self):
+        """ Iterate over the rest of the current epoch, then move to the next epoch.
+
+        Yields:
+            tuple: States, pi and z arrays of a batch, and weights for weighted records (see decode).
+        """
+        if self._shards is None:
+            self._shards = self.shards()
+        rng = random.Random(self.seed * 1_000_003 + self.epoch)
+        order = list(self._shards)
+        if self.buffer_size:
+            rng.shuffle(order)
+        lines = shuffle_buffer(self._lines(order), self.buffer_size, rng)
+
+        skip = self.position
+        batch = []
+        for line in lines:
+            if skip:
+                skip -= 1
+                continue
+            batch.append(line)
+            if len(batch) == self.batch_size:
+                self.position += len(batch)
+                yield decode(batch)
+                batch = []
+        if batch:
+            self.position += len(batch)
+            yield decode(batch)
+        self.epoch += 1
+        self.position = 0
+        self._shards = None
+
+    __iter__ = batches
+
+    def state_dict(self):
+        """ Capture the position of the stream.
+
+        Returns:
+            dict: The epoch, the shards of the epoch (None before it starts) and the records consumed.
+        """
+        return {'epoch': self.epoch, 'position': self.position, 'shards': self._shards}
+
+    def load_state_dict(self, state):
+        """ Restore a position captured with state_dict (with the same seed and batch size).
+
+        Args:
+            state (dict): The state.
+        """
+        self.epoch = state['epoch']
+        self.position = state['position']
+        self._shards = state['shards']
@@ -43,19 +43,31 @@ class Board:
         """
         return self.board[x][y]
 
-    def place_fleet(self):
+    def place_fleet(self, max_attempts: int = 200):
         """ Randomly places the fleet of ships on the board.
+
+        Earlier ships can leave no legal spot for a later one, so the placement starts over on an
+        empty board when a ship cannot be placed within max_attempts tries.
+
+        Args:
+            max_attempts (int, optional): Random tries per ship before starting over. Defaults to 200.
         """
-        self.boats = []
-        for ship in SHIPS:
-            while True:
-                x = random.randint(0, BOARD_SIZE - 1)
-                y = random.randint(0, BOARD_SIZE - 1)
-                direction = random.choice(['H', 'V'])
-                if self.can_place_ship(x, y, direction, ship):
-                    positions = self.place_ship(x, y, direction, ship)
-                    self.boats.append({"value": str(ship), "positions": positions})
+        while True:
+            self.board = self.empty_board()
+            self.boats = []
+            for ship in SHIPS:
+                for _ in range(max_attempts):
+                    x = random.randint(0, BOARD_SIZE - 1)
+                    y = random.randint(0, BOARD_SIZE - 1)
+                    direction = random.choice(['H', 'V'])
+                    if self.can_place_ship(x, y, direction, ship):
+                        positions = self.place_ship(x, y, direction, ship)
+                        self.boats.append({"value": str(ship), "positions": positions})
+                        break
+                else:
                     break
+            if len(self.boats) == len(SHIPS):
+                return
 
     def can_place_ship(self, x, y, direction, ship):
         """ Checks if a ship can be placed on the board at the specified position and direction.
@@ -168,6 +180,80 @@ class Board:
             statuses.append({"ship": boat["value"], "sunk": sunk})
         return statuses
 
+    def sunk_boat_at(self, x, y):
+        """ Checks whether the boat occupying (x, y) has been sunk.
+
+        Args:
+            x (int): The row index of the cell.
+            y (int): The column index of the cell.
+
+        Returns:
+            int: The index of the boat in self.boats if it covers (x, y) and is sunk, None otherwise.
+        """
+        for idx, boat in enumerate(self.boats):
+            if (x, y) in boat["positions"]:
+                if all(self.board[i][j] == HIT for (i, j) in boat["positions"]):
+                    return idx
+                return None
+        return None
+
+    def copy(self):
+        """ Copies the board much faster than copy.deepcopy: the grid is copied, while the boats (which
+        shooting never modifies) are shared with the copy.
+
+        Returns:
+            Board: The copy.
+        """
+        board = Board.__new__(Board)
+        board.board = [row[:] for row in self.board]
+        board.boats = list(self.boats)
+        return board
+
+    def shot_masks(self):
+        """ Encodes the observable part of the board (the shots fired so far) as two bit masks.
+        Cell (x, y) is bit x * BOARD_SIZE + y.
+
+        Returns:
+            tuple: An int with the bits of the hit cells and an int with the bits of the missed cells.
+        """
+        hits = misses = 0
+        for i in range(BOARD_SIZE):
+            for j in range(BOARD_SIZE):
+                c = self.board[i][j]
+                if c == HIT:
+                    hits |= 1 << (i * BOARD_SIZE + j)
+                elif c == MISS:
+                    misses |= 1 << (i * BOARD_SIZE + j)
+        return hits, misses
+
+    def to_dict(self):
+        """ Converts the board to a JSON-serializable dictionary.
+
+        Returns:
+            dict: A dictionary containing the grid and the fleet of the board.
+        """
+        return {
+            "board": [row[:] for row in self.board],
+            "boats": [{"value": b["value"], "positions": [list(p) for p in b["positions"]]}
+                      for b in self.boats]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Rebuilds a board from the dictionary produced by to_dict.
+
+        Args:
+            data (dict): A dictionary containing the grid and the fleet of the board.
+
+        Returns:
+            Board: The restored board.
+        """
+        board = cls()
+        board.board = [row[:] for row in data["board"]]
+        board.boats = [{"value": b["value"], "positions": [tuple(p) for p in b["positions"]]}
+                       for b in data["boats"]]
+        return board
+
     def to_tensor(self):
         """ Converts the board state to a tensor representation.
 
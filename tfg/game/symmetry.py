@@ -0,0 +1,185 @@
+"""
+tfg.game.symmetry
+====================
+This module implements the 8 symmetries of the square board (the dihedral group: 4 rotations, each
+optionally preceded by a transposition). They map legal fleets to legal fleets and shots to shots,
+so a position and its 7 images are equivalent: the value of the shooter is the same, and the policy
+is the same up to moving the cells.
+
+Symmetry k is a permutation of the BOARD_SIZE**2 cells, PERMUTATIONS[k]: cell p of the transformed
+board is cell PERMUTATIONS[k][p] of the original board. The transforms work on board tensors and
+policies (for training augmentation, vectorized over batches) and on the shot masks of
+Board.shot_masks. canonical_masks picks one representative of the 8 images of a position, which is a
+key shared by all of them (for evaluation caches and transposition tables), together with the
+symmetry that maps the position to it.
+"""
+
+import numpy as np
+
+from tfg.game.board import Board, BOARD_SIZE
+
+N_SYMMETRIES = 8
+N_CELLS = BOARD_SIZE * BOARD_SIZE
+
+
+def _permutations():
+    cells = np.arange(N_CELLS).reshape(BOARD_SIZE, BOARD_SIZE)
+    return np.stack([np.rot90(cells.T if k >= 4 else cells, k % 4).reshape(-1)
+                     for k in range(N_SYMMETRIES)])
+
+
+PERMUTATIONS = _permutations()
+INVERSE = np.array([next(j for j in range(N_SYMMETRIES)
+                         if np.array_equal(PERMUTATIONS[k][PERMUTATIONS[j]], np.arange(N_CELLS)))
+                    for k in range(N_SYMMETRIES)])
+
+# DESTINATIONS[k][c]: the cell where symmetry k moves cell c
+DESTINATIONS = np.argsort(PERMUTATIONS, axis=1)
+
+# _MASK_TABLES[k][b][v]: the bits of byte b of a mask with value v, moved by symmetry k
+_N_BYTES = -(-N_CELLS // 8)
+_MASK_TABLES = []
+for _dest in DESTINATIONS:
+    _MASK_TABLES.append([[sum(1 << int(_dest[8 * b + bit]) for bit in range(8)
+                              if v >> bit & 1 and 8 * b + bit < N_CELLS) for v in range(256)]
+                         for b in range(_N_BYTES)])
+
+
+def transform_states(states, k):
+    """ Apply a symmetry to board tensors.
+
+    Args:
+        states (np.ndarray): Tensors of shape (..., BOARD_SIZE, BOARD_SIZE), e.g. (N, 3, 6, 6).
+        k (int): The symmetry.
+
+    Returns:
+        np.ndarray: The transformed tensors, same shape.
+    """
+    states = np.asarray(states)
+    flat = states.reshape(*states.shape[:-2], N_CELLS)
+    return flat[..., PERMUTATIONS[k]].reshape(states.shape)
+
+
+def transform_pi(pi, k):
+    """ Apply a symmetry to policies (or any per-cell vectors).
+
+    Args:
+        pi (np.ndarray): Policies of shape (..., BOARD_SIZE**2).
+        k (int): The symmetry.
+
+    Returns:
+        np.ndarray: The transformed policies, same shape.
+    """
+    return np.asarray(pi)[..., PERMUTATIONS[k]]
+
+
+def augment(states, pi, ks):
+    """ Apply one symmetry per sample to a batch.
+
+    Args:
+        states (np.ndarray): Board tensors of shape (N, C, BOARD_SIZE, BOARD_SIZE).
+        pi (np.ndarray): Policies of shape (N, BOARD_SIZE**2).
+        ks (np.ndarray): The symmetry of each sample, shape (N,).
+
+    Returns:
+        tuple: The transformed states and policies.
+    """
+    states = np.asarray(states)
+    perm = PERMUTATIONS[np.asarray(ks)]
+    flat = states.reshape(len(states), -1, N_CELLS)
+    out = np.take_along_axis(flat, perm[:, None, :], axis=2).reshape(states.shape)
+    return out, np.take_along_axis(np.asarray(pi), perm, axis=1)
+
+
+def transform_cell(x, y, k):
+    """ Apply a symmetry to a cell.
+
+    Args:
+        x (int): Row of the cell.
+        y (int): Column of the cell.
+        k (int): The symmetry.
+
+    Returns:
+        tuple: The (x, y) cell it is moved to.
+    """
+    return divmod(int(DESTINATIONS[k][x * BOARD_SIZE + y]), BOARD_SIZE)
+
+
+def transform_board(board: Board, k):
+    """ Apply a symmetry to a board: its grid and the positions of its fleet.
+
+    Args:
+        board (Board): The board.
+        k (int): The symmetry.
+
+    Returns:
+        Board: A transformed copy.
+    """
+    out = Board.__new__(Board)
+    cells = [c for row in board.board for c in row]
+    out.board = [[cells[PERMUTATIONS[k][i * BOARD_SIZE + j]] for j in range(BOARD_SIZE)]
+                 for i in range(BOARD_SIZE)]
+    out.boats = [{**boat, 'positions': [transform_cell(x, y, k) for x, y in boat['positions']]}
+                 for boat in board.boats]
+    return out
+
+
+def transform_mask(mask, k):
+    """ Apply a symmetry to a cell mask (cell (x, y) being bit x * BOARD_SIZE + y).
+
+    Args:
+        mask (int): The mask.
+        k (int): The symmetry.
+
+    Returns:
+        int: The transformed mask.
+    """
+    tables = _MASK_TABLES[k]
+    out = 0
+    for b in range(_N_BYTES):
+        out |= tables[b][mask >> (8 * b) & 0xFF]
+    return out
+
+
+def canonical_masks(hits, misses):
+    """ Canonical form of a position: the smallest (hits, misses) pair among its 8 images.
+
+    Args:
+        hits (int): Mask of the hit cells.
+        misses (int): Mask of the missed cells.
+
+    Returns:
+        tuple: The canonical (hits, misses) key and the symmetry k mapping the position to it (the
+            smallest one if several do). Policies computed on the canonical position map back to
+            the position with transform_pi(pi, INVERSE[k]).
+    """
+    best, best_k = (hits, misses), 0
+    for k in range(1, N_SYMMETRIES):
+        key = (transform_mask(hits, k), transform_mask(misses, k))
+        if key < best:
+            best, best_k = key, k
+    return best, best_k
+
+
+def canonical_masks_batch(hits, misses):
+    """ Vectorized canonical_masks.
+
+    Args:
+        hits (np.ndarray): Hit masks, uint64 of shape (N,).
+        misses (np.ndarray): Miss masks, uint64 of shape (N,).
+
+    Returns:
+        tuple: The canonical hit masks, the canonical miss masks (uint64, shape (N,)) and the
+            symmetry of each position (shape (N,)).
+    """
+    bits = np.uint64(1) << np.arange(N_CELLS, dtype=np.uint64)
+    h = (np.asarray(hits, dtype=np.uint64)[:, None] & bits) != 0
+    m = (np.asarray(misses, dtype=np.uint64)[:, None] & bits) != 0
+    pack = lambda cells: np.bitwise_or.reduce(np.where(cells, bits, np.uint64(0)), axis=-1)
+    all_h = np.stack([pack(h[:, perm]) for perm in PERMUTATIONS])   # (8, N)
+    all_m = np.stack([pack(m[:, perm]) for perm in PERMUTATIONS])
+    # smallest hits first, then smallest misses among those
+    tied = all_h == all_h.min(axis=0)
+    ks = np.argmin(np.where(tied, all_m, np.iinfo(np.uint64).max), axis=0)
+    cols = np.arange(len(ks))
+    return all_h[ks, cols], all_m[ks, cols], ks
@@ -0,0 +1,204 @@
+"""
+tfg.server.jobs
+===================
+This module implements a bounded background job queue used by the web application to run AI moves
+off the request thread. Jobs are identified by an id, can be polled (or long-polled) for their result,
+and receive a deadline so long searches can stop early and return the best move found so far.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is already at its maximum depth.
+    """
+
+
+class MoveJob:
+    """A unit of work submitted to the MoveJobQueue.
+
+        Attributes:
+            id (str): Unique identifier of the job.
+            status (str): One of 'queued', 'running', 'done' or 'failed'.
+            result (object): Value returned by the job function once done.
+            error (str): Error message if the job failed.
+            created (float): Monotonic time at which the job was submitted.
+            started (float): Monotonic time at which the job started running.
+            finished (float): Monotonic time at which the job finished.
+    """
+    def __init__(self, fn, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.fn = fn
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """ Block until the job has finished or the timeout expires.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait. Defaults to None (wait forever).
+
+        Returns:
+            bool: True if the job has finished, False if the wait timed out.
+        """
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        """ Convert the job to a JSON-serializable dictionary.
+
+        Returns:
+            dict: A dictionary containing the job id, status, result and error.
+        """
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error':  self.error
+        }
+
+
+class MoveJobQueue:
+    """Bounded worker pool that runs AI move jobs in the background.
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = 16,
+                 timeout: float = 10.0, retain: int = 256):
+        """ Initializes the job queue.
+
+        Args:
+            max_workers (int, optional): Number of worker threads. Defaults to 2.
+            max_pending (int, optional): Maximum number of queued or running jobs before new submissions
+                are rejected. Defaults to 16.
+            timeout (float, optional): Seconds a job may run before its deadline expires. Defaults to 10.0.
+            retain (int, optional): Number of finished jobs kept for polling. Defaults to 256.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retain = retain
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='ai-move')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, fn, job_id=None):
+        """ Submit a job to the queue.
+
+        The job function is called with a single argument, the monotonic deadline by which it should
+        return; searches use it to stop early and fall back to their best move so far.
+
+        Args:
+            fn (callable): Function taking a deadline (float) and returning a JSON-serializable result.
+            job_id (str, optional): Id to give the job, e.g. one already recorded elsewhere.
+                A random id is generated if None.
+
+        Raises:
+            QueueFullError: If the number of pending jobs has reached max_pending.
+
+        Returns:
+            MoveJob: The submitted job.
+        """
+        job = MoveJob(fn, job_id)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(f'AI queue is full ({self._pending} pending jobs).')
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """ Look up a job by id.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            MoveJob: The job, or None if it is unknown or has been evicted.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def full(self):
+        """ Check whether the queue is at its maximum depth.
+
+        Returns:
+            bool: True if new submissions would be rejected.
+        """
+        with self._lock:
+            return self._pending >= self.max_pending
+
+    def stats(self):
+        """ Return queue metrics.
+
+        Returns:
+            dict: Number of pending, completed, failed and rejected jobs plus the configured limits.
+        """
+        with self._lock:
+            return {
+                'pending':     self._pending,
+                'completed':   self._completed,
+                'failed':      self._failed,
+                'rejected':    self._rejected,
+                'max_pending': self.max_pending,
+                'max_workers': self.max_workers,
+                'timeout':     self.timeout
+            }
+
+    def shutdown(self, wait: bool = True):
+        """ Stop accepting jobs and shut down the worker threads.
+
+        Args:
+            wait (bool, optional): Whether to wait for running jobs to finish. Defaults to True.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job):
+        """ Execute a job on a worker thread and record its outcome.
+
+        Args:
+            job (MoveJob): The job to run.
+        """
+        job.started = time.monotonic()
+        job.status = 'running'
+        try:
+            job.result = job.fn(job.started + self.timeout)
+            job.status = 'done'
+        except Exception as exc:
+            job.error = str(exc)
+            job.status = 'failed'
+        job.finished = time.monotonic()
+        with self._lock:
+            self._pending -= 1
+            if job.status == 'done':
+                self._completed += 1
+            else:
+                self._failed += 1
+        job._done.set()
+
+    def _trim(self):
+        """ Evict the oldest finished jobs once more than `retain` jobs are tracked.
+        """
+        excess = len(self._jobs) - self.retain
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in ('done', 'failed'):
+                del self._jobs[job_id]
+                excess -= 1
@@ -0,0 +1,223 @@
+"""
+tfg.server.models
+====================
+This module defines the database models of the web application. Every finished game is stored as a
+GameResult row; alongside it, GameStatsRollup rows (one per game mode, winner and day) and
+DurationHistogram rows (one per game mode and duration bucket) are updated in the same transaction,
+so the statistics dashboard reads a handful of pre-aggregated rows however many games were played.
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+db = SQLAlchemy()
+
+# Durations are bucketed on a log scale: HIST_STEPS buckets per doubling, starting at HIST_BASE seconds,
+# so a percentile read from the histogram is within ~4% of the exact value
+HIST_BASE = 0.01
+HIST_STEPS = 8
+
+
+class GameResult(db.Model):
+    """GameResult represents a record of a completed game in the database.
+
+    Args:
+        db.Model: Inherits from SQLAlchemy's Model class to define a database model.
+    """
+    __tablename__ = 'game_results'
+    __table_args__ = (
+        db.Index('ix_game_results_mode_timestamp', 'game_mode', 'timestamp'),
+        db.Index('ix_game_results_mode_duration', 'game_mode', 'duration'),
+    )
+    id  = db.Column(db.Integer,   primary_key=True)
+    timestamp = db.Column(db.DateTime,  default=datetime.utcnow)
+    game_mode = db.Column(db.String(50), nullable=False)
+    winner = db.Column(db.String(50), nullable=False)
+    duration = db.Column(db.Float,     nullable=False)
+
+
+class GameStatsRollup(db.Model):
+    """Number of games and duration totals per game mode, winner and (UTC) day.
+
+    Args:
+        db.Model: Inherits from SQLAlchemy's Model class to define a database model.
+    """
+    __tablename__ = 'game_stats_rollup'
+    game_mode = db.Column(db.String(50), primary_key=True)
+    winner = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True)
+    games = db.Column(db.Integer, nullable=False, default=0)
+    duration_sum = db.Column(db.Float, nullable=False, default=0.0)
+    duration_min = db.Column(db.Float, nullable=False)
+    duration_max = db.Column(db.Float, nullable=False)
+
+
+class DurationHistogram(db.Model):
+    """Number of games per game mode and log-scale duration bucket (see duration_bucket).
+
+    Args:
+        db.Model: Inherits from SQLAlchemy's Model class to define a database model.
+    """
+    __tablename__ = 'game_duration_histogram'
+    game_mode = db.Column(db.String(50), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    games = db.Column(db.Integer, nullable=False, default=0)
+
+
+def duration_bucket(duration):
+    """ Get the histogram bucket of a game duration.
+
+    Args:
+        duration (float): Duration of the game in seconds.
+
+    Returns:
+        int: The bucket index (0 for durations up to HIST_BASE).
+    """
+    if duration <= HIST_BASE:
+        return 0
+    return int(math.floor(HIST_STEPS * math.log2(duration / HIST_BASE)))
+
+
+def bucket_value(bucket):
+    """ Get the representative duration of a histogram bucket (its geometric midpoint).
+
+    Args:
+        bucket (int): The bucket index.
+
+    Returns:
+        float: Duration in seconds.
+    """
+    return HIST_BASE * 2 ** ((bucket + 0.5) / HIST_STEPS)
+
+
+def _aggregate(results):
+    """ Aggregate game results into rollup and histogram increments.
+
+    Args:
+        results (list): Mappings with 'timestamp', 'game_mode', 'winner' and 'duration'.
+
+    Returns:
+        tuple: Rollup increments keyed by (game_mode, winner, day) as [games, sum, min, max], and
+            histogram increments keyed by (game_mode, bucket).
+    """
+    rollups, hist = {}, defaultdict(int)
+    for r in results:
+        d = r['duration']
+        key = (r['game_mode'], r['winner'], r['timestamp'].strftime('%Y-%m-%d'))
+        agg = rollups.get(key)
+        if agg is None:
+            rollups[key] = [1, d, d, d]
+        else:
+            agg[0] += 1
+            agg[1] += d
+            agg[2] = min(agg[2], d)
+            agg[3] = max(agg[3], d)
+        hist[(r['game_mode'], duration_bucket(d))] += 1
+    return rollups, hist
+
+
+def _apply_increments(conn, rollups, hist):
+    """ Add rollup and histogram increments to the stored rows, creating missing ones.
+
+    Args:
+        conn (Session | Connection): Where to execute the statements.
+        rollups (dict): Rollup increments, as returned by _aggregate.
+        hist (dict): Histogram increments, as returned by _aggregate.
+    """
+    table = GameStatsRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['game_mode', 'winner', 'day'],
+        set_={
+            'games':        table.c.games + stmt.excluded.games,
+            'duration_sum': table.c.duration_sum + stmt.excluded.duration_sum,
+            'duration_min': func.min(table.c.duration_min, stmt.excluded.duration_min),
+            'duration_max': func.max(table.c.duration_max, stmt.excluded.duration_max),
+        }
+    )
+    conn.execute(stmt, [
+        {'game_mode': mode, 'winner': winner, 'day': day, 'games': n,
+         'duration_sum': s, 'duration_min': lo, 'duration_max': hi}
+        for (mode, winner, day), (n, s, lo, hi) in rollups.items()
+    ])
+
+    table = DurationHistogram.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['game_mode', 'bucket'],
+        set_={'games': table.c.games + stmt.excluded.games}
+    )
+    conn.execute(stmt, [{'game_mode': mode, 'bucket': b, 'games': n} for (mode, b), n in hist.items()])
+
+
+def add_results(conn, results):
+    """ Insert finished games and fold them into the rollup and histogram rows.
+    Works with an ORM session or a Core connection; the caller commits.
+
+    Args:
+        conn (Session | Connection): Where to execute the statements.
+        results (list): Dictionaries with 'game_mode', 'winner', 'duration' and optionally 'timestamp'.
+    """
+    if not results:
+        return
+    rows = [{'timestamp': r.get('timestamp') or datetime.utcnow(), 'game_mode': r['game_mode'],
+             'winner': r['winner'], 'duration': float(r['duration'])} for r in results]
+    conn.execute(insert(GameResult.__table__), rows)
+    _apply_increments(conn, *_aggregate(rows))
+
+
+def rebuild_rollups(conn, chunk: int = 10000):
+    """ Recompute the rollup and histogram rows from the raw game results.
+
+    Args:
+        conn (Session | Connection): Where to execute the statements.
+        chunk (int, optional): Number of results read per batch. Defaults to 10000.
+    """
+    conn.execute(GameStatsRollup.__table__.delete())
+    conn.execute(DurationHistogram.__table__.delete())
+    t = GameResult.__table__
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            t.select().where(t.c.id > last_id).order_by(t.c.id).limit(chunk)
+        ).mappings().all()
+        if not batch:
+            break
+        last_id = batch[-1]['id']
+        rows = [{**r, 'timestamp': r['timestamp'] or datetime.utcnow()} for r in batch]
+        _apply_increments(conn, *_aggregate(rows))
+
+
+def prepare_database(engine):
+    """ Bring a results database up to date: create missing tables and indexes, and backfill the
+    rollups of a database created before they existed. Needs no Flask app, so batch tools can write
+    results through a plain engine.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of the results database.
+    """
+    db.metadata.create_all(engine)
+    # create_all does not add new indexes to tables that already exist
+    for index in GameResult.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        has_rollups = conn.execute(select(GameStatsRollup.game_mode).limit(1)).first() is not None
+        has_results = conn.execute(select(GameResult.id).limit(1)).first() is not None
+        if has_results and not has_rollups:
+            rebuild_rollups(conn)
+
+
+def init_db(app):
+    """ Bind the models to a Flask app and bring its database up to date (see prepare_database).
+
+    Args:
+        app (Flask): The Flask application.
+    """
+    db.init_app(app)
+    with app.app_context():
+        prepare_database(db.engine)
@@ -0,0 +1,208 @@
+"""
+tfg.server.result_writer
+===========================
+This module implements a write-behind recorder for finished games. Results are queued in memory and a
+background thread writes them in batched transactions (together with their rollups, see
+tfg.server.models.add_results) once enough of them are waiting or a time threshold has passed, so
+recording a game never blocks the request or simulation that finished it on a disk sync.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+
+from tfg.server.models import add_results
+
+log = logging.getLogger(__name__)
+
+
+def use_wal(engine):
+    """ Switch a SQLite database to WAL journaling and relax per-commit syncs on every connection of
+    an engine. With WAL, readers (e.g. /stats) are not blocked by the writer, and 'synchronous=NORMAL'
+    only syncs at checkpoints while remaining safe against corruption.
+
+    Args:
+        engine (Engine): A SQLAlchemy engine bound to a SQLite database.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    def set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.execute('PRAGMA synchronous=NORMAL')
+        cur.close()
+
+    if not event.contains(engine, 'connect', set_pragmas):
+        event.listen(engine, 'connect', set_pragmas)
+    # connections opened before the listener was added keep their settings until recycled
+    engine.dispose()
+
+
+class ResultWriter:
+    """Queues game results and writes them to the database in batches on a background thread.
+    """
+    def __init__(self, engine, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_queued: int = 100000, wal: bool = True):
+        """ Initializes the writer and starts its thread.
+
+        Args:
+            engine (Engine): SQLAlchemy engine of the results database.
+            batch_size (int, optional): Number of queued results that triggers a flush. Defaults to 500.
+            flush_interval (float, optional): Maximum seconds a result waits in the queue. Defaults to 1.0.
+            max_queued (int, optional): Queue length at which record() blocks until the writer catches
+                up. Defaults to 100000.
+            wal (bool, optional): Whether to switch the database to WAL mode. Defaults to True.
+        """
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        if wal:
+            use_wal(engine)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+        self._flush_seconds = 0.0
+        self._oldest = 0.0
+        self._flush_requested = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='result-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, game_mode, winner, duration, timestamp=None):
+        """ Queue the result of a finished game.
+
+        Args:
+            game_mode (str): The game mode.
+            winner (str): The label of the winning player.
+            duration (float): Duration of the game in seconds.
+            timestamp (datetime, optional): When the game finished. Defaults to now (UTC).
+        """
+        row = {'game_mode': game_mode, 'winner': winner, 'duration': duration,
+               'timestamp': timestamp or datetime.utcnow()}
+        with self._cond:
+            if self._closed:
+                # the thread is gone; write synchronously rather than lose the result
+                with self.engine.begin() as conn:
+                    add_results(conn, [row])
+                self._enqueued += 1
+                self._written += 1
+                return
+            while len(self._queue) >= self.max_queued and not self._closed:
+                self._cond.wait()
+            self._queue.append(row)
+            self._enqueued += 1
+            if len(self._queue) == 1:
+                # start the flush_interval clock of this batch
+                self._oldest = time.monotonic()
+                self._cond.notify_all()
+            elif len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """ Block until every result queued so far has been written.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: True if the results were written, False if the wait timed out.
+        """
+        with self._cond:
+            target = self._enqueued
+            if self._written >= target:
+                # nothing queued: don't wake the writer
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: self._written >= target or not self._thread.is_alive(), timeout)
+
+    def close(self):
+        """ Write the remaining results and stop the writer thread.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        """ Return writer metrics.
+
+        Returns:
+            dict: Results queued, written, number of batches, failed flushes and average flush time.
+        """
+        with self._cond:
+            return {
+                'queued':        len(self._queue),
+                'written':       self._written,
+                'batches':       self._batches,
+                'errors':        self._errors,
+                'avg_flush_ms':  1000.0 * self._flush_seconds / self._batches if self._batches else 0.0
+            }
+
+    def _run(self):
+        """ Writer thread: flush when a batch is full, the oldest result has waited flush_interval,
+        flush() was called or the writer is closing.
+        """
+        while True:
+            with self._cond:
+                while not (self._closed or len(self._queue) >= self.batch_size
+                           or self._queue and self._flush_requested):
+                    if not self._queue:
+                        self._cond.wait()
+                        continue
+                    remaining = self._oldest + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._queue:
+                    # closing with nothing left to write
+                    self._cond.notify_all()
+                    return
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                self._oldest = time.monotonic()
+                if not self._queue:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+            start = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    add_results(conn, batch)
+            except Exception:
+                log.exception('Failed to write %d game results; retrying', len(batch))
+                with self._cond:
+                    self._errors += 1
+                    if self._closed:
+                        # give up instead of retrying forever on a broken database at exit
+                        self._queue.clear()
+                        self._cond.notify_all()
+                        return
+                    self._queue.extendleft(reversed(batch))
+                time.sleep(self.flush_interval)
+                continue
+            with self._cond:
+                self._written += len(batch)
+                self._batches += 1
+                self._flush_seconds += time.perf_counter() - start
+                self._cond.notify_all()
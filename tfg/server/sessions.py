@@ -0,0 +1,332 @@
+"""
+tfg.server.sessions
+======================
+This module implements per-game session state for the web application. Each GameSession holds its own
+boards, turn flags and search trees, and the SessionStore keeps them keyed by game id with LRU and
+idle-timeout eviction under a memory cap.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from tfg.game.board import Board, SHIPS
+from tfg.algorithms.mcts import Node
+
+# Rough per-object sizes used to estimate a session's memory footprint
+SESSION_BYTES = 8 * 1024
+NODE_BYTES = 2 * 1024
+
+# Seconds after which an AI job that never reported back (e.g. its worker died) stops blocking the game
+PENDING_TTL = 120.0
+
+# Attributes of a GameSession that are persisted as-is by to_state
+_STATE_FIELDS = ('user_turn', 'game_over', 'message', 'game_mode', 'boat_placement', 'current_turn',
+                 'manual_phase', 'placement_index', 'start_time', 'pending_job_id', 'pending_since',
+                 'epoch')
+
+
+class GameSession:
+    """State of a single game hosted by the web application.
+
+        Attributes:
+            game_id (str): Identifier of the game.
+            vanilla_mcts (MCTS): This game's MCTS bot (its tree is reused between moves).
+            ml_mcts (NeuralMCTS): This game's ML-MCTS bot.
+            user_board (Board): Board of the user (or of MCTS in MCTS vs ML-MCTS mode).
+            pc_board (Board): Board of the PC (or of ML-MCTS in MCTS vs ML-MCTS mode).
+            game_mode (str): 'uservsmcts' or 'mcts_vs_ml_mcts'.
+            boat_placement (str): 'random' or 'manual'.
+            pending_job_id (str): Id of the AI job currently playing for this game, if any.
+            pending_since (float): Wall-clock time at which that job was submitted.
+            epoch (int): Counter incremented on every new game to invalidate jobs of older games.
+            version (int): Version of the stored state this session was loaded from (0 if never saved).
+            lock (threading.RLock): Serializes requests that mutate this session.
+            last_access (float): Monotonic time of the last request for this game.
+            footprint (int): Estimated memory footprint in bytes.
+    """
+    def __init__(self, game_id, vanilla_mcts, ml_mcts):
+        self.game_id = game_id
+        self.vanilla_mcts = vanilla_mcts
+        self.ml_mcts = ml_mcts
+
+        self.user_board = None
+        self.pc_board = None
+        self.user_turn = True
+        self.game_over = False
+        self.message = ''
+
+        self.game_mode = "uservsmcts"
+        self.boat_placement = "random"
+        self.current_turn = "player1"
+
+        self.manual_phase = False
+        self.placement_index = 0
+        self.start_time = None
+
+        self.pending_job_id = None
+        self.pending_since = None
+        self.epoch = 0
+        self.version = 0
+        self.lock = threading.RLock()
+        self.last_access = time.monotonic()
+        self.footprint = SESSION_BYTES
+
+    def init_game(self):
+        """ Initialize the game state for a new match.
+        """
+        self.epoch += 1
+        self.set_pending(None)
+        self.vanilla_mcts.root = None  # Reset MCTS tree
+        self.vanilla_mcts.last_root = None
+        self.ml_mcts.root = None
+        self.user_board = Board()
+        self.pc_board   = Board()
+
+        if self.boat_placement == "random":
+            self.user_board.place_fleet()
+            self.pc_board.place_fleet()
+            self.manual_phase = False
+        else:
+            self.manual_phase    = True
+            self.placement_index = 0
+            self.pc_board.place_fleet()
+
+        if self.game_mode == "mcts_vs_ml_mcts":
+            self.user_turn    = False
+            self.current_turn = "player1"
+            self.message      = 'MCTS vs ML-MCTS in progress.'
+        else:
+            self.user_turn = True
+            if self.manual_phase:
+                self.message = f'Place your boat of length {SHIPS[self.placement_index]}.'
+            else:
+                self.message = 'Game started. Your move!'
+
+        self.game_over  = False
+        self.start_time = time.time()
+
+    def mask_board(self, board):
+        """ Mask the board for display, hiding unshot cells unless game is over or in MCTS vs ML-MCTS mode.
+
+        Args:
+            board (list): The game board represented as a 2D list.
+
+        Returns:
+            list: A masked version of the board where unshot cells are replaced with '?'.
+        """
+        masked = []
+        for row in board:
+            new = []
+            for c in row:
+                if self.game_mode == "mcts_vs_ml_mcts" or self.game_over:
+                    new.append(c)
+                else:
+                    new.append(c if c in ['X','O'] else '?')
+            masked.append(new)
+        return masked
+
+    def set_pending(self, job_id):
+        """ Mark an AI job as playing for this game, or clear the mark.
+
+        Args:
+            job_id (str): Id of the submitted job, or None once it has finished.
+        """
+        self.pending_job_id = job_id
+        self.pending_since = time.time() if job_id else None
+
+    def ai_busy(self):
+        """ Check whether an AI job is still playing for this game.
+
+        Returns:
+            bool: True if a submitted AI job has not finished yet.
+        """
+        return (self.pending_job_id is not None
+                and time.time() - self.pending_since < PENDING_TTL)
+
+    def to_state(self):
+        """ Convert the session to a JSON-serializable dictionary that other processes can restore.
+        The MCTS tree is stored in the compact columnar form of Node.to_columns. The ML-MCTS tree is
+        rebuilt from scratch on every move and is therefore not persisted.
+
+        Returns:
+            dict: The serialized game state.
+        """
+        state = {name: getattr(self, name) for name in _STATE_FIELDS}
+        state['user_board'] = self.user_board.to_dict() if self.user_board else None
+        state['pc_board'] = self.pc_board.to_dict() if self.pc_board else None
+        root = self.vanilla_mcts.root
+        state['tree'] = None if root is None else {
+            'state':   root.state.to_dict(),
+            'columns': root.to_columns(),
+            'heatmap': self.vanilla_mcts.heatmap
+        }
+        return state
+
+    def restore(self, state):
+        """ Load a state produced by to_state into this session.
+
+        Args:
+            state (dict): The serialized game state.
+        """
+        for name in _STATE_FIELDS:
+            setattr(self, name, state[name])
+        self.user_board = Board.from_dict(state['user_board']) if state['user_board'] else None
+        self.pc_board = Board.from_dict(state['pc_board']) if state['pc_board'] else None
+        tree = state['tree']
+        self.vanilla_mcts.last_root = None
+        if tree is None:
+            self.vanilla_mcts.root = None
+        else:
+            self.vanilla_mcts.heatmap = tree['heatmap']
+            self.vanilla_mcts.root = Node.from_columns(Board.from_dict(tree['state']),
+                                                       tree['columns'], heatmap=tree['heatmap'])
+        self.ml_mcts.root = None
+
+    def tree_size(self):
+        """ Count the nodes held by this game's search trees.
+
+        Returns:
+            int: Total number of nodes in the MCTS and ML-MCTS trees.
+        """
+        total = 0
+        # the last search root, when kept, contains the current MCTS root
+        mcts_root = self.vanilla_mcts.last_root or self.vanilla_mcts.root
+        for root in (mcts_root, getattr(self.ml_mcts, 'root', None)):
+            stack = [root] if root is not None else []
+            while stack:
+                node = stack.pop()
+                total += 1
+                stack.extend(node.children)
+        return total
+
+    def update_footprint(self):
+        """ Recompute the estimated memory footprint of this session.
+
+        Returns:
+            int: The estimated footprint in bytes.
+        """
+        self.footprint = SESSION_BYTES + NODE_BYTES * self.tree_size()
+        return self.footprint
+
+
+class SessionStore:
+    """In-process store of GameSession objects with LRU/idle-timeout eviction and a memory cap.
+    """
+    def __init__(self, session_factory, max_sessions: int = 500,
+                 idle_timeout: float = 1800.0, max_bytes: int = 256 * 1024 * 1024):
+        """ Initializes the session store.
+
+        Args:
+            session_factory (callable): Function taking a game id and returning a new GameSession.
+            max_sessions (int, optional): Maximum number of sessions kept. Defaults to 500.
+            idle_timeout (float, optional): Seconds without requests after which a session is evicted.
+                Defaults to 1800.0.
+            max_bytes (int, optional): Cap on the estimated memory footprint of all sessions.
+                Defaults to 256 MiB.
+        """
+        self.session_factory = session_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._evicted = 0
+
+    def get(self, game_id):
+        """ Look up a session and mark it as recently used.
+
+        Args:
+            game_id (str): The id of the game.
+
+        Returns:
+            GameSession: The session, or None if it does not exist (or was evicted).
+        """
+        with self._lock:
+            game = self._sessions.get(game_id)
+            if game is not None:
+                self._sessions.move_to_end(game_id)
+                game.last_access = time.monotonic()
+            return game
+
+    def get_or_create(self, game_id=None):
+        """ Look up a session, creating it if needed.
+
+        Args:
+            game_id (str, optional): The id of the game. A new id is generated if None.
+
+        Returns:
+            GameSession: The existing or newly created session.
+        """
+        game_id = game_id or uuid.uuid4().hex
+        game = self.get(game_id)
+        if game is not None:
+            return game
+        game = self.session_factory(game_id)
+        with self._lock:
+            game = self._sessions.setdefault(game_id, game)
+            self._sessions.move_to_end(game_id)
+            self._evict(keep=game_id)
+        return game
+
+    def touch(self, game):
+        """ Refresh a session's footprint after a request and enforce the store limits.
+
+        Args:
+            game (GameSession): The session that was just used.
+        """
+        game.update_footprint()
+        with self._lock:
+            self._evict(keep=game.game_id)
+
+    def discard(self, game_id):
+        """ Remove a session from the store.
+
+        Args:
+            game_id (str): The id of the game.
+        """
+        with self._lock:
+            self._sessions.pop(game_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self):
+        """ Return store metrics.
+
+        Returns:
+            dict: Number of sessions, estimated bytes in use, evictions and the configured limits.
+        """
+        with self._lock:
+            return {
+                'sessions':     len(self._sessions),
+                'bytes':        sum(g.footprint for g in self._sessions.values()),
+                'evicted':      self._evicted,
+                'max_sessions': self.max_sessions,
+                'max_bytes':    self.max_bytes
+            }
+
+    def _evict(self, keep=None):
+        """ Evict idle sessions, then least recently used ones until the store is within its limits.
+        Sessions with a running AI job are never evicted. Must be called with the store lock held.
+
+        Args:
+            keep (str, optional): Id of a session that must not be evicted.
+        """
+        now = time.monotonic()
+        for game_id, game in list(self._sessions.items()):
+            if game_id != keep and not game.ai_busy() and now - game.last_access > self.idle_timeout:
+                del self._sessions[game_id]
+                self._evicted += 1
+
+        total = sum(g.footprint for g in self._sessions.values())
+        for game_id, game in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions and total <= self.max_bytes:
+                break
+            if game_id == keep or game.ai_busy():
+                continue
+            del self._sessions[game_id]
+            total -= game.footprint
+            self._evicted += 1
@@ -0,0 +1,250 @@
+"""
+tfg.server.state_store
+=========================
+This module defines the pluggable game-state backends of the web application. The in-memory backend
+keeps live GameSession objects in a SessionStore and is the default. The SQLite backend stores each
+game as a compressed serialized state with a version number, so several worker processes can share
+games; writes use optimistic versioning and stale writes are rejected with StaleWriteError.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+
+class StaleWriteError(Exception):
+    """Raised when a game is saved from a version that is no longer the latest stored one.
+    """
+
+
+def make_store(url, session_factory, max_sessions: int = 500, idle_timeout: float = 1800.0,
+               max_bytes: int = 256 * 1024 * 1024):
+    """ Build a game-state backend from a URL.
+
+    Args:
+        url (str): 'memory' for the in-process backend or 'sqlite:///<path>' for the shared SQLite one.
+        session_factory (callable): Function taking a game id and returning a new GameSession.
+        max_sessions (int, optional): Maximum number of in-memory games. Defaults to 500.
+        idle_timeout (float, optional): Seconds of inactivity after which a game is dropped.
+            Defaults to 1800.0.
+        max_bytes (int, optional): Cap on the estimated footprint of in-memory games. Defaults to 256 MiB.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+
+    Returns:
+        MemoryGameStore | SQLiteGameStore: The configured backend.
+    """
+    if url in (None, '', 'memory'):
+        from tfg.server.sessions import SessionStore
+        return MemoryGameStore(SessionStore(session_factory, max_sessions=max_sessions,
+                                            idle_timeout=idle_timeout, max_bytes=max_bytes))
+    if url.startswith('sqlite:///'):
+        return SQLiteGameStore(url[len('sqlite:///'):], session_factory, idle_timeout=idle_timeout)
+    raise ValueError(f'Unsupported game store: {url}')
+
+
+class MemoryGameStore:
+    """Game-state backend keeping live GameSession objects in this process.
+
+    Sessions are shared between requests and jobs of the same process, so concurrent updates are
+    serialized with each session's lock; saving only bumps the version.
+    """
+    def __init__(self, sessions):
+        """ Initializes the backend.
+
+        Args:
+            sessions (SessionStore): Store holding the sessions.
+        """
+        self.sessions = sessions
+
+    def load(self, game_id):
+        """ Load a game.
+
+        Args:
+            game_id (str): The id of the game.
+
+        Returns:
+            GameSession: The game, or None if it does not exist.
+        """
+        return self.sessions.get(game_id) if game_id else None
+
+    def create(self, game_id=None):
+        """ Create a new, not yet saved, game.
+
+        Args:
+            game_id (str, optional): The id of the game. A new id is generated if None.
+
+        Returns:
+            GameSession: The new game.
+        """
+        return self.sessions.get_or_create(game_id)
+
+    def save(self, game):
+        """ Save a game and enforce the store limits.
+
+        Args:
+            game (GameSession): The game to save.
+        """
+        game.version += 1
+        self.sessions.touch(game)
+
+    def delete(self, game_id):
+        """ Delete a game.
+
+        Args:
+            game_id (str): The id of the game.
+        """
+        self.sessions.discard(game_id)
+
+    def stats(self):
+        """ Return backend metrics.
+
+        Returns:
+            dict: The metrics of the underlying SessionStore.
+        """
+        return {'backend': 'memory', **self.sessions.stats()}
+
+
+class SQLiteGameStore:
+    """Game-state backend storing serialized games in a SQLite database shared by worker processes.
+    """
+    def __init__(self, path, session_factory, idle_timeout: float = 1800.0, timeout: float = 5.0):
+        """ Initializes the backend, creating the table if needed.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            session_factory (callable): Function taking a game id and returning a new GameSession.
+            idle_timeout (float, optional): Seconds without writes after which a game is purged.
+                Defaults to 1800.0.
+            timeout (float, optional): Seconds to wait for a database lock. Defaults to 5.0.
+        """
+        self.path = path
+        self.session_factory = session_factory
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._local = threading.local()
+        self._stale = 0
+        self._last_purge = 0.0
+        with self._conn() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS game_states ('
+                ' game_id TEXT PRIMARY KEY,'
+                ' version INTEGER NOT NULL,'
+                ' payload BLOB NOT NULL,'
+                ' updated REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_game_states_updated ON game_states (updated)')
+
+    def _conn(self):
+        """ Get the SQLite connection of the calling thread.
+
+        Returns:
+            sqlite3.Connection: The connection.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def load(self, game_id):
+        """ Load a game.
+
+        Args:
+            game_id (str): The id of the game.
+
+        Returns:
+            GameSession: A private copy of the game, or None if it does not exist.
+        """
+        if not game_id:
+            return None
+        row = self._conn().execute(
+            'SELECT version, payload FROM game_states WHERE game_id = ?', (game_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        game = self.session_factory(game_id)
+        game.restore(json.loads(zlib.decompress(row[1])))
+        game.version = row[0]
+        return game
+
+    def create(self, game_id=None):
+        """ Create a new, not yet saved, game.
+
+        Args:
+            game_id (str, optional): The id of the game. A new id is generated if None.
+
+        Returns:
+            GameSession: The new game.
+        """
+        return self.session_factory(game_id or uuid.uuid4().hex)
+
+    def save(self, game):
+        """ Save a game if nobody saved a newer version since it was loaded.
+
+        Args:
+            game (GameSession): The game to save.
+
+        Raises:
+            StaleWriteError: If the stored version is not the one the game was loaded from.
+        """
+        payload = zlib.compress(json.dumps(game.to_state()).encode())
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            if game.version == 0:
+                cur = conn.execute(
+                    'INSERT OR IGNORE INTO game_states (game_id, version, payload, updated) '
+                    'VALUES (?, 1, ?, ?)', (game.game_id, payload, now)
+                )
+            else:
+                cur = conn.execute(
+                    'UPDATE game_states SET version = version + 1, payload = ?, updated = ? '
+                    'WHERE game_id = ? AND version = ?', (payload, now, game.game_id, game.version)
+                )
+        if cur.rowcount != 1:
+            self._stale += 1
+            raise StaleWriteError(f'Game {game.game_id} was modified concurrently.')
+        game.version += 1
+        if now - self._last_purge > 60.0:
+            self.purge(now - self.idle_timeout)
+
+    def delete(self, game_id):
+        """ Delete a game.
+
+        Args:
+            game_id (str): The id of the game.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM game_states WHERE game_id = ?', (game_id,))
+
+    def purge(self, before):
+        """ Delete games that have not been written since the given time.
+
+        Args:
+            before (float): Wall-clock time; games last saved before it are deleted.
+
+        Returns:
+            int: Number of deleted games.
+        """
+        self._last_purge = time.time()
+        conn = self._conn()
+        with conn:
+            return conn.execute('DELETE FROM game_states WHERE updated < ?', (before,)).rowcount
+
+    def stats(self):
+        """ Return backend metrics.
+
+        Returns:
+            dict: Number of stored games, their total payload size and the stale writes rejected here.
+        """
+        count, size = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM game_states'
+        ).fetchone()
+        return {'backend': 'sqlite', 'sessions': count, 'bytes': size, 'stale_writes': self._stale}
@@ -0,0 +1,168 @@
+"""
+tfg.server.stats
+===================
+This module implements the statistics queries of the web application. Dashboard aggregates (win
+counts, average durations, duration percentiles and time-bucketed series) are read from the rollup and
+histogram tables maintained by tfg.server.models, so their cost does not grow with the number of
+recorded games. Raw results are served page by page with keyset pagination.
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import func, select, tuple_
+
+from tfg.server.models import GameResult, GameStatsRollup, DurationHistogram, bucket_value
+
+GAME_MODES = ('uservsmcts', 'mcts_vs_ml_mcts')
+PERCENTILES = (50, 90, 99)
+
+# SQL expressions grouping a rollup day ('YYYY-MM-DD') into a series period
+_PERIODS = {
+    'day':   lambda day: day,
+    'week':  lambda day: func.strftime('%Y-W%W', day),
+    'month': lambda day: func.substr(day, 1, 7),
+}
+
+
+def summary(conn, bucket: str = 'day', percentiles=PERCENTILES):
+    """ Compute the dashboard aggregates of every game mode.
+
+    Args:
+        conn (Session | Connection): Where to execute the queries.
+        bucket (str, optional): Period of the time series: 'day', 'week' or 'month'. Defaults to 'day'.
+        percentiles (tuple, optional): Duration percentiles to estimate. Defaults to (50, 90, 99).
+
+    Raises:
+        ValueError: If the bucket is not supported.
+
+    Returns:
+        dict: For each game mode, the total number of games, 'wins' and 'avg_duration' per winner,
+            overall 'duration' figures (avg, min, max and the requested percentiles) and the 'series'
+            of games and wins per period, oldest first.
+    """
+    if bucket not in _PERIODS:
+        raise ValueError(f'Unsupported bucket: {bucket}')
+    out = defaultdict(lambda: {'total': 0, 'wins': {}, 'avg_duration': {}, 'duration': {}, 'series': []})
+    for mode in GAME_MODES:
+        out[mode]
+    r = GameStatsRollup.__table__.c
+
+    totals = defaultdict(lambda: [0, 0.0, None, None])
+    for mode, winner, games, dur_sum, dur_min, dur_max in conn.execute(
+        select(r.game_mode, r.winner, func.sum(r.games), func.sum(r.duration_sum),
+               func.min(r.duration_min), func.max(r.duration_max))
+        .group_by(r.game_mode, r.winner)
+    ):
+        entry = out[mode]
+        entry['total'] += games
+        entry['wins'][winner] = games
+        entry['avg_duration'][winner] = dur_sum / games
+        t = totals[mode]
+        t[0] += games
+        t[1] += dur_sum
+        t[2] = dur_min if t[2] is None else min(t[2], dur_min)
+        t[3] = dur_max if t[3] is None else max(t[3], dur_max)
+
+    for mode, (games, dur_sum, dur_min, dur_max) in totals.items():
+        out[mode]['duration'] = {'avg': dur_sum / games, 'min': dur_min, 'max': dur_max}
+
+    h = DurationHistogram.__table__.c
+    hist = defaultdict(list)
+    for mode, b, games in conn.execute(
+        select(h.game_mode, h.bucket, h.games).order_by(h.game_mode, h.bucket)
+    ):
+        hist[mode].append((b, games))
+    for mode, buckets in hist.items():
+        duration = out[mode]['duration']
+        if not duration:
+            continue
+        for p in percentiles:
+            duration[f'p{p}'] = _percentile(buckets, p, duration['min'], duration['max'])
+
+    period = _PERIODS[bucket](r.day).label('period')
+    series = {}
+    for mode, per, winner, games in conn.execute(
+        select(r.game_mode, period, r.winner, func.sum(r.games))
+        .group_by(r.game_mode, period, r.winner)
+        .order_by(r.game_mode, period)
+    ):
+        point = series.get((mode, per))
+        if point is None:
+            point = series[(mode, per)] = {'period': per, 'games': 0, 'wins': {}}
+            out[mode]['series'].append(point)
+        point['games'] += games
+        point['wins'][winner] = games
+    return dict(out)
+
+
+def _percentile(buckets, p, lo, hi):
+    """ Estimate a percentile from histogram buckets.
+
+    Args:
+        buckets (list): (bucket, games) pairs ordered by bucket.
+        p (float): The percentile, between 0 and 100.
+        lo (float): Smallest recorded duration, used to clamp the estimate.
+        hi (float): Largest recorded duration, used to clamp the estimate.
+
+    Returns:
+        float: The estimated duration in seconds.
+    """
+    total = sum(n for _, n in buckets)
+    rank = p / 100.0 * total
+    seen = 0
+    for b, n in buckets:
+        seen += n
+        if seen >= rank:
+            return min(max(bucket_value(b), lo), hi)
+    return hi
+
+
+def history(conn, game_mode, limit: int = 50, before=None):
+    """ Get one page of raw game results, newest first.
+
+    Args:
+        conn (Session | Connection): Where to execute the queries.
+        game_mode (str): The game mode to list.
+        limit (int, optional): Maximum number of results. Defaults to 50.
+        before (int, optional): Id of the last result of the previous page. Defaults to None (first page).
+
+    Returns:
+        dict: 'rows' (id, timestamp, winner and duration of each game) and 'next', the cursor of the
+            following page or None once the history is exhausted.
+    """
+    t = GameResult.__table__.c
+    query = select(t.id, t.timestamp, t.winner, t.duration).where(t.game_mode == game_mode)
+    if before is not None:
+        anchor = conn.execute(select(t.timestamp, t.id).where(t.id == before)).first()
+        if anchor is None:
+            return {'rows': [], 'next': None}
+        query = query.where(tuple_(t.timestamp, t.id) < tuple(anchor))
+    rows = conn.execute(query.order_by(t.timestamp.desc(), t.id.desc()).limit(limit + 1)).all()
+
+    page = [{'id': i, 'timestamp': ts.isoformat() if ts else None, 'winner': w, 'duration': d}
+            for i, ts, w, d in rows[:limit]]
+    return {'rows': page, 'next': page[-1]['id'] if len(rows) > limit else None}
+
+
+def iter_results(conn, chunk: int = 5000):
+    """ Iterate over every recorded game in insertion order, reading them in chunks.
+
+    Args:
+        conn (Session | Connection): Where to execute the queries.
+        chunk (int, optional): Number of results read per query. Defaults to 5000.
+
+    Yields:
+        tuple: The game mode, winner, duration and timestamp of each game.
+    """
+    t = GameResult.__table__.c
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(t.id, t.game_mode, t.winner, t.duration, t.timestamp)
+            .where(t.id > last_id).order_by(t.id).limit(chunk)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        for _, mode, winner, duration, ts in rows:
+            yield mode, winner, duration, ts
@@ -5,12 +5,25 @@ This script trains a neural network model for the Battleship game using self-pla
 
 """
 
+import argparse
 import json
+import multiprocessing as mp
+import os
+import random
+import socket
+import time
+import numpy as np
 import torch 
+import torch.distributed as dist
 import torch.nn.functional as F
-from torch.utils.data import Dataset, DataLoader, random_split
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import Dataset, IterableDataset, DataLoader, Sampler, get_worker_info
 from torch.optim.lr_scheduler import ReduceLROnPlateau
-from tfg.ai.network import GameNet
+from tfg.ai.network import GameNet, DEFAULT_CHANNELS, DEFAULT_VALUE_HIDDEN
+from tfg.ai.checkpoint import atomic_save, save_checkpoint, load_checkpoint
+from tfg.data.binary import BinaryRecords, INDEX_FILE
+from tfg.data.stream import ShardStream, decode
+from tfg.game.symmetry import N_SYMMETRIES, PERMUTATIONS
 
 class GameDataset(Dataset):
     """GameDataset is a PyTorch Dataset for loading Battleship game records from a JSONL file.
@@ -53,6 +66,370 @@ class GameDataset(Dataset):
         z  = torch.tensor(rec['z'],     dtype=torch.float32)
         return x, pi, z
 
+class BinaryGameDataset(Dataset):
+    """BinaryGameDataset is a GameDataset reading the binary format of tfg.data.binary. The records stay
+    memory-mapped on disk, and batches are gathered and expanded from their masks at once (the
+    DataLoader calls __getitems__ with the indices of a whole batch; use collate as its collate_fn).
+
+    Args:
+        path (str): Path to the dataset directory (or its index.json).
+    """
+    def __init__(self, path):
+        """ Initializes the dataset by opening the binary records.
+
+        Args:
+            path (str): Path to the dataset directory (or its index.json).
+        """
+        self.records = BinaryRecords(path)
+
+    def __len__(self):
+        """ Returns the number of records in the dataset.
+
+        Returns:
+            int: The number of records in the dataset.
+        """
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        """ Retrieves a single record from the dataset by index.
+
+        Args:
+            idx (int): Index of the record to retrieve.
+
+        Returns:
+            tuple: The state (3, 6, 6), policy (36,) and outcome tensors of the record.
+        """
+        x, pi, z = self.__getitems__([idx])
+        return x[0], pi[0], z[0]
+
+    def __getitems__(self, indices):
+        """ Retrieves a batch of records.
+
+        Args:
+            indices (list): Indices of the records.
+
+        Returns:
+            tuple: The states (N, 3, 6, 6), policies (N, 36) and outcomes (N,) as tensors.
+        """
+        x, pi, z = self.records.get(indices)
+        return torch.from_numpy(x), torch.from_numpy(pi), torch.from_numpy(z)
+
+    @staticmethod
+    def collate(batch):
+        """ Collate function for a DataLoader: batches come out of __getitems__ already stacked.
+
+        Args:
+            batch (tuple): The batch built by __getitems__.
+
+        Returns:
+            tuple: The same batch.
+        """
+        return batch
+
+class TensorGameDataset(Dataset):
+    """TensorGameDataset holds a whole dataset as tensors, built once, so a batch is a single
+    index operation per tensor (the DataLoader calls __getitems__ with the indices of a whole batch;
+    use collate as its collate_fn, and BlockBatchSampler as its batch_sampler). Records compacted by
+    tfg.data.dedup carry a sample weight, which is then returned as a fourth tensor.
+
+    Args:
+        x (torch.Tensor): States of shape (N, 3, 6, 6).
+        pi (torch.Tensor): Policies of shape (N, 36).
+        z (torch.Tensor): Outcomes of shape (N,).
+        w (torch.Tensor, optional): Sample weights of shape (N,).
+    """
+    def __init__(self, x, pi, z, w=None):
+        """ Initializes the dataset from its tensors.
+
+        Args:
+            x (torch.Tensor): States of shape (N, 3, 6, 6).
+            pi (torch.Tensor): Policies of shape (N, 36).
+            z (torch.Tensor): Outcomes of shape (N,).
+            w (torch.Tensor, optional): Sample weights of shape (N,). Defaults to None (unweighted).
+        """
+        self.x, self.pi, self.z, self.w = x, pi, z, w
+
+    def _tensors(self):
+        return (self.x, self.pi, self.z) if self.w is None else (self.x, self.pi, self.z, self.w)
+
+    @classmethod
+    def from_jsonl(cls, path, chunk: int = 100000):
+        """ Load a JSONL file, converting its records to arrays a chunk at a time.
+
+        Args:
+            path (str): Path to the JSONL file containing game records.
+            chunk (int, optional): Records parsed before they are converted. Defaults to 100000.
+
+        Returns:
+            TensorGameDataset: The dataset.
+        """
+        chunks = []
+        with open(path) as f:
+            while True:
+                lines = [l for _, l in zip(range(chunk), f) if l.strip()]
+                if not lines:
+                    break
+                chunks.append(decode(lines))
+        if not chunks:
+            return cls(torch.zeros(0, 3, 6, 6), torch.zeros(0, 36), torch.zeros(0))
+        columns = [torch.from_numpy(np.concatenate([c[i] for c in chunks])) for i in range(3)]
+        if any(len(c) == 4 for c in chunks):
+            columns.append(torch.from_numpy(np.concatenate(
+                [c[3] if len(c) == 4 else np.ones(len(c[2]), dtype=np.float32) for c in chunks])))
+        return cls(*columns)
+
+    @classmethod
+    def from_binary(cls, path):
+        """ Load a binary dataset (see tfg.data.binary) in memory.
+
+        Args:
+            path (str): Path to the dataset directory (or its index.json).
+
+        Returns:
+            TensorGameDataset: The dataset.
+        """
+        records = BinaryRecords(path)
+        return cls(*(torch.from_numpy(a) for a in records.get(np.arange(len(records)))))
+
+    def __len__(self):
+        """ Returns the number of records in the dataset.
+
+        Returns:
+            int: The number of records in the dataset.
+        """
+        return len(self.z)
+
+    def __getitem__(self, idx):
+        """ Retrieves a single record from the dataset by index.
+
+        Args:
+            idx (int): Index of the record to retrieve.
+
+        Returns:
+            tuple: The state (3, 6, 6), policy (36,) and outcome tensors of the record (and its weight).
+        """
+        return tuple(t[idx] for t in self._tensors())
+
+    def __getitems__(self, indices):
+        """ Retrieves a batch of records.
+
+        Args:
+            indices (torch.Tensor | list): Indices of the records.
+
+        Returns:
+            tuple: The states (N, 3, 6, 6), policies (N, 36) and outcomes (N,) as tensors, and the
+                weights (N,) of a weighted dataset.
+        """
+        indices = torch.as_tensor(indices)
+        return tuple(t[indices] for t in self._tensors())
+
+    collate = staticmethod(BinaryGameDataset.collate)
+
+class BlockBatchSampler(Sampler):
+    """BlockBatchSampler yields batches as index tensors: each epoch it shuffles its indices once and
+    slices the permutation into contiguous blocks of batch_size. In data-parallel training every
+    process (rank) holds a sampler with the same generator seed, and takes every world_size-th index of
+    the common permutation; with equal_shares the shares are cut to the same length on all ranks, so
+    they run the same number of (collective) steps.
+
+    Args:
+        indices (torch.Tensor): The indices sampled (e.g. the training split).
+        batch_size (int): Indices per batch.
+        shuffle (bool): Whether to shuffle the indices every epoch.
+        generator (torch.Generator, optional): Random generator of the shuffles.
+        rank (int): Index of this process among the data-parallel processes.
+        world_size (int): Number of data-parallel processes.
+        equal_shares (bool): Whether to drop the last indices that do not divide among the ranks.
+    """
+    def __init__(self, indices, batch_size, shuffle=True, generator=None, rank=0, world_size=1,
+                 equal_shares=True):
+        """ Initializes the sampler.
+
+        Args:
+            indices (torch.Tensor): The indices sampled.
+            batch_size (int): Indices per batch.
+            shuffle (bool, optional): Whether to shuffle the indices every epoch. Defaults to True.
+            generator (torch.Generator, optional): Random generator of the shuffles. Defaults to None.
+            rank (int, optional): Index of this process. Defaults to 0.
+            world_size (int, optional): Number of data-parallel processes. Defaults to 1.
+            equal_shares (bool, optional): Whether to cut the shares to the same length.
+                Defaults to True.
+        """
+        self.indices = torch.as_tensor(indices, dtype=torch.long)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.generator = generator
+        self.rank = rank
+        self.world_size = world_size
+        self.equal_shares = equal_shares
+
+    def _share(self, n):
+        if self.equal_shares:
+            return n // self.world_size
+        return len(range(self.rank, n, self.world_size))
+
+    def __iter__(self):
+        order = self.indices
+        if self.shuffle:
+            order = order[torch.randperm(len(order), generator=self.generator)]
+        if self.world_size > 1:
+            order = order[self.rank::self.world_size][:self._share(len(order))]
+        for start in range(0, len(order), self.batch_size):
+            yield order[start:start + self.batch_size]
+
+    def __len__(self):
+        return -(-self._share(len(self.indices)) // self.batch_size)
+
+class StreamingGameDataset(IterableDataset):
+    """StreamingGameDataset reads the finished shards of a sharded self-play run lazily, in batches
+    (see tfg.data.stream.ShardStream; use it in a DataLoader with batch_size=None). Every iteration
+    is one epoch over the shards finished when it starts. Its position (state_dict) follows the
+    batches consumed, so it is iterated in the main process, without DataLoader workers.
+
+    Args:
+        shard_dir (str): Directory of the sharded run.
+        split (str): 'train' or 'val'.
+        **kwargs: Options of ShardStream (holdout, val_fraction, batch_size, buffer_size, seed).
+    """
+    def __init__(self, shard_dir, split='train', **kwargs):
+        """ Initializes the dataset.
+
+        Args:
+            shard_dir (str): Directory of the sharded run.
+            split (str, optional): 'train' or 'val'. Defaults to 'train'.
+            **kwargs: Options of ShardStream.
+        """
+        self.stream = ShardStream(shard_dir, split, **kwargs)
+
+    def __iter__(self):
+        if get_worker_info() is not None:
+            raise RuntimeError('StreamingGameDataset must be iterated in the main process (num_workers=0).')
+        for batch in self.stream:
+            yield tuple(torch.from_numpy(a) for a in batch)
+
+    def state_dict(self):
+        """ Capture the position of the stream (see ShardStream.state_dict).
+
+        Returns:
+            dict: The state.
+        """
+        return self.stream.state_dict()
+
+    def load_state_dict(self, state):
+        """ Restore a position captured with state_dict.
+
+        Args:
+            state (dict): The state.
+        """
+        self.stream.load_state_dict(state)
+
+def random_symmetry(x, pi, generator=None):
+    """ Augment a batch by applying a random symmetry of the board (see tfg.game.symmetry) to each
+    sample: the state and the policy are permuted together, the outcome is unchanged.
+
+    Args:
+        x (torch.Tensor): States of shape (N, 3, 6, 6).
+        pi (torch.Tensor): Policies of shape (N, 36).
+        generator (torch.Generator, optional): Random generator. Defaults to None.
+
+    Returns:
+        tuple: The transformed states and policies.
+    """
+    n = len(x)
+    ks = torch.randint(N_SYMMETRIES, (n,), generator=generator)
+    perm = torch.as_tensor(PERMUTATIONS)[ks].to(x.device)           # (N, 36)
+    flat = x.reshape(n, x.shape[1], -1)
+    x = flat.gather(2, perm[:, None, :].expand_as(flat)).reshape(x.shape)
+    return x, pi.gather(1, perm)
+
+def loss_fn(logits, v, pi, z, w=None):
+    """ AlphaZero loss: cross-entropy of the policy against pi plus squared error of the value
+    against z, averaged over the batch. Sample weights scale each sample's term; with weights of
+    mean 1 over the dataset (see normalize_weights), an epoch over compacted records optimizes the
+    loss of the records they merge.
+
+    Args:
+        logits (torch.Tensor): Policy logits of shape (N, 36).
+        v (torch.Tensor): Values of shape (N, 1).
+        pi (torch.Tensor): Target policies of shape (N, 36).
+        z (torch.Tensor): Target outcomes of shape (N,).
+        w (torch.Tensor, optional): Sample weights of shape (N,). Defaults to None.
+
+    Returns:
+        torch.Tensor: The loss.
+    """
+    # Policy loss: cross‐entropy vs pi target
+    loss_p = - (pi * F.log_softmax(logits, dim=1)).sum(dim=1)
+    # Value loss: MSE vs z
+    loss_v = (v.squeeze(-1) - z) ** 2
+    if w is None:
+        return loss_p.mean() + loss_v.mean()
+    return ((loss_p + loss_v) * w).mean()
+
+def distill_targets(teacher, x, pi, z, weight=1.0):
+    """ Replace the targets of a batch by the outputs of a teacher network (knowledge distillation).
+
+    The policy target becomes the teacher's policy and the value target its value, mixed with the
+    self-play targets in proportion 1 - weight. Mixing the targets gives the gradients of mixing the
+    losses (the policy loss is linear in pi, and the value losses only differ by a constant).
+
+    Args:
+        teacher (GameNet): The teacher, in evaluation mode.
+        x (torch.Tensor): States of shape (N, 3, 6, 6).
+        pi (torch.Tensor): Self-play policies of shape (N, 36).
+        z (torch.Tensor): Self-play outcomes of shape (N,).
+        weight (float, optional): Weight of the teacher's outputs. Defaults to 1.0.
+
+    Returns:
+        tuple: The policy and value targets.
+    """
+    with torch.no_grad():
+        logits, v = teacher(x)
+    return (weight * F.softmax(logits, dim=1) + (1 - weight) * pi,
+            weight * v + (1 - weight) * z)
+
+def normalize_weights(ds):
+    """ Scale the sample weights of an in-memory dataset to a mean of 1, so a weighted batch loss
+    estimates the loss of the whole original dataset without bias (a batch holding a heavy record,
+    like the empty board, is not renormalized around it).
+
+    Args:
+        ds (Dataset): The dataset; only a weighted TensorGameDataset is changed.
+    """
+    if getattr(ds, 'w', None) is not None and len(ds.w):
+        ds.w = ds.w / ds.w.mean()
+
+def split_indices(n, val_split, generator=None):
+    """ Randomly split the indices of a dataset into a training and a validation part.
+
+    Args:
+        n (int): Size of the dataset.
+        val_split (float): Fraction of the indices used for validation.
+        generator (torch.Generator, optional): Random generator. Defaults to None.
+
+    Returns:
+        tuple: The training indices and the validation indices, as tensors.
+    """
+    perm = torch.randperm(n, generator=generator)
+    n_val = int(n * val_split)
+    return perm[n_val:], perm[:n_val]
+
+def load_dataset(path, in_memory=False):
+    """ Open a training dataset: a binary dataset directory (see tfg.data.binary) or a JSONL file.
+    JSONL files are always loaded in memory as tensors.
+
+    Args:
+        path (str): The dataset directory, its index.json, or a JSONL file.
+        in_memory (bool, optional): Whether to load a binary dataset in memory instead of reading it
+            from disk batch by batch. Defaults to False.
+
+    Returns:
+        Dataset: A TensorGameDataset or a BinaryGameDataset.
+    """
+    if os.path.isdir(path) or os.path.basename(path) == INDEX_FILE:
+        return TensorGameDataset.from_binary(path) if in_memory else BinaryGameDataset(path)
+    return TensorGameDataset.from_jsonl(path)
+
 def train(
     datafile='data_balanced.jsonl',
     epochs=50,
@@ -60,92 +437,329 @@ def train(
     lr=1e-3,
     model_out='model.pth',
     val_split=0.1,
-    early_stop_patience=5
+    early_stop_patience=5,
+    num_workers=0,
+    in_memory=False,
+    stream=False,
+    holdout='shard',
+    stream_state=None,
+    augment=False,
+    processes=1,
+    seed=None,
+    checkpoint_dir=None,
+    checkpoint_every=1,
+    resume=False,
+    channels=DEFAULT_CHANNELS,
+    value_hidden=DEFAULT_VALUE_HIDDEN,
+    teacher=None,
+    distill_weight=1.0
 ):
     """ Train a neural network model for the Battleship game using self-play data.
 
     Args:
-        datafile (str): Path to the JSONL file containing game records.
+        datafile (str): Path to the JSONL file containing game records (weighted records from
+            tfg.data.dedup weigh the loss), or to a binary dataset directory.
         epochs (int): Number of training epochs.
-        batch_size (int): Batch size for training.
+        batch_size (int): Batch size for training (split between the processes).
         lr (float): Learning rate for the optimizer.
         model_out (str): Output path to save the trained model.
         val_split (float): Fraction of data to use for validation.
         early_stop_patience (int): Number of epochs with no improvement before stopping training early.
+        num_workers (int): DataLoader worker processes prefetching batches (useful for binary datasets
+            read from disk).
+        in_memory (bool): Whether to load a binary dataset in memory.
+        stream (bool): Whether datafile is the directory of a sharded self-play run to stream from.
+            Training starts once a training shard is finished, and every epoch reads the shards
+            finished so far (num_workers and in_memory do not apply).
+        holdout (str): Validation holdout of a stream, by 'shard' or by record 'hash'.
+        stream_state (str): JSON file where the position of the training stream is saved after every
+            epoch; if it exists, training resumes the stream from there.
+        augment (bool): Whether to apply a random board symmetry to every training sample (off by
+            default, so existing training runs are unchanged).
+        processes (int): Data-parallel CPU processes. With more than one, the processes each train a
+            replica on their share of every batch, and their gradients are averaged by all-reduce
+            (torch.distributed with the gloo backend) before every step.
+        seed (int): Seed of the split, the shuffles and the augmentation. Defaults to a random seed.
+        checkpoint_dir (str): Directory of the full training checkpoints (see tfg.ai.checkpoint): the
+            'last' slot, written every checkpoint_every epochs and when training stops, and the
+            'best' slot. Defaults to model_out without its extension, plus '_ckpt'.
+        checkpoint_every (int): Epochs between two writes of the 'last' checkpoint.
+        resume (bool): Whether to continue from the 'last' checkpoint, if there is one: the model,
+            optimizer, scheduler, early-stopping counters, history, seed and data position are
+            restored, and training goes on with the next epoch exactly as if it had not stopped.
+        channels (tuple): Output channels of the trunk convolutions of the trained GameNet.
+        value_hidden (int): Width of the hidden layer of its value head.
+        teacher (str): Weights of a teacher GameNet (any configuration) to distill: the targets of
+            every sample, in training and validation, become the teacher's policy and value on it
+            (see distill_targets).
+        distill_weight (float): Weight of the teacher's outputs in the targets (1 - weight for the
+            self-play targets).
+
+    Raises:
+        ValueError: If several processes are asked to train from a stream.
+
+    Returns:
+        list: One dict per epoch run, with the epoch, train_loss, val_loss and samples_per_s.
+    """
+    if checkpoint_dir is None:
+        checkpoint_dir = os.path.splitext(model_out)[0] + '_ckpt'
+    checkpoint = load_checkpoint(checkpoint_dir) if resume else None
+    if checkpoint is not None:
+        seed = checkpoint['seed']  # the split and the shuffles must be the interrupted run's
+    elif seed is None:
+        seed = random.randrange(2**31)
+    options = dict(datafile=datafile, epochs=epochs, batch_size=batch_size, lr=lr, model_out=model_out,
+                   val_split=val_split, early_stop_patience=early_stop_patience, num_workers=num_workers,
+                   in_memory=in_memory, stream=stream, holdout=holdout, stream_state=stream_state,
+                   augment=augment, seed=seed, checkpoint_dir=checkpoint_dir,
+                   checkpoint_every=checkpoint_every, resume=checkpoint is not None,
+                   channels=channels, value_hidden=value_hidden, teacher=teacher,
+                   distill_weight=distill_weight)
+    if processes <= 1:
+        return _fit(**options)
+    if stream:
+        raise ValueError('Data-parallel training reads a dataset file, not a stream.')
+
+    results = mp.get_context('spawn').SimpleQueue()
+    torch.multiprocessing.spawn(_distributed_worker, args=(processes, _free_port(), options, results),
+                                nprocs=processes)
+    return results.get()
+
+def _free_port():
+    """ Pick a free TCP port for the process group rendezvous."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _distributed_worker(rank, world_size, port, options, results):
+    """ Entry point of a data-parallel process: join the process group and train.
+
+    Args:
+        rank (int): Index of this process.
+        world_size (int): Number of processes.
+        port (int): Port of the rendezvous on localhost.
+        options (dict): Arguments of _fit.
+        results (SimpleQueue): Receives the history of rank 0.
     """
-    # DS and split
-    ds = GameDataset(datafile)
-    n_val = int(len(ds) * val_split)
-    n_trn = len(ds) - n_val
-    trn_ds, val_ds = random_split(ds, [n_trn, n_val])
-    trn_loader = DataLoader(trn_ds, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False)
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank,
+                            world_size=world_size)
+    # share the cores instead of every process running one thread per core
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    try:
+        history = _fit(rank=rank, world_size=world_size, **options)
+        if rank == 0:
+            results.put(history)
+    finally:
+        dist.destroy_process_group()
+
+def _fit(datafile, epochs, batch_size, lr, model_out, val_split, early_stop_patience, num_workers,
+         in_memory, stream, holdout, stream_state, augment, seed, checkpoint_dir, checkpoint_every,
+         resume, channels, value_hidden, teacher, distill_weight, rank=0, world_size=1):
+    """ Training loop of train(), run by each process of a data-parallel run (rank 0 prints and saves).
+
+    Returns:
+        list: One dict per epoch run (see train).
+    """
+    log = print if rank == 0 else (lambda *args, **kwargs: None)
+    torch.manual_seed(seed + rank)
+    if stream:
+        # Batches are read lazily from the finished shards; the holdout is deterministic
+        trn_ds = StreamingGameDataset(datafile, 'train', holdout=holdout, val_fraction=val_split,
+                                      batch_size=batch_size, seed=seed)
+        val_ds = StreamingGameDataset(datafile, 'val', holdout=holdout, val_fraction=val_split,
+                                      batch_size=batch_size)
+        if stream_state and os.path.exists(stream_state):
+            with open(stream_state) as f:
+                trn_ds.load_state_dict(json.load(f))
+        trn_ds.stream.wait_for_shards(1)
+        trn_loader = DataLoader(trn_ds, batch_size=None)
+        val_loader = DataLoader(val_ds, batch_size=None)
+    else:
+        # DS and split: batches are sliced from a shuffled index permutation and gathered in one go;
+        # the split and the permutations are drawn from the same seed on every rank
+        ds = load_dataset(datafile, in_memory)
+        normalize_weights(ds)
+        trn_idx, val_idx = split_indices(len(ds), val_split, torch.Generator().manual_seed(seed))
+        per_rank = max(1, batch_size // world_size)
+        trn_sampler = BlockBatchSampler(trn_idx, per_rank, shuffle=True, generator=torch.Generator(),
+                                        rank=rank, world_size=world_size)
+        val_sampler = BlockBatchSampler(val_idx, per_rank, shuffle=False, rank=rank, world_size=world_size,
+                                        equal_shares=False)
+        trn_loader = DataLoader(ds, batch_sampler=trn_sampler, collate_fn=ds.collate,
+                                num_workers=num_workers, persistent_workers=num_workers > 0)
+        val_loader = DataLoader(ds, batch_sampler=val_sampler, collate_fn=ds.collate,
+                                num_workers=num_workers, persistent_workers=num_workers > 0)
 
     # Model, optimizer, scheduler
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    model = GameNet().to(device)
+    device = torch.device('cuda' if torch.cuda.is_available() and world_size == 1 else 'cpu')
+    net = GameNet(channels, value_hidden).to(device)
+    if teacher is not None:
+        teacher = GameNet.from_state_dict(torch.load(teacher, map_location=device)).to(device).eval()
+        teacher.requires_grad_(False)
+    # replicas start from rank 0's weights, and gradients are all-reduced during backward
+    model = DistributedDataParallel(net) if world_size > 1 else net
     optimizer = torch.optim.Adam(model.parameters(), lr=lr)
     scheduler = ReduceLROnPlateau(optimizer, mode='min',
-                                  factor=0.5, patience=3,
-                                  verbose=True)
+                                  factor=0.5, patience=3)
 
     best_val_loss = float('inf')
     epochs_no_improve = 0
+    history = []
+    start_epoch = 1
+    stopped = False
+    if resume:
+        checkpoint = load_checkpoint(checkpoint_dir, device=device)
+        net.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        scheduler.load_state_dict(checkpoint['scheduler'])
+        best_val_loss = checkpoint['best_val_loss']
+        epochs_no_improve = checkpoint['epochs_no_improve']
+        history = checkpoint['history']
+        stopped = checkpoint['stopped']
+        start_epoch = checkpoint['epoch'] + 1
+        if stream:
+            trn_ds.load_state_dict(checkpoint['stream'])
+        log(f"Resuming from {checkpoint_dir} after epoch {checkpoint['epoch']}")
+
+    def state(ep):
+        return {'epoch': ep, 'seed': seed, 'model': net.state_dict(), 'optimizer': optimizer.state_dict(),
+                'scheduler': scheduler.state_dict(), 'best_val_loss': best_val_loss,
+                'epochs_no_improve': epochs_no_improve, 'history': history, 'stopped': stopped,
+                'stream': trn_ds.state_dict() if stream else None}
+
+    for ep in range(start_epoch, epochs + 1):
+        if stopped:
+            break
+        # every epoch draws its shuffle and augmentations from (seed, epoch), so a resumed run
+        # continues exactly like an uninterrupted one
+        torch.manual_seed(seed + 1_000_003 * ep + rank)
+        if not stream:
+            trn_sampler.generator.manual_seed(seed + ep)
 
-    for ep in range(1, epochs+1):
         # training
         model.train()
         total_train_loss = 0
-        for x, pi, z in trn_loader:
-            x, pi, z = x.to(device), pi.to(device), z.to(device)
+        n_batches = n_samples = 0
+        start = time.perf_counter()
+        for batch in trn_loader:
+            x, pi, z, *w = (t.to(device) for t in batch)
+            if augment:
+                x, pi = random_symmetry(x, pi)
+            if teacher is not None:
+                pi, z = distill_targets(teacher, x, pi, z, distill_weight)
             logits, v = model(x)
-
-            # Policy loss: cross‐entropy vs pi target
-            loss_p = - (pi * F.log_softmax(logits, dim=1)).sum(dim=1).mean()
-            # Value loss: MSE vs z
-            loss_v = F.mse_loss(v.squeeze(-1), z)
-            loss = loss_p + loss_v
+            loss = loss_fn(logits, v, pi, z, *w)
 
             optimizer.zero_grad()
             loss.backward()
             optimizer.step()
 
             total_train_loss += loss.item()
-
-        avg_train_loss = total_train_loss / len(trn_loader)
+            n_batches += 1
+            n_samples += len(z)
+        elapsed = time.perf_counter() - start
+        if stream and stream_state:
+            with open(stream_state + '.tmp', 'w') as f:
+                json.dump(trn_ds.state_dict(), f)
+            os.replace(stream_state + '.tmp', stream_state)
 
         # validation
         model.eval()
         total_val_loss = 0
+        n_val = 0
         with torch.no_grad():
-            for x, pi, z in val_loader:
-                x, pi, z = x.to(device), pi.to(device), z.to(device)
-                logits, v = model(x)
-                loss_p = - (pi * F.log_softmax(logits, dim=1)).sum(dim=1).mean()
-                loss_v = F.mse_loss(v.squeeze(-1), z)
-                total_val_loss += (loss_p + loss_v).item()
-        avg_val_loss = total_val_loss / len(val_loader)
+            for batch in val_loader:
+                x, pi, z, *w = (t.to(device) for t in batch)
+                if teacher is not None:
+                    pi, z = distill_targets(teacher, x, pi, z, distill_weight)
+                logits, v = net(x)
+                total_val_loss += loss_fn(logits, v, pi, z, *w).item() * len(z)
+                n_val += len(z)
+
+        # every rank gets the same totals, hence the same schedule and early-stopping decisions
+        totals = torch.tensor([total_train_loss, n_batches, n_samples, total_val_loss, n_val],
+                              dtype=torch.float64)
+        if world_size > 1:
+            dist.all_reduce(totals)
+        total_train_loss, n_batches, n_samples, total_val_loss, n_val = totals.tolist()
+        avg_train_loss = total_train_loss / max(n_batches, 1)
+        samples_per_s = n_samples / elapsed
+        # no validation shard finished yet: fall back on the training loss
+        avg_val_loss = total_val_loss / n_val if n_val else avg_train_loss
 
         # Scheduler on validation loss
         scheduler.step(avg_val_loss)
 
-        print(f"Epoch {ep}/{epochs} — "
-              f"Train Loss: {avg_train_loss:.4f} — "
-              f"Val Loss: {avg_val_loss:.4f}")
+        log(f"Epoch {ep}/{epochs} — "
+            f"Train Loss: {avg_train_loss:.4f} — "
+            f"Val Loss: {avg_val_loss:.4f} — "
+            f"{samples_per_s:.0f} samples/s")
+        history.append({'epoch': ep, 'train_loss': avg_train_loss, 'val_loss': avg_val_loss,
+                        'samples_per_s': samples_per_s})
 
-        # Early stopping + best‐model saving
-        if avg_val_loss < best_val_loss:
+        # Early stopping + best‐model saving (files are replaced atomically, so the served model.pth
+        # and the checkpoints are never partial)
+        improved = avg_val_loss < best_val_loss
+        if improved:
             best_val_loss = avg_val_loss
             epochs_no_improve = 0
-            torch.save(model.state_dict(), model_out)
-            print(f"New best model saved (val loss {best_val_loss:.4f})")
         else:
             epochs_no_improve += 1
-            if epochs_no_improve >= early_stop_patience:
-                print(f"Early stopping: no improvement in {early_stop_patience} epochs.")
-                break
+            stopped = epochs_no_improve >= early_stop_patience
+        if rank == 0:
+            if improved:
+                atomic_save(net.state_dict(), model_out)
+                save_checkpoint(checkpoint_dir, 'best', state(ep))
+            if ep % checkpoint_every == 0 or stopped or ep == epochs:
+                save_checkpoint(checkpoint_dir, 'last', state(ep))
+        if improved:
+            log(f"New best model saved (val loss {best_val_loss:.4f})")
+        if stopped:
+            log(f"Early stopping: no improvement in {early_stop_patience} epochs.")
+
+    log("Training completed.")
+    return history
+
+def main():
+    """Main function to parse arguments and train (or resume training) a model.
+    """
+    parser = argparse.ArgumentParser(description="Train GameNet on self-play data")
+    parser.add_argument('datafile', nargs='?', default='data_balanced.jsonl',
+                        help="JSON Lines file, binary dataset directory or shard directory (--stream)")
+    parser.add_argument('--epochs', type=int, default=50, help="Training epochs")
+    parser.add_argument('--batch-size', type=int, default=64, help="Batch size")
+    parser.add_argument('--lr', type=float, default=1e-3, help="Learning rate")
+    parser.add_argument('--model-out', default='model.pth', help="Output weights")
+    parser.add_argument('--val-split', type=float, default=0.1, help="Validation fraction")
+    parser.add_argument('--patience', type=int, default=5, help="Early stopping patience")
+    parser.add_argument('--num-workers', type=int, default=0, help="DataLoader workers")
+    parser.add_argument('--in-memory', action='store_true', help="Load a binary dataset in memory")
+    parser.add_argument('--stream', action='store_true', help="Stream from a sharded self-play run")
+    parser.add_argument('--holdout', default='shard', choices=('shard', 'hash'),
+                        help="Validation holdout of a stream")
+    parser.add_argument('--augment', action='store_true', help="Apply random board symmetries")
+    parser.add_argument('--processes', type=int, default=1, help="Data-parallel processes")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="Checkpoint directory (default: <model-out>_ckpt)")
+    parser.add_argument('--checkpoint-every', type=int, default=1, help="Epochs between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="Resume from the last checkpoint")
+    parser.add_argument('--channels', type=int, nargs='+', default=list(DEFAULT_CHANNELS),
+                        help="Trunk convolution widths, e.g. --channels 16 32")
+    parser.add_argument('--value-hidden', type=int, default=DEFAULT_VALUE_HIDDEN,
+                        help="Hidden width of the value head")
+    parser.add_argument('--teacher', default=None, help="Teacher weights to distill, e.g. model.pth")
+    parser.add_argument('--distill-weight', type=float, default=1.0,
+                        help="Weight of the teacher's outputs in the targets")
+    args = parser.parse_args()
 
-    print("Training completed.")
+    train(args.datafile, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+          model_out=args.model_out, val_split=args.val_split, early_stop_patience=args.patience,
+          num_workers=args.num_workers, in_memory=args.in_memory, stream=args.stream,
+          holdout=args.holdout, augment=args.augment, processes=args.processes,
+          seed=args.seed, checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every,
+          resume=args.resume, channels=tuple(args.channels), value_hidden=args.value_hidden,
+          teacher=args.teacher, distill_weight=args.distill_weight)
 
 if __name__ == '__main__':
-    train()
+    main()